@@ -1,11 +1,13 @@
-
 import asyncio
 import json
+import time
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from uuid import uuid4
 
 from uagents import Agent, Context, Protocol
+from uagents.crypto import Identity
 from uagents.setup import fund_agent_if_low
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
@@ -16,27 +18,119 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 
-from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, CURRICULUM_AGENT_SEED, MATERIALS_AGENT_SEED, ENHANCED_AGENT_SEED
-from services.gemini_service import GeminiLearningService
+from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, CURRICULUM_AGENT_SEED, MATERIALS_AGENT_SEED, ENHANCED_AGENT_SEED, USER_CONTEXT_MAINTENANCE_INTERVAL, MESSAGE_DEBOUNCE_SECONDS, REQUEST_SWEEP_INTERVAL, FULL_PLAN_DEFAULT, FULL_PLAN_TIMEOUT_SECONDS, CURRICULUM_AGENT_REPLICAS, MATERIALS_AGENT_REPLICAS, ENHANCED_AGENT_REPLICAS, CURRICULUM_AGENT_ADDRESSES, MATERIALS_AGENT_ADDRESSES, ENHANCED_AGENT_ADDRESSES, SHARD_COUNT, SHARD_INDEX, SHARD_BASE_PORT, METRICS_LOG_INTERVAL
+from services.gemini_service import gemini_service
 from services.user_context import user_context_manager
-from models import Request, Response, CurriculumRequest, MaterialsRequest, InsightsRequest, CurriculumResponse, MaterialsResponse, InsightsResponse
+from services.profile_signals import extract_profile_signals
+from services.query_classifier import classify_query
+from services.topic_canonicalizer import extract_topic
+from services.request_tracker import request_tracker, PendingRequest
+from services.worker_pool import build_worker_pool
+from services.shard_ring import ConsistentHashRing, shard_seed, shard_addresses
+from services.admission import admission_controller
+from services.degradation import degradation_controller
+from services.metrics import metrics
+from services.response_cache import response_cache, request_key
+from services.payload_codec import decode_text, split_message
+from models import Request, Response, CurriculumRequest, MaterialsRequest, InsightsRequest, CurriculumResponse, MaterialsResponse, InsightsResponse, ShardChatMessage, ShardChatReply, ShardMembership, MetricsResponse, CancelRequest
+
+# With SHARD_COUNT > 1 this process is one shard behind router.py, which owns the
+# public address and forwards each user to the shard that owns them on the hash ring.
+SHARDED = SHARD_COUNT > 1
+AGENT_PORT = SHARD_BASE_PORT + SHARD_INDEX if SHARDED else 8000
+ROUTER_ADDRESS = Identity.from_seed(AGENT_SEED, 0).address if SHARDED else None
 
 learning_agent = Agent(
-    name=AGENT_NAME,
-    seed=AGENT_SEED,
-    port=8000,
-    mailbox=True
+    name=f"{AGENT_NAME}_shard_{SHARD_INDEX}" if SHARDED else AGENT_NAME,
+    seed=shard_seed(AGENT_SEED, SHARD_INDEX) if SHARDED else AGENT_SEED,
+    port=AGENT_PORT,
+    mailbox=True,
+    handle_messages_concurrently=True
 )
 
-learning_chat_proto = Protocol(spec=chat_protocol_spec)
+shard_ring = ConsistentHashRing(shard_addresses(AGENT_SEED, SHARD_COUNT)) if SHARDED else None
 
-gemini_service = GeminiLearningService()
+learning_chat_proto = Protocol(spec=chat_protocol_spec)
 
 CURRICULUM_AGENT_ADDRESS = "agent1q2t29q262rsp660k727g3nhejn2sftdesfrc4k6dttydwzs2nsp2ypfzww8"
 MATERIALS_AGENT_ADDRESS = "agent1qdq2ynx5e5qcyyhnzzr4cmvpg4wufvqskqp2dl9nldm9w7da6lvysdxwnuf"
 ENHANCED_AGENT_ADDRESS = "agent1qdeqahn3pr4ta7zxgtwee5ts0klrkeh30an7wmsdhagsfyy28udtqs2tsk4"
 
-pending_requests = {}
+# One pool per request kind; the single addresses above are used when no worker seed is configured.
+worker_pools = {
+    "curriculum": build_worker_pool("curriculum", CURRICULUM_AGENT_SEED, CURRICULUM_AGENT_REPLICAS, CURRICULUM_AGENT_ADDRESSES, CURRICULUM_AGENT_ADDRESS),
+    "materials": build_worker_pool("materials", MATERIALS_AGENT_SEED, MATERIALS_AGENT_REPLICAS, MATERIALS_AGENT_ADDRESSES, MATERIALS_AGENT_ADDRESS),
+    "insights": build_worker_pool("insights", ENHANCED_AGENT_SEED, ENHANCED_AGENT_REPLICAS, ENHANCED_AGENT_ADDRESSES, ENHANCED_AGENT_ADDRESS),
+}
+
+BUSY_MESSAGE = "I'm working on a lot of requests right now. Please try again in a moment."
+RATE_LIMITED_MESSAGE = "You're sending messages faster than I can answer them. Give me a few seconds, then try again."
+QUEUED_MESSAGE = "Lots of learners are asking right now. You're in line and I'll answer shortly."
+
+FULL_PLAN_PARTS = {
+    "curriculum": "Learning Plan",
+    "materials": "Resources",
+    "insights": "Key Concepts",
+}
+
+TIMEOUT_MESSAGES = {
+    "curriculum": "Sorry, your learning plan for {label} is taking longer than expected. Please ask again in a moment.",
+    "materials": "Sorry, finding resources for {label} is taking longer than expected. Please ask again in a moment.",
+    "insights": "Sorry, the insights on {label} are taking longer than expected. Please ask again in a moment.",
+}
+
+# Per-sender turn locks and open debounce bursts; entries are dropped once a sender goes quiet.
+_sender_locks: Dict[str, asyncio.Lock] = {}
+_sender_waiting: Dict[str, int] = {}
+_message_bursts: Dict[str, List[Any]] = {}
+
+metrics.gauge("main.sender_turns_waiting", lambda: sum(_sender_waiting.values()))
+metrics.gauge("main.debounce_bursts", lambda: len(_message_bursts))
+metrics.gauge("requests.in_flight", lambda: request_tracker.in_flight())
+for _stat in ("tracked", "completed", "timed_out", "rejected"):
+    metrics.gauge(f"requests.{_stat}", lambda stat=_stat: request_tracker.stats[stat])
+
+@asynccontextmanager
+async def _sender_turn(sender: str):
+    """Messages from one sender run one at a time in arrival order; other senders run in parallel"""
+    lock = _sender_locks.setdefault(sender, asyncio.Lock())
+    _sender_waiting[sender] = _sender_waiting.get(sender, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _sender_waiting[sender] -= 1
+        if not _sender_waiting[sender]:
+            del _sender_waiting[sender]
+            del _sender_locks[sender]
+
+def _merge_text_items(items: List[Any]) -> List[Any]:
+    merged = []
+    for item in items:
+        if isinstance(item, TextContent) and merged and isinstance(merged[-1], TextContent):
+            merged[-1] = TextContent(type="text", text=f"{merged[-1].text}\n{item.text}")
+        else:
+            merged.append(item)
+    return merged
+
+async def _debounced_content(sender: str, content: List[Any]) -> Optional[List[Any]]:
+    """Collect a sender's messages for MESSAGE_DEBOUNCE_SECONDS and return them as one turn.
+
+    The first message of a burst waits and returns the merged content; messages that
+    join an open burst return None because the first one handles them.
+    """
+    burst = _message_bursts.get(sender)
+    if burst is not None:
+        burst.extend(content)
+        return None
+    if MESSAGE_DEBOUNCE_SECONDS <= 0 or not any(isinstance(item, TextContent) for item in content):
+        return content
+    burst = _message_bursts[sender] = list(content)
+    try:
+        await asyncio.sleep(MESSAGE_DEBOUNCE_SECONDS)
+    finally:
+        del _message_bursts[sender]
+    return _merge_text_items(burst)
 
 def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
     content = [TextContent(type="text", text=text)]
@@ -48,51 +142,23 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
         content=content
     )
 
-def _extract_topic_from_query(query: str) -> str:
-    query_lower = query.lower()
-    
-    words = query_lower.split()
-    
-    for i in range(len(words) - 1):
-        two_word = f"{words[i]}_{words[i+1]}"
-        if len(two_word) > 6:
-            return two_word
-    
-    for word in words:
-        if len(word) > 3 and word not in ["the", "and", "for", "with", "from", "that", "this", "will", "learn", "teach", "help", "want", "need"]:
-            return word
-    
-    return query_lower.replace(" ", "_")
-
-def _extract_domain_from_query(query: str) -> str:
-    query_lower = query.lower()
-    
-    domain_keywords = {
-        "programming": ["code", "program", "software", "development", "coding", "python", "javascript", "java", "c++", "c#", "go", "rust"],
-        "data_science": ["data", "analysis", "statistics", "machine learning", "ai", "pandas", "numpy", "analytics", "big data"],
-        "web_development": ["web", "frontend", "backend", "full stack", "react", "vue", "angular", "nodejs", "javascript", "html", "css"],
-        "mobile_development": ["mobile", "app", "ios", "android", "swift", "kotlin", "react native", "flutter"],
-        "devops": ["devops", "docker", "kubernetes", "aws", "azure", "gcp", "ci/cd", "infrastructure", "deployment"],
-        "cybersecurity": ["cybersecurity", "security", "hacking", "penetration", "cyber", "ethical hacking", "network security"],
-        "design": ["design", "ui", "ux", "figma", "adobe", "user interface", "user experience", "visual design"],
-        "business": ["business", "marketing", "finance", "management", "entrepreneurship", "strategy"],
-        "science": ["science", "physics", "chemistry", "biology", "math", "mathematics", "research"],
-        "language": ["language", "english", "spanish", "french", "learning", "grammar", "linguistics"],
-        "music": ["music", "guitar", "piano", "singing", "composition", "audio", "sound"],
-        "art": ["art", "drawing", "painting", "sculpture", "digital art", "photography"],
-        "cooking": ["cooking", "baking", "culinary", "recipe", "chef", "food"],
-        "fitness": ["fitness", "exercise", "workout", "gym", "yoga", "running", "training"],
-        "psychology": ["psychology", "mental health", "therapy", "counseling", "behavior"],
-        "philosophy": ["philosophy", "ethics", "logic", "metaphysics", "thinking"],
-        "history": ["history", "historical", "ancient", "medieval", "modern", "world history"],
-        "literature": ["literature", "writing", "poetry", "novel", "creative writing", "reading"]
-    }
-    
-    for domain, keywords in domain_keywords.items():
-        if any(keyword in query_lower for keyword in keywords):
-            return domain
-    
-    return "general"
+def _message_parts(message: ChatMessage) -> List[ChatMessage]:
+    """A long text reply becomes numbered parts; anything else goes out as it is"""
+    if len(message.content) != 1 or not isinstance(message.content[0], TextContent):
+        return [message]
+    parts = split_message(message.content[0].text)
+    if len(parts) == 1:
+        return [message]
+    return [create_text_chat(part) for part in parts]
+
+async def _send_to_user(ctx: Context, user: str, message: ChatMessage):
+    """Shards answer through the router so users only ever see the public address;
+    parts of a long reply are sent one after another so they leave in order"""
+    for part in _message_parts(message):
+        if SHARDED:
+            await ctx.send(ROUTER_ADDRESS, ShardChatReply(user=user, message=part.model_dump_json()))
+        else:
+            await ctx.send(user, part)
 
 @learning_chat_proto.on_message(ChatMessage)
 async def handle_learning_message(ctx: Context, sender: str, msg: ChatMessage):
@@ -104,13 +170,68 @@ async def handle_learning_message(ctx: Context, sender: str, msg: ChatMessage):
         acknowledged_msg_id=msg.msg_id
     ))
     
-    for item in msg.content:
+    await _handle_user_message(ctx, sender, msg)
+
+@learning_agent.on_message(model=ShardChatMessage)
+async def handle_routed_message(ctx: Context, sender: str, msg: ShardChatMessage):
+    if sender != ROUTER_ADDRESS:
+        ctx.logger.warning(f"Ignoring routed message from {sender}, which is not the router")
+        return
+    print(f"[MAIN AGENT] Received message from {msg.user} via router")
+    await _handle_user_message(ctx, msg.user, ChatMessage.model_validate_json(msg.message))
+
+@learning_agent.on_message(model=ShardMembership)
+async def handle_shard_membership(ctx: Context, sender: str, msg: ShardMembership):
+    """Rebalance: adopt the router's ring and let go of users that now belong to another shard"""
+    global shard_ring
+    if sender != ROUTER_ADDRESS:
+        return
+    shard_ring = ConsistentHashRing(msg.shards)
+    address = learning_agent.address
+    released = user_context_manager.release_users(
+        [user_id for user_id in list(user_context_manager.contexts) if shard_ring.owner(user_id) != address]
+    )
+    ctx.logger.info(f"Joined ring of {len(msg.shards)} shards; released {released} users to other shards")
+
+async def _handle_user_message(ctx: Context, sender: str, msg: ChatMessage):
+    generates = any(isinstance(item, TextContent) for item in msg.content)
+    if generates and not admission_controller.allow(sender):
+        ctx.logger.warning(f"Rate limited {sender}")
+        await _send_to_user(ctx, sender, create_text_chat(RATE_LIMITED_MESSAGE))
+        return
+    
+    content = await _debounced_content(sender, msg.content)
+    if content is None:
+        return
+    
+    async with _sender_turn(sender):
+        if not generates:
+            await _process_content(ctx, sender, content)
+            return
+        
+        async def notify_queued():
+            try:
+                await _send_to_user(ctx, sender, create_text_chat(QUEUED_MESSAGE))
+            except Exception as e:
+                ctx.logger.error(f"Failed to send queued notice: {e}")
+        
+        if not await admission_controller.acquire(on_queued=notify_queued):
+            ctx.logger.warning(f"Saturated; turned away message from {sender}")
+            await _send_to_user(ctx, sender, create_text_chat(BUSY_MESSAGE))
+            return
+        try:
+            await _process_content(ctx, sender, content)
+        finally:
+            admission_controller.release()
+
+async def _process_content(ctx: Context, sender: str, content: List[Any]):
+    for item in content:
         if isinstance(item, StartSessionContent):
             ctx.logger.info(f"Session started with {sender}")
             
             user_context = user_context_manager.get_context(sender)
             user_context.session_count += 1
-            user_context_manager.save_contexts()
+            user_context_manager.save_context(sender, "session_count")
             
             personalized_greeting = user_context_manager.get_personalized_greeting(sender)
             
@@ -143,133 +264,148 @@ I'll create a personalized learning experience just for you!
 
 What would you like to learn today?
             """)
-            await ctx.send(sender, welcome_message)
+            await _send_to_user(ctx, sender, welcome_message)
             
         elif isinstance(item, TextContent):
             print(f"[MAIN AGENT] Processing text message: {item.text[:50]}...")
             ctx.logger.info(f"Text message from {sender}: {item.text}")
             user_input = item.text.lower()
+            classification = classify_query(item.text)
+            intent = classification.intent
             
             user_context = user_context_manager.get_context(sender)
             
-            learning_level = user_context_manager.assess_learning_level(sender, item.text)
-            learning_goals = user_context_manager.extract_learning_goals(sender, item.text)
-            learning_duration = user_context_manager.extract_learning_duration(sender, item.text)
-            practice_focus = user_context_manager.extract_practice_preferences(sender, item.text)
-            time_commitment = user_context_manager.extract_time_commitment(sender, item.text)
-            
-            if learning_level != "unknown":
-                user_context_manager.update_context(sender, learning_level=learning_level)
-            
-            if learning_goals:
-                user_context_manager.update_context(sender, learning_goals=learning_goals)
-            
-            if learning_duration != "flexible":
-                user_context_manager.update_context(sender, preferred_duration=learning_duration)
-            
-            if practice_focus:
-                user_context_manager.update_context(sender, practice_focus=practice_focus)
-            
-            if time_commitment != "not specified":
-                user_context_manager.update_context(sender, daily_time_commitment=time_commitment)
+            profile_signals = extract_profile_signals(item.text)
+            user_context_manager.apply_profile_signals(sender, profile_signals)
             
-            greeting_words = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "how are you", "how are you doing"]
-            if any(greeting in user_input for greeting in greeting_words):
+            if intent == "greeting":
                 response = await gemini_service.generate_conversational_response(
                     user_query=item.text,
                     context_type="greeting",
                     user_id=sender
                 )
-            elif any(phrase in user_input for phrase in ["thank you", "thanks", "appreciate", "grateful"]):
+            elif intent == "gratitude":
                 response = await gemini_service.generate_conversational_response(
                     user_query=item.text,
                     context_type="gratitude",
                     user_id=sender
                 )
-            elif any(phrase in user_input for phrase in ["learning speed", "slow learner", "not good", "struggle", "difficult", "hard for me"]):
-                user_context_manager.update_context(sender, preferences=user_context.preferences)
-                user_context.preferences.pace = "slow"
-                user_context_manager.save_contexts()
+            elif intent == "learning_pace":
+                user_context_manager.update_context(sender, pace="slow")
                 
                 response = await gemini_service.generate_conversational_response(
                     user_query=item.text,
                     context_type="learning_pace",
                     user_id=sender
                 )
-            elif any(keyword in user_input for keyword in ["teach me", "learn", "educational plan", "learning plan", "study plan", "curriculum", "learning path", "create a", "help me learn"]):
-                topic = _extract_topic_from_query(item.text)
-                domain = _extract_domain_from_query(item.text)
+            elif intent == "full_plan" or (intent == "learning_request" and FULL_PLAN_DEFAULT):
+                topic = extract_topic(item.text)
+                domain = classification.domain
                 
                 user_context_manager.update_context(sender, current_topic=topic, current_domain=domain)
                 
-                conversational_response = await gemini_service.generate_conversational_response(
-                    user_query=item.text,
-                    context_type="learning_request",
-                    user_id=sender,
-                    topic=topic,
-                    domain=domain
-                )
+                response = await _dispatch_full_plan(ctx, sender, item.text, topic, domain)
                 
-                import time
-                request_id = f"educational_plan_{int(time.time())}_{topic}_{domain}"
-                pending_requests[request_id] = sender
+            elif intent == "learning_request":
+                topic = extract_topic(item.text)
+                domain = classification.domain
                 
-                print(f"[MAIN AGENT] Routing to CURRICULUM AGENT for topic: {topic}, domain: {domain}")
-                await ctx.send(CURRICULUM_AGENT_ADDRESS, CurriculumRequest(
-                    domain=domain,
-                    user_query=item.text,
-                    original_sender=sender,
-                    request_id=request_id
-                ))
-                response = conversational_response
+                user_context_manager.update_context(sender, current_topic=topic, current_domain=domain)
                 
-            elif any(keyword in user_input for keyword in ["resources", "find", "get me", "show me", "videos", "courses", "books", "tutorials", "materials"]):
-                topic = _extract_topic_from_query(item.text)
-                domain = _extract_domain_from_query(item.text)
+                cache_key = _cache_key("curriculum", sender, item.text, domain)
+                cached = _cached_reply("curriculum", cache_key, topic)
+                if cached is None and degradation_controller.enabled("conversational_preamble"):
+                    conversational_response = await gemini_service.generate_conversational_response(
+                        user_query=item.text,
+                        context_type="learning_request",
+                        user_id=sender,
+                        topic=topic,
+                        domain=domain
+                    )
+                elif cached is None:
+                    adaptive_prefix = user_context_manager.get_adaptive_response_prefix(sender, topic.replace('_', ' '))
+                    conversational_response = f"{adaptive_prefix}Building your learning plan for {topic.replace('_', ' ').title()}. I'll send it as soon as it's ready."
+                
+                pending = None if cached is not None else _track_dispatch(sender, "curriculum", topic.replace('_', ' '), cache_key)
+                if cached is not None:
+                    response = cached
+                elif pending is None:
+                    response = BUSY_MESSAGE
+                else:
+                    await asyncio.to_thread(user_context_manager.flush)
+                    
+                    print(f"[MAIN AGENT] Routing to CURRICULUM AGENT {pending.worker[:16]}... for topic: {topic}, domain: {domain}")
+                    await ctx.send(pending.worker, CurriculumRequest(
+                        domain=domain,
+                        user_query=item.text,
+                        original_sender=sender,
+                        request_id=pending.request_id,
+                        deadline=pending.wall_deadline()
+                    ))
+                    response = conversational_response
+                
+            elif intent == "resources":
+                topic = extract_topic(item.text)
+                domain = classification.domain
+                include_youtube = "youtube" in user_input or "videos" in user_input
                 
                 user_context_manager.update_context(sender, current_topic=topic, current_domain=domain)
                 
                 adaptive_prefix = user_context_manager.get_adaptive_response_prefix(sender, topic.replace('_', ' '))
                 
-                import time
-                request_id = f"materials_{int(time.time())}_{topic}_{domain}"
-                pending_requests[request_id] = sender
-                
-                print(f"[MAIN AGENT] Routing to MATERIALS AGENT for topic: {topic}, domain: {domain}")
-                await ctx.send(MATERIALS_AGENT_ADDRESS, MaterialsRequest(
-                    topic=topic,
-                    domain=domain,
-                    user_query=item.text,
-                    include_youtube="youtube" in user_input or "videos" in user_input,
-                    original_sender=sender,
-                    request_id=request_id
-                ))
-                response = f"{adaptive_prefix}Finding personalized resources for {topic.replace('_', ' ').title()} that match your learning style..."
+                cache_key = _cache_key("materials", sender, item.text, domain, include_youtube)
+                cached = _cached_reply("materials", cache_key, topic)
+                pending = None if cached is not None else _track_dispatch(sender, "materials", topic.replace('_', ' '), cache_key)
+                if cached is not None:
+                    response = cached
+                elif pending is None:
+                    response = BUSY_MESSAGE
+                else:
+                    await asyncio.to_thread(user_context_manager.flush)
+                    
+                    print(f"[MAIN AGENT] Routing to MATERIALS AGENT {pending.worker[:16]}... for topic: {topic}, domain: {domain}")
+                    await ctx.send(pending.worker, MaterialsRequest(
+                        topic=topic,
+                        domain=domain,
+                        user_query=item.text,
+                        include_youtube=include_youtube,
+                        original_sender=sender,
+                        request_id=pending.request_id,
+                        deadline=pending.wall_deadline()
+                    ))
+                    response = f"{adaptive_prefix}Finding personalized resources for {topic.replace('_', ' ').title()} that match your learning style..."
                 
-            elif any(keyword in user_input for keyword in ["explain", "how does", "what is", "concept", "relationship", "prerequisite", "deep insights"]):
-                concept = _extract_topic_from_query(item.text)
-                domain = _extract_domain_from_query(item.text)
+            elif intent == "explain":
+                concept = extract_topic(item.text)
+                domain = classification.domain
                 
                 user_context_manager.update_context(sender, current_topic=concept, current_domain=domain)
                 
                 adaptive_prefix = user_context_manager.get_adaptive_response_prefix(sender, concept.replace('_', ' '))
                 
-                import time
-                request_id = f"insights_{int(time.time())}_{concept}_{domain}"
-                pending_requests[request_id] = sender
+                cache_key = _cache_key("insights", sender, item.text, domain)
+                cached = _cached_reply("insights", cache_key, concept)
+                pending = None if cached is not None else _track_dispatch(sender, "insights", concept.replace('_', ' '), cache_key)
+                if cached is not None:
+                    response = cached
+                elif pending is None:
+                    response = BUSY_MESSAGE
+                else:
+                    await asyncio.to_thread(user_context_manager.flush)
+                    
+                    print(f"[MAIN AGENT] Routing to ENHANCED AGENT {pending.worker[:16]}... for concept: {concept}, domain: {domain}")
+                    await ctx.send(pending.worker, InsightsRequest(
+                        concept=concept,
+                        domain=domain,
+                        query_type="explain",
+                        user_query=item.text,
+                        original_sender=sender,
+                        request_id=pending.request_id,
+                        deadline=pending.wall_deadline()
+                    ))
+                    response = f"{adaptive_prefix}Generating deep insights about {concept.replace('_', ' ').title()} tailored to your understanding level..."
                 
-                print(f"[MAIN AGENT] Routing to ENHANCED AGENT for concept: {concept}, domain: {domain}")
-                await ctx.send(ENHANCED_AGENT_ADDRESS, InsightsRequest(
-                    concept=concept,
-                    domain=domain,
-                    query_type="explain",
-                    user_query=item.text,
-                    original_sender=sender,
-                    request_id=request_id
-                ))
-                response = f"{adaptive_prefix}Generating deep insights about {concept.replace('_', ' ').title()} tailored to your understanding level..."
-                
-            elif "help" in user_input or "what can you do" in user_input:
+            elif intent == "help":
                 response = """
 **I'm your comprehensive Learning Path Agent!**
 
@@ -302,6 +438,7 @@ What would you like to learn today?
 - "Find React tutorials" (targeted resource discovery)
 - "Explain machine learning concepts" (deep insights)
 - "Help me learn cybersecurity" (personalized plan)
+- "Create a full plan for data science" (plan, resources and insights together)
 
 What would you like to learn?
                 """
@@ -313,7 +450,8 @@ What would you like to learn?
                 )
             
             response_message = create_text_chat(response)
-            await ctx.send(sender, response_message)
+            await _send_to_user(ctx, sender, response_message)
+            user_context_manager.add_conversation_entry(sender, item.text, response, "main")
             
         elif isinstance(item, EndSessionContent):
             ctx.logger.info(f"Session ended with {sender}")
@@ -328,7 +466,8 @@ Remember:
 
 Happy learning!
             """)
-            await ctx.send(sender, goodbye_message)
+            await _send_to_user(ctx, sender, goodbye_message)
+            await _cancel_requests(ctx, request_tracker.cancel_sender(sender))
             
         else:
             ctx.logger.info(f"Received unexpected content type from {sender}")
@@ -346,36 +485,127 @@ async def handle_agent_response(ctx: Context, sender: str, msg: Response):
     else:
         ctx.pending_responses = {sender: msg.message}
 
+def _track_dispatch(sender: str, kind: str, label: str, cache_key: str = "") -> Optional[PendingRequest]:
+    """Pick the least loaded worker for this kind and register the request against it"""
+    return request_tracker.track(sender, kind, label, worker=worker_pools[kind].pick(), cache_key=cache_key)
+
+def _cache_key(kind: str, sender: str, text: str, domain: str, include_youtube: bool = True) -> str:
+    """Everything the sub-agent's answer depends on. The requested level is part of the topic key for
+    every kind ("advanced python" never reuses "beginner python"); curricula are also personalized on
+    the learner's profile, including a hash of their goals and current topic, and materials may add videos"""
+    if kind == "curriculum":
+        return request_key(kind, text, domain, user_context_manager.profile_signature(sender))
+    if kind == "materials":
+        return request_key(kind, text, domain, "youtube" if include_youtube else "text")
+    return request_key(kind, text, domain, "explain")
+
+def _cached_reply(kind: str, cache_key: str, topic: str) -> Optional[str]:
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        return None
+    print(f"[MAIN AGENT] Answering {kind} request for topic: {topic} from the response cache")
+    return cached.text
+
+def _full_plan_part(label: str, kind: str, delivered: int, total: int, text: str) -> str:
+    return f"**Full plan for {label.title()} - {FULL_PLAN_PARTS[kind]} ({delivered}/{total})**\n\n{text}"
+
+async def _cancel_requests(ctx: Context, requests: List[PendingRequest]):
+    """Tell workers to stop on requests nobody is waiting for any more"""
+    for pending in requests:
+        if not pending.worker:
+            continue
+        try:
+            await ctx.send(pending.worker, CancelRequest(request_id=pending.request_id))
+        except Exception as e:
+            ctx.logger.error(f"Failed to cancel {pending.request_id}: {e}")
+
+async def _dispatch_full_plan(ctx: Context, sender: str, text: str, topic: str, domain: str) -> str:
+    """Ask all three sub-agents at once under one group ID; each part is forwarded as soon as it arrives.
+    Parts already in the response cache go out with the acknowledgement and are not requested."""
+    label = topic.replace('_', ' ')
+    cache_keys = {kind: _cache_key(kind, sender, text, domain) for kind in FULL_PLAN_PARTS}
+    cached = {}
+    for kind in FULL_PLAN_PARTS:
+        hit = _cached_reply(kind, cache_keys[kind], topic)
+        if hit is not None:
+            cached[kind] = hit
+    cached_parts = "\n\n".join(
+        _full_plan_part(label, kind, delivered, len(FULL_PLAN_PARTS), part_text)
+        for delivered, (kind, part_text) in enumerate(cached.items(), 1)
+    )
+    missing = [kind for kind in FULL_PLAN_PARTS if kind not in cached]
+    if not missing:
+        return cached_parts
+    
+    workers = {kind: worker_pools[kind].pick() for kind in missing}
+    parts = request_tracker.track_group(sender, missing, label, timeout=FULL_PLAN_TIMEOUT_SECONDS, workers=workers,
+                                        cache_keys=cache_keys, group_size=len(FULL_PLAN_PARTS))
+    if parts is None:
+        return BUSY_MESSAGE
+    request_ids = {part.kind: part.request_id for part in parts}
+    deadline = parts[0].wall_deadline()
+    
+    await asyncio.to_thread(user_context_manager.flush)
+    
+    print(f"[MAIN AGENT] Fanning out full plan {parts[0].group_id} for topic: {topic}, domain: {domain}")
+    messages = {
+        "curriculum": CurriculumRequest(
+            domain=domain,
+            user_query=text,
+            original_sender=sender,
+            request_id=request_ids.get("curriculum", ""),
+            deadline=deadline
+        ),
+        "materials": MaterialsRequest(
+            topic=topic,
+            domain=domain,
+            user_query=text,
+            include_youtube=True,
+            original_sender=sender,
+            request_id=request_ids.get("materials", ""),
+            deadline=deadline
+        ),
+        "insights": InsightsRequest(
+            concept=topic,
+            domain=domain,
+            query_type="explain",
+            user_query=text,
+            original_sender=sender,
+            request_id=request_ids.get("insights", ""),
+            deadline=deadline
+        ),
+    }
+    await asyncio.gather(*(ctx.send(workers[kind], messages[kind]) for kind in missing))
+    adaptive_prefix = user_context_manager.get_adaptive_response_prefix(sender, label)
+    acknowledgement = f"{adaptive_prefix}Building your full plan for {label.title()}: a learning plan, resources and key concepts. I'll send each part as soon as it's ready."
+    return f"{acknowledgement}\n\n{cached_parts}" if cached_parts else acknowledgement
+
+async def _reply_to_request(ctx: Context, request_id: str, text: str, success: bool = True):
+    pending = request_tracker.complete(request_id)
+    if pending is None:
+        ctx.logger.warning(f"No pending request for request_id: {request_id} (already answered or timed out)")
+        return
+    metrics.incr(f"requests.{pending.kind}.response_seconds", time.monotonic() - pending.created_at)
+    response_cache.put(pending.cache_key, text, success)
+    if pending.group_id:
+        delivered = pending.group_size - request_tracker.group_remaining(pending.group_id)
+        text = _full_plan_part(pending.label, pending.kind, delivered, pending.group_size, text)
+    try:
+        await _send_to_user(ctx, pending.sender, create_text_chat(text))
+        ctx.logger.info(f"Sent {pending.kind} response to user {pending.sender}")
+    except Exception as e:
+        ctx.logger.error(f"Failed to send {pending.kind} response: {e}")
+
 @learning_agent.on_message(model=CurriculumResponse)
 async def handle_curriculum_response(ctx: Context, sender: str, msg: CurriculumResponse):
     ctx.logger.info(f"Received curriculum response from {sender}")
     
     if msg.success:
         ctx.logger.info("Curriculum generated successfully")
-        
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                response_message = create_text_chat(msg.curriculum)
-                await ctx.send(original_sender, response_message)
-                ctx.logger.info(f"Sent curriculum response to user {original_sender}")
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send curriculum response: {e}")
-        else:
-            ctx.logger.warning(f"No original sender found for request_id: {msg.request_id}")
+        await _reply_to_request(ctx, msg.request_id, decode_text(msg.curriculum, msg.encoding))
     else:
         ctx.logger.error(f"Curriculum generation failed: {msg.error}")
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                error_message = create_text_chat(f"Sorry, I couldn't generate the curriculum. Error: {msg.error}")
-                await ctx.send(original_sender, error_message)
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send error response: {e}")
+        await _reply_to_request(ctx, msg.request_id, f"Sorry, I couldn't generate the curriculum. Error: {msg.error}", success=False)
 
 @learning_agent.on_message(model=MaterialsResponse)
 async def handle_materials_response(ctx: Context, sender: str, msg: MaterialsResponse):
@@ -383,31 +613,10 @@ async def handle_materials_response(ctx: Context, sender: str, msg: MaterialsRes
     
     if msg.success:
         ctx.logger.info("Materials generated successfully")
-        full_response = msg.materials + msg.youtube_videos
-        
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                response_message = create_text_chat(full_response)
-                await ctx.send(original_sender, response_message)
-                ctx.logger.info(f"Sent materials response to user {original_sender}")
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send materials response: {e}")
-        else:
-            ctx.logger.warning(f"No original sender found for request_id: {msg.request_id}")
+        await _reply_to_request(ctx, msg.request_id, decode_text(msg.materials, msg.encoding) + decode_text(msg.youtube_videos, msg.encoding))
     else:
         ctx.logger.error(f"Materials generation failed: {msg.error}")
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                error_message = create_text_chat(f"Sorry, I couldn't find materials. Error: {msg.error}")
-                await ctx.send(original_sender, error_message)
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send error response: {e}")
+        await _reply_to_request(ctx, msg.request_id, f"Sorry, I couldn't find materials. Error: {msg.error}", success=False)
 
 @learning_agent.on_message(model=InsightsResponse)
 async def handle_insights_response(ctx: Context, sender: str, msg: InsightsResponse):
@@ -415,30 +624,57 @@ async def handle_insights_response(ctx: Context, sender: str, msg: InsightsRespo
     
     if msg.success:
         ctx.logger.info("Insights generated successfully")
-        
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                response_message = create_text_chat(msg.insights)
-                await ctx.send(original_sender, response_message)
-                ctx.logger.info(f"Sent insights response to user {original_sender}")
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send insights response: {e}")
-        else:
-            ctx.logger.warning(f"No original sender found for request_id: {msg.request_id}")
+        await _reply_to_request(ctx, msg.request_id, decode_text(msg.insights, msg.encoding))
     else:
         ctx.logger.error(f"Insights generation failed: {msg.error}")
-        original_sender = pending_requests.get(msg.request_id)
-        
-        if original_sender:
-            try:
-                error_message = create_text_chat(f"Sorry, I couldn't generate insights. Error: {msg.error}")
-                await ctx.send(original_sender, error_message)
-                del pending_requests[msg.request_id]
-            except Exception as e:
-                ctx.logger.error(f"Failed to send error response: {e}")
+        await _reply_to_request(ctx, msg.request_id, f"Sorry, I couldn't generate insights. Error: {msg.error}", success=False)
+
+@learning_agent.on_interval(period=REQUEST_SWEEP_INTERVAL)
+async def expire_pending_requests(ctx: Context):
+    missing_parts: Dict[str, List[Any]] = {}
+    expired = request_tracker.expire()
+    await _cancel_requests(ctx, expired)
+    for pending in expired:
+        ctx.logger.warning(f"{pending.kind} request {pending.request_id} timed out")
+        if pending.group_id:
+            missing_parts.setdefault(pending.group_id, []).append(pending)
+            continue
+        try:
+            await _send_to_user(ctx, pending.sender, create_text_chat(TIMEOUT_MESSAGES[pending.kind].format(label=pending.label or "your topic")))
+        except Exception as e:
+            ctx.logger.error(f"Failed to send timeout response: {e}")
+    
+    for parts in missing_parts.values():
+        missing = ", ".join(FULL_PLAN_PARTS[part.kind].lower() for part in parts)
+        try:
+            await _send_to_user(ctx, parts[0].sender, create_text_chat(
+                f"Sorry, part of your full plan for {parts[0].label.title()} didn't arrive in time ({missing}). Ask again for just that part and I'll retry it."
+            ))
+        except Exception as e:
+            ctx.logger.error(f"Failed to send timeout response: {e}")
+
+def _owns_user(user_id: str) -> bool:
+    """Shards share one store; each expires only the users the ring routes to it"""
+    return shard_ring is None or shard_ring.owner(user_id) == learning_agent.address
+
+@learning_agent.on_interval(period=USER_CONTEXT_MAINTENANCE_INTERVAL)
+async def expire_user_contexts(ctx: Context):
+    user_context_manager.run_maintenance(purge_store=True, owns=_owns_user)
+    admission_controller.prune_idle_buckets()
+
+@learning_agent.on_rest_get("/metrics", MetricsResponse)
+async def get_metrics(ctx: Context) -> MetricsResponse:
+    return MetricsResponse(metrics=metrics.snapshot())
+
+if METRICS_LOG_INTERVAL > 0:
+    @learning_agent.on_interval(period=METRICS_LOG_INTERVAL)
+    async def log_metrics(ctx: Context):
+        ctx.logger.info("Metrics: " + ", ".join(f"{name}={value:g}" for name, value in metrics.snapshot().items()))
+
+@learning_agent.on_event("shutdown")
+async def flush_user_contexts(ctx: Context):
+    user_context_manager.close()
+    ctx.logger.info("Flushed pending user context writes")
 
 learning_agent.include(learning_chat_proto, publish_manifest=True)
 
@@ -450,7 +686,9 @@ if __name__ == "__main__":
     print(f"Learning Path Agent: {learning_agent.address}")
     print(f"Agent Name: {AGENT_NAME}")
     print(f"Agent Description: {AGENT_DESCRIPTION}")
-    print(f"Port: 8000")
+    print(f"Port: {AGENT_PORT}")
+    if SHARDED:
+        print(f"Shard: {SHARD_INDEX + 1} of {SHARD_COUNT} behind router {ROUTER_ADDRESS}")
 
     print("\nStarting Learning Path Agent...")
     
@@ -20,21 +20,25 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, CURRICULUM_AGENT_SEED
-from services.gemini_service import GeminiLearningService
-from models import CurriculumRequest, CurriculumResponse
+from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, CURRICULUM_AGENT_SEED, USER_CONTEXT_MAINTENANCE_INTERVAL, AGENT_REPLICA_INDEX
+from services.gemini_service import gemini_service
+from services.user_context import user_context_manager
+from services.deadlines import DeadlineExceeded, request_budgets
+from services.worker_pool import replica_seed, replica_port
+from services.query_classifier import classify_query
+from services.payload_codec import encode_fields, split_message
+from models import CurriculumRequest, CurriculumResponse, CancelRequest
 
 curriculum_agent = Agent(
-    name="CurriculumAgent",
-    seed=CURRICULUM_AGENT_SEED,
-    port=8001,
-    mailbox=True
+    name=f"CurriculumAgent_{AGENT_REPLICA_INDEX}" if AGENT_REPLICA_INDEX else "CurriculumAgent",
+    seed=replica_seed(CURRICULUM_AGENT_SEED, AGENT_REPLICA_INDEX),
+    port=replica_port(8001, AGENT_REPLICA_INDEX),
+    mailbox=True,
+    handle_messages_concurrently=True
 )
 
 curriculum_chat_proto = Protocol(spec=chat_protocol_spec)
 
-gemini_service = GeminiLearningService()
-
 def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
     content = [TextContent(type="text", text=text)]
     if end_session:
@@ -92,8 +96,7 @@ What would you like to learn about?
             print(f"[CURRICULUM AGENT] Processing request: {item.text[:50]}...")
             ctx.logger.info(f"Text message from {sender}: {item.text}")
             
-            greeting_words = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings"]
-            if any(greeting in item.text.lower() for greeting in greeting_words):
+            if "greeting" in classify_query(item.text).intents:
                 greeting_response = await gemini_service.generate_conversational_response(
                     user_query=item.text,
                     context_type="curriculum_greeting",
@@ -106,8 +109,8 @@ What would you like to learn about?
                 response = await gemini_service.generate_curriculum("general", item.text, sender)
                 
                 print(f"[CURRICULUM AGENT] Curriculum generated, sending response...")
-                response_message = create_text_chat(response)
-                await ctx.send(sender, response_message)
+                for part in split_message(response):
+                    await ctx.send(sender, create_text_chat(part))
             
         elif isinstance(item, EndSessionContent):
             ctx.logger.info(f"Session ended with {sender}")
@@ -136,13 +139,17 @@ async def handle_curriculum_request(ctx: Context, sender: str, msg: CurriculumRe
     ctx.logger.info(f"Received curriculum request from {sender}: {msg.domain}")
     
     try:
-        curriculum = await gemini_service.generate_curriculum(msg.domain, msg.user_query, msg.original_sender)
+        curriculum = await request_budgets.run(msg.request_id, msg.deadline, gemini_service.generate_curriculum(msg.domain, msg.user_query, msg.original_sender))
+        fields, encoding = encode_fields({"curriculum": curriculum})
         await ctx.send(sender, CurriculumResponse(
-            curriculum=curriculum,
+            **fields,
             success=True,
-            request_id=msg.request_id
+            request_id=msg.request_id,
+            encoding=encoding
         ))
         ctx.logger.info(f"Sent curriculum response to {sender}")
+    except DeadlineExceeded as e:
+        ctx.logger.info(f"Dropped curriculum request {msg.request_id}: {e}")
     except Exception as e:
         ctx.logger.error(f"Error generating curriculum: {e}")
         await ctx.send(sender, CurriculumResponse(
@@ -152,6 +159,15 @@ async def handle_curriculum_request(ctx: Context, sender: str, msg: CurriculumRe
             request_id=msg.request_id
         ))
 
+@curriculum_agent.on_message(model=CancelRequest)
+async def handle_cancel_request(ctx: Context, sender: str, msg: CancelRequest):
+    if request_budgets.cancel(msg.request_id):
+        ctx.logger.info(f"Stopped curriculum request {msg.request_id} at the requester's request")
+
+@curriculum_agent.on_interval(period=USER_CONTEXT_MAINTENANCE_INTERVAL)
+async def evict_idle_user_contexts(ctx: Context):
+    user_context_manager.run_maintenance()
+
 curriculum_agent.include(curriculum_chat_proto, publish_manifest=True)
 
 if __name__ == "__main__":
@@ -160,8 +176,8 @@ if __name__ == "__main__":
     print("Curriculum Agent System")
     print("=" * 50)
     print(f"Curriculum Agent: {curriculum_agent.address}")
-    print(f"Agent Name: CurriculumAgent")
-    print(f"Port: 8001")
+    print(f"Agent Name: {curriculum_agent.name}")
+    print(f"Port: {replica_port(8001, AGENT_REPLICA_INDEX)}")
     print("\nStarting Curriculum Agent...")
     
     curriculum_agent.run()
@@ -20,21 +20,26 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, ENHANCED_AGENT_SEED
-from services.gemini_service import GeminiLearningService
-from models import InsightsRequest, InsightsResponse
+from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, ENHANCED_AGENT_SEED, USER_CONTEXT_MAINTENANCE_INTERVAL, AGENT_REPLICA_INDEX
+from services.gemini_service import gemini_service
+from services.user_context import user_context_manager
+from services.deadlines import DeadlineExceeded, request_budgets
+from services.worker_pool import replica_seed, replica_port
+from services.query_classifier import classify_query
+from services.payload_codec import encode_fields, split_message
+from services.topic_canonicalizer import extract_topic
+from models import InsightsRequest, InsightsResponse, CancelRequest
 
 enhanced_agent = Agent(
-    name="EnhancedAgent",
-    seed=ENHANCED_AGENT_SEED,
-    port=8003,
-    mailbox=True
+    name=f"EnhancedAgent_{AGENT_REPLICA_INDEX}" if AGENT_REPLICA_INDEX else "EnhancedAgent",
+    seed=replica_seed(ENHANCED_AGENT_SEED, AGENT_REPLICA_INDEX),
+    port=replica_port(8003, AGENT_REPLICA_INDEX),
+    mailbox=True,
+    handle_messages_concurrently=True
 )
 
 enhanced_chat_proto = Protocol(spec=chat_protocol_spec)
 
-gemini_service = GeminiLearningService()
-
 def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
     content = [TextContent(type="text", text=text)]
     if end_session:
@@ -45,50 +50,6 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
         content=content
     )
 
-def _extract_topic_from_query(query: str) -> str:
-    query_lower = query.lower()
-    words = query_lower.split()
-    
-    for i in range(len(words) - 1):
-        two_word = f"{words[i]}_{words[i+1]}"
-        if len(two_word) > 6:
-            return two_word
-    
-    for word in words:
-        if len(word) > 3 and word not in ["the", "and", "for", "with", "from", "that", "this", "will", "learn", "teach", "help", "want", "need"]:
-            return word
-    
-    return query_lower.replace(" ", "_")
-
-def _extract_domain_from_query(query: str) -> str:
-    query_lower = query.lower()
-    domain_keywords = {
-        "programming": ["code", "program", "software", "development", "coding", "python", "javascript", "java", "c++", "c#", "go", "rust"],
-        "data_science": ["data", "analysis", "statistics", "machine learning", "ai", "pandas", "numpy", "analytics", "big data"],
-        "web_development": ["web", "frontend", "backend", "full stack", "react", "vue", "angular", "nodejs", "javascript", "html", "css"],
-        "mobile_development": ["mobile", "app", "ios", "android", "swift", "kotlin", "react native", "flutter"],
-        "devops": ["devops", "docker", "kubernetes", "aws", "azure", "gcp", "ci/cd", "infrastructure", "deployment"],
-        "cybersecurity": ["cybersecurity", "security", "hacking", "penetration", "cyber", "ethical hacking", "network security"],
-        "design": ["design", "ui", "ux", "figma", "adobe", "user interface", "user experience", "visual design"],
-        "business": ["business", "marketing", "finance", "management", "entrepreneurship", "strategy"],
-        "science": ["science", "physics", "chemistry", "biology", "math", "mathematics", "research"],
-        "language": ["language", "english", "spanish", "french", "learning", "grammar", "linguistics"],
-        "music": ["music", "guitar", "piano", "singing", "composition", "audio", "sound"],
-        "art": ["art", "drawing", "painting", "sculpture", "digital art", "photography"],
-        "cooking": ["cooking", "baking", "culinary", "recipe", "chef", "food"],
-        "fitness": ["fitness", "exercise", "workout", "gym", "yoga", "running", "training"],
-        "psychology": ["psychology", "mental health", "therapy", "counseling", "behavior"],
-        "philosophy": ["philosophy", "ethics", "logic", "metaphysics", "thinking"],
-        "history": ["history", "historical", "ancient", "medieval", "modern", "world history"],
-        "literature": ["literature", "writing", "poetry", "novel", "creative writing", "reading"]
-    }
-    
-    for domain, keywords in domain_keywords.items():
-        if any(keyword in query_lower for keyword in keywords):
-            return domain
-    
-    return "general"
-
 @enhanced_chat_proto.on_message(ChatMessage)
 async def handle_enhanced_message(ctx: Context, sender: str, msg: ChatMessage):
     ctx.logger.info(f"Received message from {sender}")
@@ -136,8 +97,8 @@ What would you like to understand deeply?
             print(f"[ENHANCED AGENT] Processing request: {item.text[:50]}...")
             ctx.logger.info(f"Text message from {sender}: {item.text}")
             
-            greeting_words = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings"]
-            if any(greeting in item.text.lower() for greeting in greeting_words):
+            classification = classify_query(item.text)
+            if "greeting" in classification.intents:
                 greeting_response = await gemini_service.generate_conversational_response(
                     user_query=item.text,
                     context_type="enhanced_greeting",
@@ -146,14 +107,14 @@ What would you like to understand deeply?
                 response_message = create_text_chat(greeting_response)
                 await ctx.send(sender, response_message)
             else:
-                concept = _extract_topic_from_query(item.text)
-                domain = _extract_domain_from_query(item.text)
+                concept = extract_topic(item.text)
+                domain = classification.domain
                 print(f"[ENHANCED AGENT] Generating insights for concept: {concept}, domain: {domain}")
                 response = await gemini_service.generate_deep_insights(concept, domain, item.text)
                 
                 print(f"[ENHANCED AGENT] Insights generated, sending response...")
-                response_message = create_text_chat(response)
-                await ctx.send(sender, response_message)
+                for part in split_message(response):
+                    await ctx.send(sender, create_text_chat(part))
             
         elif isinstance(item, EndSessionContent):
             ctx.logger.info(f"Session ended with {sender}")
@@ -182,13 +143,17 @@ async def handle_insights_request(ctx: Context, sender: str, msg: InsightsReques
     ctx.logger.info(f"Received insights request from {sender}: {msg.concept} in {msg.domain}")
     
     try:
-        insights = await gemini_service.generate_deep_insights(msg.concept, msg.domain, msg.user_query)
+        insights = await request_budgets.run(msg.request_id, msg.deadline, gemini_service.generate_deep_insights(msg.concept, msg.domain, msg.user_query))
+        fields, encoding = encode_fields({"insights": insights})
         await ctx.send(sender, InsightsResponse(
-            insights=insights,
+            **fields,
             success=True,
-            request_id=msg.request_id
+            request_id=msg.request_id,
+            encoding=encoding
         ))
         ctx.logger.info(f"Sent insights response to {sender}")
+    except DeadlineExceeded as e:
+        ctx.logger.info(f"Dropped insights request {msg.request_id}: {e}")
     except Exception as e:
         ctx.logger.error(f"Error generating insights: {e}")
         await ctx.send(sender, InsightsResponse(
@@ -198,6 +163,15 @@ async def handle_insights_request(ctx: Context, sender: str, msg: InsightsReques
             request_id=msg.request_id
         ))
 
+@enhanced_agent.on_message(model=CancelRequest)
+async def handle_cancel_request(ctx: Context, sender: str, msg: CancelRequest):
+    if request_budgets.cancel(msg.request_id):
+        ctx.logger.info(f"Stopped insights request {msg.request_id} at the requester's request")
+
+@enhanced_agent.on_interval(period=USER_CONTEXT_MAINTENANCE_INTERVAL)
+async def evict_idle_user_contexts(ctx: Context):
+    user_context_manager.run_maintenance()
+
 enhanced_agent.include(enhanced_chat_proto, publish_manifest=True)
 
 if __name__ == "__main__":
@@ -206,8 +180,8 @@ if __name__ == "__main__":
     print("Enhanced Learning Agent System")
     print("=" * 50)
     print(f"Enhanced Agent: {enhanced_agent.address}")
-    print(f"Agent Name: EnhancedAgent")
-    print(f"Port: 8003")
+    print(f"Agent Name: {enhanced_agent.name}")
+    print(f"Port: {replica_port(8003, AGENT_REPLICA_INDEX)}")
     print("\nStarting Enhanced Learning Agent...")
     
     enhanced_agent.run()
@@ -10,6 +10,8 @@ import threading
 import requests
 from multiprocessing import Process
 
+from config import DEPLOYMENT_MODE, CURRICULUM_AGENT_REPLICAS, MATERIALS_AGENT_REPLICAS, ENHANCED_AGENT_REPLICAS, SHARD_COUNT
+
 running_processes = []
 
 def cleanup_processes():
@@ -25,50 +27,67 @@ def cleanup_processes():
                 process.kill()
     print("Cleanup complete.")
 
-def start_agent(agent_file, delay=0):
+def start_agent(agent_file, delay=0, env=None, label=None):
     if delay > 0:
         time.sleep(delay)
     
+    label = label or agent_file
     try:
-        print(f"Starting {agent_file}...")
+        print(f"Starting {label}...")
         process = subprocess.Popen([sys.executable, agent_file], 
                                  stdout=subprocess.PIPE, 
                                  stderr=subprocess.STDOUT,
                                  universal_newlines=True,
-                                 bufsize=1)
+                                 bufsize=1,
+                                 env=env)
         running_processes.append(process)
-        print(f"{agent_file} started (PID: {process.pid})")
+        print(f"{label} started (PID: {process.pid})")
         
         def log_reader():
             try:
                 for line in iter(process.stdout.readline, ''):
                     if line:
                         timestamp = time.strftime("%H:%M:%S")
-                        print(f"[{timestamp}] [{agent_file}] {line.rstrip()}")
+                        print(f"[{timestamp}] [{label}] {line.rstrip()}")
             except Exception as e:
-                print(f"Log reader error for {agent_file}: {e}")
+                print(f"Log reader error for {label}: {e}")
         
         log_thread = threading.Thread(target=log_reader, daemon=True)
         log_thread.start()
         
         return process
     except Exception as e:
-        print(f"Failed to start {agent_file}: {e}")
+        print(f"Failed to start {label}: {e}")
         return None
 
 def start_all_agents():
     print("Starting EduFinder Multi-Agent System...")
     
+    if DEPLOYMENT_MODE == "bureau":
+        process = start_agent("bureau.py")
+        print("All agents started in a single Bureau process!")
+        return [process] if process else []
+    
+    # Each sub-agent role runs as a pool of replicas; replica i derives its seed and port from its index.
     agents = [
-        ("agents/curriculum_agent.py", 0),
-        ("agents/materials_agent.py", 3),
-        ("agents/enhanced_agent.py", 6),
-        ("agent.py", 9)
+        ("agents/curriculum_agent.py", CURRICULUM_AGENT_REPLICAS, 0),
+        ("agents/materials_agent.py", MATERIALS_AGENT_REPLICAS, 3),
+        ("agents/enhanced_agent.py", ENHANCED_AGENT_REPLICAS, 6),
+        ("agent.py", max(SHARD_COUNT, 1), 9)
     ]
     
     processes = []
-    for agent_file, delay in agents:
-        process = start_agent(agent_file, delay)
+    for agent_file, replicas, delay in agents:
+        for index in range(max(replicas, 1)):
+            env = dict(os.environ, AGENT_REPLICA_INDEX=str(index), SHARD_INDEX=str(index))
+            label = f"{agent_file}#{index}" if replicas > 1 else agent_file
+            process = start_agent(agent_file, delay if index == 0 else 0, env=env, label=label)
+            if process:
+                processes.append(process)
+    
+    # Sharded main agent: the router goes last so its membership announcement reaches running shards.
+    if SHARD_COUNT > 1:
+        process = start_agent("router.py", 3)
         if process:
             processes.append(process)
     
@@ -0,0 +1,35 @@
+from uagents import Bureau
+
+from config import BUREAU_PORT
+import agent
+from agent import learning_agent
+from agents.curriculum_agent import curriculum_agent
+from agents.materials_agent import materials_agent
+from agents.enhanced_agent import enhanced_agent
+
+def build_bureau(port: int = BUREAU_PORT) -> Bureau:
+    """All four agents in one process and one event loop.
+
+    They share the module-level Gemini service, semantic cache, request tracker and
+    user context manager, and messages between them go through the in-process
+    dispatcher instead of the mailbox. Each worker pool is narrowed to the one
+    sub-agent in this process, so every hop stays local.
+    """
+    agent.worker_pools["curriculum"].addresses = [curriculum_agent.address]
+    agent.worker_pools["materials"].addresses = [materials_agent.address]
+    agent.worker_pools["insights"].addresses = [enhanced_agent.address]
+    return Bureau(agents=[learning_agent, curriculum_agent, materials_agent, enhanced_agent], port=port)
+
+if __name__ == "__main__":
+    bureau = build_bureau()
+
+    print("Learning Path Agent System (single-process Bureau)")
+    print("=" * 50)
+    print(f"Learning Path Agent: {learning_agent.address}")
+    print(f"Curriculum Agent: {curriculum_agent.address}")
+    print(f"Materials Agent: {materials_agent.address}")
+    print(f"Enhanced Agent: {enhanced_agent.address}")
+    print(f"Port: {BUREAU_PORT}")
+    print("\nStarting Bureau...")
+
+    bureau.run()
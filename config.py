@@ -14,6 +14,81 @@ ENHANCED_AGENT_SEED = os.getenv("ENHANCED_AGENT_SEED")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+USER_CONTEXT_DB_PATH = os.getenv("USER_CONTEXT_DB_PATH", "user_contexts.db")
+USER_CONTEXT_WRITE_MODE = os.getenv("USER_CONTEXT_WRITE_MODE", "write_behind")
+USER_CONTEXT_FLUSH_INTERVAL = float(os.getenv("USER_CONTEXT_FLUSH_INTERVAL", "1.0"))
+USER_CONTEXT_MAX_DIRTY = int(os.getenv("USER_CONTEXT_MAX_DIRTY", "256"))
+USER_CONTEXT_READ_TTL = float(os.getenv("USER_CONTEXT_READ_TTL", "0"))
+USER_CONTEXT_BUSY_TIMEOUT_MS = int(os.getenv("USER_CONTEXT_BUSY_TIMEOUT_MS", "5000"))
+USER_CONTEXT_CACHE_SIZE = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "1024"))
+USER_HISTORY_WINDOW = int(os.getenv("USER_HISTORY_WINDOW", "20"))
+USER_HISTORY_COMPACT_BATCH = int(os.getenv("USER_HISTORY_COMPACT_BATCH", "20"))
+USER_HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("USER_HISTORY_SUMMARY_MAX_CHARS", "1500"))
+USER_HISTORY_ARCHIVE_DIR = os.getenv("USER_HISTORY_ARCHIVE_DIR", "history_archive")
+USER_HISTORY_ARCHIVE_SHARDS = int(os.getenv("USER_HISTORY_ARCHIVE_SHARDS", "16"))
+USER_CONTEXT_IDLE_SECONDS = float(os.getenv("USER_CONTEXT_IDLE_SECONDS", "1800"))
+USER_CONTEXT_RETENTION_DAYS = int(os.getenv("USER_CONTEXT_RETENTION_DAYS", "30"))
+USER_CONTEXT_MAINTENANCE_INTERVAL = float(os.getenv("USER_CONTEXT_MAINTENANCE_INTERVAL", "30"))
+USER_CONTEXT_MAINTENANCE_SLICE = int(os.getenv("USER_CONTEXT_MAINTENANCE_SLICE", "100"))
+
+MESSAGE_DEBOUNCE_SECONDS = float(os.getenv("MESSAGE_DEBOUNCE_SECONDS", "0"))
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+SEMANTIC_CACHE_MAX_NAMESPACES = int(os.getenv("SEMANTIC_CACHE_MAX_NAMESPACES", "128"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "1024"))
+SEMANTIC_CACHE_AUDIT_LOG = os.getenv("SEMANTIC_CACHE_AUDIT_LOG", "semantic_cache_audit.jsonl")
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_NEGATIVE_TTL = float(os.getenv("RESPONSE_CACHE_NEGATIVE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+REQUEST_MAX_PENDING = int(os.getenv("REQUEST_MAX_PENDING", "1000"))
+REQUEST_SWEEP_INTERVAL = float(os.getenv("REQUEST_SWEEP_INTERVAL", "1.0"))
+
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "true").lower() == "true"
+PAYLOAD_COMPRESSION_MIN_BYTES = int(os.getenv("PAYLOAD_COMPRESSION_MIN_BYTES", "1024"))
+USER_MESSAGE_MAX_CHARS = int(os.getenv("USER_MESSAGE_MAX_CHARS", "4000"))
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "0.5"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "5"))
+MAX_INFLIGHT_GENERATIONS = int(os.getenv("MAX_INFLIGHT_GENERATIONS", "32"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "64"))
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "60"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "1"))
+LLM_BULK_MAX_WAIT_SECONDS = float(os.getenv("LLM_BULK_MAX_WAIT_SECONDS", "10"))
+DEGRADATION_ENABLED = os.getenv("DEGRADATION_ENABLED", "true").lower() == "true"
+DEGRADATION_LATENCY_HIGH = float(os.getenv("DEGRADATION_LATENCY_HIGH", "15"))
+DEGRADATION_LATENCY_LOW = float(os.getenv("DEGRADATION_LATENCY_LOW", "6"))
+DEGRADATION_QUEUE_HIGH = int(os.getenv("DEGRADATION_QUEUE_HIGH", "8"))
+DEGRADATION_QUEUE_LOW = int(os.getenv("DEGRADATION_QUEUE_LOW", "2"))
+DEGRADATION_WINDOW_SECONDS = float(os.getenv("DEGRADATION_WINDOW_SECONDS", "60"))
+DEGRADATION_STEP_SECONDS = float(os.getenv("DEGRADATION_STEP_SECONDS", "15"))
+FULL_PLAN_DEFAULT = os.getenv("FULL_PLAN_DEFAULT", "false").lower() == "true"
+FULL_PLAN_TIMEOUT_SECONDS = float(os.getenv("FULL_PLAN_TIMEOUT_SECONDS", "180"))
+
+DEPLOYMENT_MODE = os.getenv("DEPLOYMENT_MODE", "processes").lower()
+BUREAU_PORT = int(os.getenv("BUREAU_PORT", "8000"))
+
+CURRICULUM_AGENT_REPLICAS = int(os.getenv("CURRICULUM_AGENT_REPLICAS", "1"))
+MATERIALS_AGENT_REPLICAS = int(os.getenv("MATERIALS_AGENT_REPLICAS", "1"))
+ENHANCED_AGENT_REPLICAS = int(os.getenv("ENHANCED_AGENT_REPLICAS", "1"))
+CURRICULUM_AGENT_ADDRESSES = os.getenv("CURRICULUM_AGENT_ADDRESSES", "")
+MATERIALS_AGENT_ADDRESSES = os.getenv("MATERIALS_AGENT_ADDRESSES", "")
+ENHANCED_AGENT_ADDRESSES = os.getenv("ENHANCED_AGENT_ADDRESSES", "")
+WORKER_SELECTION = os.getenv("WORKER_SELECTION", "least_outstanding").lower()
+AGENT_REPLICA_INDEX = int(os.getenv("AGENT_REPLICA_INDEX", "0"))
+REPLICA_PORT_STRIDE = int(os.getenv("REPLICA_PORT_STRIDE", "10"))
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "8100"))
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "128"))
+
 METTA_ENDPOINT = os.getenv("METTA_ENDPOINT", "http://localhost:8080")
 METTA_SPACE = os.getenv("METTA_SPACE", "learning_space")
 METTA_USE_MOCK = os.getenv("METTA_USE_MOCK", "false").lower() == "true"
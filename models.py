@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from uagents import Model
 
 class Request(Model):
@@ -17,12 +19,14 @@ class CurriculumRequest(Model):
     user_query: str
     original_sender: str = ""
     request_id: str = ""
+    deadline: float = 0.0
 
 class CurriculumResponse(Model):
     curriculum: str
     success: bool = True
     error: str = ""
     request_id: str = ""
+    encoding: str = ""
 
 class MaterialsRequest(Model):
     topic: str
@@ -31,6 +35,7 @@ class MaterialsRequest(Model):
     include_youtube: bool = True
     original_sender: str = ""
     request_id: str = ""
+    deadline: float = 0.0
 
 class MaterialsResponse(Model):
     materials: str
@@ -38,6 +43,7 @@ class MaterialsResponse(Model):
     success: bool = True
     error: str = ""
     request_id: str = ""
+    encoding: str = ""
 
 class InsightsRequest(Model):
     concept: str
@@ -46,9 +52,28 @@ class InsightsRequest(Model):
     user_query: str = ""
     original_sender: str = ""
     request_id: str = ""
+    deadline: float = 0.0
 
 class InsightsResponse(Model):
     insights: str
     success: bool = True
     error: str = ""
     request_id: str = ""
+    encoding: str = ""
+
+class CancelRequest(Model):
+    request_id: str
+
+class ShardChatMessage(Model):
+    user: str
+    message: str
+
+class ShardChatReply(Model):
+    user: str
+    message: str
+
+class ShardMembership(Model):
+    shards: List[str]
+
+class MetricsResponse(Model):
+    metrics: Dict[str, float]
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from uagents import Agent, Context, Protocol
+from uagents.setup import fund_agent_if_low
+from uagents_core.contrib.protocols.chat import (
+    ChatAcknowledgement,
+    ChatMessage,
+    chat_protocol_spec,
+)
+
+from config import AGENT_SEED, AGENT_NAME, AGENT_DESCRIPTION, SHARD_COUNT
+from services.shard_ring import ConsistentHashRing, shard_addresses
+from models import ShardChatMessage, ShardChatReply, ShardMembership
+
+# The router takes over the main agent's public address; shards derive theirs from it.
+router_agent = Agent(
+    name=AGENT_NAME,
+    seed=AGENT_SEED,
+    port=8000,
+    mailbox=True,
+    handle_messages_concurrently=True
+)
+
+router_chat_proto = Protocol(spec=chat_protocol_spec)
+
+shard_ring = ConsistentHashRing(shard_addresses(AGENT_SEED, max(SHARD_COUNT, 1)))
+shard_set = set(shard_ring.nodes)
+
+@router_chat_proto.on_message(ChatMessage)
+async def route_message(ctx: Context, sender: str, msg: ChatMessage):
+    await ctx.send(sender, ChatAcknowledgement(
+        timestamp=datetime.utcnow(),
+        acknowledged_msg_id=msg.msg_id
+    ))
+    shard = shard_ring.owner(sender)
+    ctx.logger.info(f"Routing message from {sender} to shard {shard}")
+    await ctx.send(shard, ShardChatMessage(user=sender, message=msg.model_dump_json()))
+
+@router_chat_proto.on_message(ChatAcknowledgement)
+async def handle_acknowledgement(ctx: Context, sender: str, msg: ChatAcknowledgement):
+    ctx.logger.info(f"Received acknowledgement from {sender} for message {msg.acknowledged_msg_id}")
+
+@router_agent.on_message(model=ShardChatReply)
+async def relay_reply(ctx: Context, sender: str, msg: ShardChatReply):
+    if sender not in shard_set:
+        ctx.logger.warning(f"Ignoring reply from {sender}, which is not a shard")
+        return
+    await ctx.send(msg.user, ChatMessage.model_validate_json(msg.message))
+
+@router_agent.on_event("startup")
+async def announce_membership(ctx: Context):
+    """Rebalancing path: after a restart with a different SHARD_COUNT every shard
+    learns the new ring and releases the users it no longer owns; the new owners
+    load them from the shared store on their next message."""
+    for shard in shard_ring.nodes:
+        await ctx.send(shard, ShardMembership(shards=shard_ring.nodes))
+    ctx.logger.info(f"Announced ring of {len(shard_ring.nodes)} shards")
+
+router_agent.include(router_chat_proto, publish_manifest=True)
+
+if __name__ == "__main__":
+    fund_agent_if_low(router_agent.wallet.address())
+
+    print("Learning Path Agent Router")
+    print("=" * 50)
+    print(f"Router: {router_agent.address}")
+    print(f"Agent Name: {AGENT_NAME}")
+    print(f"Agent Description: {AGENT_DESCRIPTION}")
+    for index, shard in enumerate(shard_ring.nodes):
+        print(f"Shard {index}: {shard}")
+    print("Port: 8000")
+
+    print("\nStarting Router...")
+
+    router_agent.run()
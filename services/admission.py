@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from config import ADMISSION_RATE_PER_SECOND, ADMISSION_BURST, MAX_INFLIGHT_GENERATIONS, ADMISSION_MAX_QUEUED
+from services.metrics import metrics
+
+@dataclass(slots=True)
+class TokenBucket:
+    tokens: float
+    updated: float
+
+class AdmissionController:
+    """Per-sender token buckets in front of a global cap on in-flight generations.
+
+    ``allow`` is checked as each message arrives, so a flooding sender is turned
+    away before debounce or turn locks hold a coroutine for it. ``acquire`` hands
+    out one of ``max_in_flight`` generation slots in FIFO order; at most
+    ``max_queued`` callers wait for one, and anyone beyond that is rejected at once.
+    """
+    def __init__(self, rate: float = ADMISSION_RATE_PER_SECOND, burst: float = ADMISSION_BURST,
+                 max_in_flight: int = MAX_INFLIGHT_GENERATIONS, max_queued: int = ADMISSION_MAX_QUEUED):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        metrics.gauge("admission.in_flight", lambda: self.in_flight)
+        metrics.gauge("admission.queue_depth", lambda: len(self._waiters))
+        metrics.gauge("admission.tracked_senders", lambda: len(self._buckets))
+
+    def allow(self, sender: str, now: Optional[float] = None) -> bool:
+        """Spend one token from the sender's bucket; False when it is empty"""
+        if self.rate <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(sender)
+        if bucket is None:
+            bucket = self._buckets[sender] = TokenBucket(tokens=self.burst, updated=now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            metrics.incr("admission.rate_limited")
+            return False
+        bucket.tokens -= 1
+        return True
+
+    async def acquire(self, on_queued: Optional[Callable[[], Awaitable]] = None) -> bool:
+        """Take a generation slot, waiting in line if needed; False when the line is full.
+
+        ``on_queued`` runs once if the caller has to wait, so it can tell the user.
+        Every True must be paired with ``release``.
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            metrics.incr("admission.admitted")
+            return True
+        if len(self._waiters) >= self.max_queued:
+            metrics.incr("admission.rejected")
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.incr("admission.queued")
+        try:
+            if on_queued is not None:
+                await on_queued()
+            await waiter
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        metrics.incr("admission.admitted")
+        return True
+
+    def release(self):
+        """Hand the slot straight to the next waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def prune_idle_buckets(self, now: Optional[float] = None) -> int:
+        """Forget senders whose bucket has refilled; a new bucket starts full anyway"""
+        now = time.monotonic() if now is None else now
+        idle = [
+            sender for sender, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated) * self.rate >= self.burst
+        ]
+        for sender in idle:
+            del self._buckets[sender]
+        return len(idle)
+
+admission_controller = AdmissionController()
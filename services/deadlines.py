@@ -0,0 +1,101 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from services.metrics import metrics
+
+CANCELLED_MEMORY_SECONDS = 600
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed, or its sender cancelled it, before the work finished"""
+
+@dataclass(slots=True)
+class RequestBudget:
+    request_id: str
+    deadline: float = 0.0
+    cancelled: bool = False
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when the request carries no deadline"""
+        return None if not self.deadline else self.deadline - time.time()
+
+    def check(self, stage: str):
+        if self.cancelled:
+            raise DeadlineExceeded(f"cancelled before {stage}")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"deadline passed {-remaining:.1f}s before {stage}")
+
+_current_budget: ContextVar[Optional[RequestBudget]] = ContextVar("request_budget", default=None)
+
+def remaining_budget() -> Optional[float]:
+    budget = _current_budget.get()
+    return None if budget is None else budget.remaining()
+
+def check_budget(stage: str):
+    """Raise DeadlineExceeded if the request this code is running for is already dead"""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.check(stage)
+
+class RequestBudgets:
+    """Runs each sub-agent request as its own task under an absolute deadline.
+
+    Deadlines are wall-clock epoch seconds, since they cross processes. The budget
+    is visible to everything the task awaits (and to threads started with
+    asyncio.to_thread), so Gemini and YouTube calls can size their own timeouts.
+    ``cancel`` stops a running request, or one that has not started yet.
+    """
+    def __init__(self):
+        self._active: Dict[str, Tuple[RequestBudget, asyncio.Task]] = {}
+        self._cancelled: Dict[str, float] = {}
+
+    async def run(self, request_id: str, deadline: float, work: Awaitable[Any]) -> Any:
+        budget = RequestBudget(request_id=request_id, deadline=deadline, cancelled=request_id in self._cancelled)
+        try:
+            budget.check("start")
+        except DeadlineExceeded:
+            metrics.incr("deadlines.dropped_before_start")
+            if asyncio.iscoroutine(work):
+                work.close()
+            raise
+        token = _current_budget.set(budget)
+        try:
+            task = asyncio.ensure_future(work)
+        finally:
+            _current_budget.reset(token)
+        if request_id:
+            self._active[request_id] = (budget, task)
+        try:
+            return await asyncio.wait_for(task, budget.remaining())
+        except asyncio.TimeoutError:
+            metrics.incr("deadlines.expired_during")
+            raise DeadlineExceeded("deadline passed while working") from None
+        except asyncio.CancelledError:
+            if budget.cancelled and task.cancelled():
+                metrics.incr("deadlines.cancelled_during")
+                raise DeadlineExceeded("cancelled while working") from None
+            raise
+        except DeadlineExceeded:
+            metrics.incr("deadlines.expired_during")
+            raise
+        finally:
+            self._active.pop(request_id, None)
+
+    def cancel(self, request_id: str) -> bool:
+        """True if the request was running and has been stopped"""
+        now = time.time()
+        self._cancelled[request_id] = now + CANCELLED_MEMORY_SECONDS
+        for stale in [key for key, until in self._cancelled.items() if until < now]:
+            del self._cancelled[stale]
+        active = self._active.get(request_id)
+        if active is None:
+            return False
+        budget, task = active
+        budget.cancelled = True
+        task.cancel()
+        return True
+
+request_budgets = RequestBudgets()
@@ -0,0 +1,89 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+from config import (
+    DEGRADATION_ENABLED,
+    DEGRADATION_LATENCY_HIGH,
+    DEGRADATION_LATENCY_LOW,
+    DEGRADATION_QUEUE_HIGH,
+    DEGRADATION_QUEUE_LOW,
+    DEGRADATION_WINDOW_SECONDS,
+    DEGRADATION_STEP_SECONDS,
+)
+from services.metrics import metrics
+from services.priority_scheduler import priority_scheduler
+
+# Optional stages, shed in this order as pressure rises and restored in reverse.
+SHEDDABLE_STAGES = ("metta_enrichment", "video_search", "conversational_preamble")
+
+class DegradationController:
+    """Turns optional enrichment stages off under load and back on as it eases.
+
+    Pressure is the p95 of recent generation latencies and the scheduler's queue
+    depth. Level ``n`` disables the first ``n`` of SHEDDABLE_STAGES. The level moves
+    one step at a time, at most once per ``step_seconds``, and only drops once both
+    signals are under their low marks, so it does not flap around a threshold.
+    """
+    def __init__(self, queue_depth: Callable[[], int], enabled: bool = DEGRADATION_ENABLED,
+                 latency_high: float = DEGRADATION_LATENCY_HIGH, latency_low: float = DEGRADATION_LATENCY_LOW,
+                 queue_high: int = DEGRADATION_QUEUE_HIGH, queue_low: int = DEGRADATION_QUEUE_LOW,
+                 window_seconds: float = DEGRADATION_WINDOW_SECONDS, step_seconds: float = DEGRADATION_STEP_SECONDS):
+        self.queue_depth = queue_depth
+        self.is_enabled = enabled
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.window_seconds = window_seconds
+        self.step_seconds = step_seconds
+        self.level = 0
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=1024)
+        self._changed_at = float("-inf")
+        self._evaluated_at = float("-inf")
+        metrics.gauge("degradation.level", lambda: self.level)
+        metrics.gauge("degradation.latency_p95", self.latency_percentile)
+
+    def record_latency(self, seconds: float, now: Optional[float] = None):
+        self._samples.append((time.monotonic() if now is None else now, seconds))
+
+    def latency_percentile(self, q: float = 0.95, now: Optional[float] = None) -> float:
+        """Over the last ``window_seconds`` only, so an idle agent reads as unloaded"""
+        cutoff = (time.monotonic() if now is None else now) - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+        latencies = sorted(latency for _, latency in self._samples)
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+    def evaluate(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        self._evaluated_at = now
+        if not self.is_enabled or now - self._changed_at < self.step_seconds:
+            return self.level
+        p95 = self.latency_percentile(now=now)
+        depth = self.queue_depth()
+        if (p95 >= self.latency_high or depth >= self.queue_high) and self.level < len(SHEDDABLE_STAGES):
+            self._set_level(self.level + 1, now, "raised", f"p95 {p95:.1f}s, queue {depth}")
+        elif p95 <= self.latency_low and depth <= self.queue_low and self.level > 0:
+            self._set_level(self.level - 1, now, "lowered", f"p95 {p95:.1f}s, queue {depth}")
+        return self.level
+
+    def _set_level(self, level: int, now: float, direction: str, reason: str):
+        stage = SHEDDABLE_STAGES[max(level, self.level) - 1]
+        self.level = level
+        self._changed_at = now
+        metrics.incr(f"degradation.{direction}")
+        print(f"[DEGRADATION] Level {level}: {'disabled' if direction == 'raised' else 're-enabled'} {stage} ({reason})")
+
+    def enabled(self, stage: str) -> bool:
+        """Whether an optional stage should run now; re-evaluates at most once a second"""
+        if time.monotonic() - self._evaluated_at >= 1.0:
+            self.evaluate()
+        if SHEDDABLE_STAGES.index(stage) >= self.level:
+            return True
+        metrics.incr(f"degradation.skipped.{stage}")
+        return False
+
+degradation_controller = DegradationController(queue_depth=priority_scheduler.queue_depth)
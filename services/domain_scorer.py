@@ -0,0 +1,201 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Queries scored per NumPy pass in score_batch.
+BATCH_CHUNK_SIZE = 4096
+
+# Words with optional dotted/slashed parts and a trailing +/# so "c++", "c#",
+# "ci/cd" and "node.js" stay single tokens while "explain" never yields "ai".
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[/.][a-z0-9]+)*[+#]*")
+
+# TOKEN_PATTERN plus newlines, so a batch of newline-joined queries tokenizes in one pass.
+BATCH_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern + r"|\n")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class DomainScorer:
+    """Ranks domains for a query from a keyword-by-domain weight matrix.
+
+    A keyword's weight is its length in words divided by the number of domains
+    that list it, halved again when it is also a word of an intent phrase ("find",
+    "plan"), so specific phrases outvote generic ones. Queries become sparse
+    keyword-count vectors; batches are scored as sparse row sums in NumPy.
+    """
+    def __init__(self, domain_keywords: Dict[str, List[str]], intent_phrases: Optional[Dict[str, List[str]]] = None):
+        self.domains = list(domain_keywords)
+        intent_terms = {
+            term
+            for phrases in (intent_phrases or {}).values()
+            for phrase in phrases
+            for term in [" ".join(tokenize(phrase)), *tokenize(phrase)]
+        }
+
+        keyword_domains: Dict[str, List[int]] = {}
+        for column, keywords in enumerate(domain_keywords.values()):
+            for keyword in keywords:
+                key = " ".join(tokenize(keyword))
+                if key and column not in keyword_domains.setdefault(key, []):
+                    keyword_domains[key].append(column)
+
+        self.vocabulary = {keyword: row for row, keyword in enumerate(keyword_domains)}
+        self._bigram_starts = frozenset(keyword.split()[0] for keyword in self.vocabulary if " " in keyword)
+        self._postings: List[List[Tuple[int, float]]] = []
+        for keyword, columns in keyword_domains.items():
+            weight = len(keyword.split()) / len(columns)
+            if keyword in intent_terms:
+                weight /= 2
+            self._postings.append([(column, weight) for column in columns])
+
+        if NUMPY_AVAILABLE:
+            self.matrix = np.zeros((len(self.vocabulary), len(self.domains)), dtype=np.float32)
+            for row, postings in enumerate(self._postings):
+                for column, weight in postings:
+                    self.matrix[row, column] = weight
+        else:
+            self.matrix = None
+
+    def _rows(self, query: str) -> List[int]:
+        return self._token_rows(tokenize(query))
+
+    def _token_rows(self, tokens: List[str], separator: Optional[str] = None) -> List[int]:
+        """Keyword rows found in the tokens; a two-word keyword consumes both tokens,
+        so "machine learning" does not also count as "machine". Each ``separator``
+        token is reported as row -1."""
+        vocabulary = self.vocabulary
+        bigram_starts = self._bigram_starts
+        rows = []
+        i = 0
+        while i < len(tokens):
+            if tokens[i] == separator:
+                rows.append(-1)
+                i += 1
+                continue
+            if i + 1 < len(tokens) and tokens[i] in bigram_starts:
+                row = vocabulary.get(f"{tokens[i]} {tokens[i + 1]}")
+                if row is not None:
+                    rows.append(row)
+                    i += 2
+                    continue
+            row = vocabulary.get(tokens[i])
+            if row is not None:
+                rows.append(row)
+            i += 1
+        return rows
+
+    def _ranked(self, scores: Dict[int, float], k: int) -> List[Tuple[str, float]]:
+        total = sum(scores.values())
+        if total <= 0:
+            return []
+        order = sorted(scores, key=lambda column: (-scores[column], column))
+        return [(self.domains[column], float(scores[column]) / total) for column in order[:k]]
+
+    def score(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Top ``k`` domains as ``(domain, confidence)``; confidences are shares of the total score.
+
+        A single query touches a handful of keyword rows, so the product is taken over
+        the matrix's sparse rows directly; score_batch does the same for many queries in NumPy.
+        """
+        return self.score_tokens(tokenize(query), k)
+
+    def score_tokens(self, tokens: List[str], k: int = 3) -> List[Tuple[str, float]]:
+        """``score`` for a query that has already been tokenized"""
+        scores: Dict[int, float] = {}
+        for row in self._token_rows(tokens):
+            for column, weight in self._postings[row]:
+                scores[column] = scores.get(column, 0.0) + weight
+        return self._ranked(scores, k)
+
+    def score_batch(self, queries: Iterable[str], k: int = 3, chunk_size: int = BATCH_CHUNK_SIZE) -> List[List[Tuple[str, float]]]:
+        """Score many queries as a sparse (queries x keywords) @ (keywords x domains) product.
+
+        Each query's matched keyword rows are gathered from the matrix and summed with
+        ``np.add.reduceat``, so memory grows with the keywords actually found rather
+        than queries x vocabulary. Queries go through in chunks of ``chunk_size``.
+        """
+        queries = list(queries)
+        if self.matrix is None:
+            return [self.score(query, k) for query in queries]
+        ranked: List[List[Tuple[str, float]]] = []
+        for start in range(0, len(queries), chunk_size):
+            ranked.extend(self._score_chunk(queries[start:start + chunk_size], k))
+        return ranked
+
+    def _score_chunk(self, queries: List[str], k: int) -> List[List[Tuple[str, float]]]:
+        """One regex pass and one keyword walk over the newline-joined chunk"""
+        text = "\n".join(queries)
+        if text.count("\n") != len(queries) - 1:
+            text = "\n".join(query.replace("\n", " ") for query in queries)
+        rows = np.array(self._token_rows(BATCH_TOKEN_PATTERN.findall(text.lower() + "\n"), separator="\n"), dtype=np.int64)
+        separators = rows < 0
+        query_of = np.cumsum(separators)[~separators]
+        keyword_index = rows[~separators]
+        scores = np.zeros((len(queries), len(self.domains)), dtype=np.float32)
+        if len(keyword_index):
+            counts = np.bincount(query_of, minlength=len(queries))
+            matched = counts > 0
+            starts = np.cumsum(counts) - counts
+            scores[matched] = np.add.reduceat(self.matrix[keyword_index], starts[matched], axis=0)
+        totals = scores.sum(axis=1)
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        confidences = np.take_along_axis(scores, top, axis=1) / np.maximum(totals, 1e-9)[:, None]
+        domains = self.domains
+        return [
+            [(domains[column], confidence) for column, confidence in zip(columns, shares) if confidence > 0]
+            for columns, shares in zip(top.tolist(), confidences.tolist())
+        ]
+
+    def best_domain(self, query: str) -> str:
+        ranked = self.score(query, k=1)
+        return ranked[0][0] if ranked else "general"
+
+if __name__ == "__main__":
+    import time
+
+    from services.query_classifier import DOMAIN_KEYWORDS, domain_scorer
+
+    sample_queries = [
+        "Explain quantum physics concepts",
+        "I'm good at guitar, teach me music theory",
+        "Teach me machine learning with pandas",
+        "Create a learning plan for React Native apps",
+        "What is the relationship between ethics and logic?",
+        "Find me tutorials on ethical hacking and network security",
+        "Help me learn Go and Rust",
+        "Explain ci/cd with Docker and Kubernetes",
+        "How does baking bread work?",
+        "Teach me C++ and C#",
+    ]
+
+    print("Top domains (first-match substring rule -> ranked scorer)")
+    for query in sample_queries:
+        query_lower = query.lower()
+        legacy = next(
+            (domain for domain, keywords in DOMAIN_KEYWORDS.items() if any(keyword in query_lower for keyword in keywords)),
+            "general"
+        )
+        ranked = ", ".join(f"{domain} {confidence:.2f}" for domain, confidence in domain_scorer.score(query)) or "general"
+        print(f"  {query[:52]:<52} {legacy:<18} -> {ranked}")
+
+    batch = sample_queries * 2000
+
+    def best_of(runs: int, score) -> float:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            score()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    single_seconds = best_of(3, lambda: [domain_scorer.score(query) for query in batch])
+    batch_seconds = best_of(3, lambda: domain_scorer.score_batch(batch))
+
+    print(f"\nScoring {len(batch)} queries, best of 3 (numpy={'yes' if NUMPY_AVAILABLE else 'no'})")
+    print(f"  one at a time: {len(batch) / single_seconds:,.0f} queries/s")
+    print(f"  score_batch:   {len(batch) / batch_seconds:,.0f} queries/s")
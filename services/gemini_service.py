@@ -1,8 +1,16 @@
+import asyncio
 import os
-from typing import List, Dict, Any, Optional
+import time
+from typing import Awaitable, Callable, List, Dict, Any, Optional
 from dotenv import load_dotenv
 
 from services.user_context import user_context_manager
+from services.query_classifier import STOPWORDS, extract_domain
+from services.semantic_cache import semantic_cache
+from services.topic_canonicalizer import requested_level
+from services.priority_scheduler import priority_scheduler, INTERACTIVE, BULK
+from services.degradation import degradation_controller
+from services.deadlines import DeadlineExceeded, check_budget, remaining_budget
 
 try:
     from google import genai
@@ -13,6 +21,7 @@ except ImportError:
 try:
     from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
+    import httplib2
     YOUTUBE_AVAILABLE = True
 except ImportError:
     YOUTUBE_AVAILABLE = False
@@ -27,6 +36,28 @@ except ImportError:
 
 load_dotenv()
 
+def _run_metta(work: Callable[..., Awaitable[Any]], *args) -> Any:
+    """Open a knowledge graph and run ``work(metta, *args)`` on this thread's own event loop.
+
+    hyperon calls are synchronous even behind ``async def``, so callers run this on a
+    worker thread via ``priority_scheduler.run`` instead of awaiting the graph directly.
+    """
+    from .metta_integration import DynamicMeTTaKnowledgeGraph
+
+    async def session():
+        async with DynamicMeTTaKnowledgeGraph() as metta:
+            return await work(metta, *args)
+    return asyncio.run(session())
+
+async def _detect_domain(metta, query: str) -> str:
+    return await metta.detect_domain_from_query(query)
+
+async def _concept_data(metta, domain: str, concepts: List[str]) -> List[tuple]:
+    """``(concept, data)`` pairs from a real MeTTa graph; empty with the mock"""
+    if not metta.use_real_metta:
+        return []
+    return [(concept, await metta.query_learning_concepts(domain, concept)) for concept in concepts]
+
 class GeminiLearningService:
     def __init__(self):
         self.gemini_available = GEMINI_AVAILABLE and GEMINI_API_KEY
@@ -47,7 +78,7 @@ class GeminiLearningService:
                 concepts.append(two_word)
         
         for word in words:
-            if len(word) > 3 and word not in ["the", "and", "for", "with", "from", "that", "this", "will", "learn", "teach", "help", "want", "need"]:
+            if len(word) > 3 and word not in STOPWORDS:
                 concepts.append(word)
         
         if not concepts:
@@ -55,40 +86,55 @@ class GeminiLearningService:
         
         return concepts[:5]
 
+    async def _generate(self, prompt: str, priority: str) -> str:
+        """The SDK call blocks, so it runs on a worker thread behind the priority scheduler,
+        with an HTTP timeout no longer than what is left of the request's deadline"""
+        check_budget("gemini")
+        started = time.monotonic()
+        budget = remaining_budget()
+        options = {"http_options": {"timeout": max(int(budget * 1000), 1)}} if budget is not None else None
+        response = await priority_scheduler.run(priority, self.client.models.generate_content,
+                                                model="gemini-2.5-flash", contents=prompt, config=options)
+        degradation_controller.record_latency(time.monotonic() - started)
+        return response.text
+
     async def generate_curriculum(self, domain: str, user_query: str = "", user_id: str = None) -> str:
         if not self.gemini_available:
             return self._get_fallback_curriculum(domain)
         
-        if domain in ["general", "general_tech", ""]:
+        cache_namespace = f"curriculum:{domain}:{requested_level(user_query)}:{user_context_manager.profile_signature(user_id)}"
+        cached = semantic_cache.lookup(cache_namespace, user_query or domain)
+        if cached is not None:
+            return cached
+        
+        enrich = degradation_controller.enabled("metta_enrichment")
+        if domain in ["general", "general_tech", ""] and not enrich:
+            domain = extract_domain(user_query)
+        elif domain in ["general", "general_tech", ""]:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    domain = await metta.detect_domain_from_query(user_query)
+                domain = await priority_scheduler.run(BULK, _run_metta, _detect_domain, user_query)
             except Exception as e:
                 print(f"Dynamic domain detection error: {e}")
         
         metta_insights = ""
-        if METTA_AVAILABLE:
+        check_budget("metta enrichment")
+        if METTA_AVAILABLE and enrich:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    if metta.use_real_metta:
-                        concepts = self._extract_concepts_from_query(user_query)
-                        for concept in concepts[:3]:
-                            metta_data = await metta.query_learning_concepts(domain, concept)
-                            if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
-                                metta_insights += f"\n**Dynamic MeTTa Knowledge Graph Insights for {concept.replace('_', ' ').title()}:**\n"
-                                if metta_data.get("prerequisites"):
-                                    metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
-                                if metta_data.get("related_concepts"):
-                                    metta_insights += f"- **Related Concepts**: {', '.join(metta_data['related_concepts'])}\n"
-                                if metta_data.get("learning_path"):
-                                    metta_insights += f"- **Learning Path**: {' → '.join(metta_data['learning_path'])}\n"
-                                if metta_data.get("difficulty_level"):
-                                    metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
-                                if metta_data.get("estimated_time"):
-                                    metta_insights += f"- **Estimated Time**: {metta_data['estimated_time']}\n"
-                                metta_insights += "\n"
+                concepts = self._extract_concepts_from_query(user_query)
+                for concept, metta_data in await priority_scheduler.run(BULK, _run_metta, _concept_data, domain, concepts[:3]):
+                    if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
+                        metta_insights += f"\n**Dynamic MeTTa Knowledge Graph Insights for {concept.replace('_', ' ').title()}:**\n"
+                        if metta_data.get("prerequisites"):
+                            metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
+                        if metta_data.get("related_concepts"):
+                            metta_insights += f"- **Related Concepts**: {', '.join(metta_data['related_concepts'])}\n"
+                        if metta_data.get("learning_path"):
+                            metta_insights += f"- **Learning Path**: {' → '.join(metta_data['learning_path'])}\n"
+                        if metta_data.get("difficulty_level"):
+                            metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
+                        if metta_data.get("estimated_time"):
+                            metta_insights += f"- **Estimated Time**: {metta_data['estimated_time']}\n"
+                        metta_insights += "\n"
             except Exception as e:
                 print(f"Dynamic MeTTa integration error in curriculum generation: {e}")
                 pass
@@ -161,11 +207,11 @@ class GeminiLearningService:
             Tailor everything to directly address the user's specific learning request.
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt
-            )
-            return response.text
+            response_text = await self._generate(prompt, BULK)
+            semantic_cache.store(cache_namespace, user_query or domain, response_text)
+            return response_text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Gemini curriculum generation failed: {e}")
             return self._get_fallback_curriculum(domain)
@@ -194,6 +240,11 @@ class GeminiLearningService:
 - Current Topic: {user_context.current_topic or 'None'}
 - Learning Goals: {', '.join(user_context.learning_goals) if user_context.learning_goals else 'None'}
 - Session Count: {user_context.session_count}
+"""
+                if user_context.history_summary:
+                    user_context_info += f"""
+**Earlier Conversation (summary):**
+{user_context.history_summary}
 """
             
             context_prompts = {
@@ -260,11 +311,7 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
             
             prompt = context_prompts.get(context_type, context_prompts["general"])
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt
-            )
-            return response.text
+            return await self._generate(prompt, INTERACTIVE)
             
         except Exception as e:
             return f"I'm here to help you learn! What would you like to learn about? (Error: {str(e)})"
@@ -273,30 +320,34 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
         if not self.gemini_available:
             return self._get_fallback_materials(topic, domain)
 
-        if domain in ["general", "general_tech", ""]:
+        cache_namespace = f"materials:{domain}:{requested_level(user_query or topic)}"
+        cached = semantic_cache.lookup(cache_namespace, user_query or topic)
+        if cached is not None:
+            return cached
+
+        enrich = degradation_controller.enabled("metta_enrichment")
+        if domain in ["general", "general_tech", ""] and not enrich:
+            domain = extract_domain(user_query)
+        elif domain in ["general", "general_tech", ""]:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    domain = await metta.detect_domain_from_query(user_query)
+                domain = await priority_scheduler.run(BULK, _run_metta, _detect_domain, user_query)
             except Exception as e:
                 print(f"Dynamic domain detection error: {e}")
 
         metta_insights = ""
-        if METTA_AVAILABLE:
+        check_budget("metta enrichment")
+        if METTA_AVAILABLE and enrich:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    if metta.use_real_metta:
-                        metta_data = await metta.query_learning_concepts(domain, topic)
-                        if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
-                            metta_insights += f"\n**Dynamic MeTTa Insights for {topic.replace('_', ' ').title()}:**\n"
-                            if metta_data.get("prerequisites"):
-                                metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
-                            if metta_data.get("difficulty_level"):
-                                metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
-                            if metta_data.get("estimated_time"):
-                                metta_insights += f"- **Estimated Time**: {metta_data['estimated_time']}\n"
-                            metta_insights += "\n"
+                for _, metta_data in await priority_scheduler.run(BULK, _run_metta, _concept_data, domain, [topic]):
+                    if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
+                        metta_insights += f"\n**Dynamic MeTTa Insights for {topic.replace('_', ' ').title()}:**\n"
+                        if metta_data.get("prerequisites"):
+                            metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
+                        if metta_data.get("difficulty_level"):
+                            metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
+                        if metta_data.get("estimated_time"):
+                            metta_insights += f"- **Estimated Time**: {metta_data['estimated_time']}\n"
+                        metta_insights += "\n"
             except Exception as e:
                 print(f"Dynamic MeTTa integration error in materials generation: {e}")
 
@@ -333,11 +384,11 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
             Include actual working links and resources that match their query.
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt
-            )
-            return response.text
+            response_text = await self._generate(prompt, BULK)
+            semantic_cache.store(cache_namespace, user_query or topic, response_text)
+            return response_text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Gemini materials generation failed: {e}")
             return self._get_fallback_materials(topic, domain)
@@ -346,36 +397,40 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
         if not self.gemini_available:
             return self._get_fallback_insights(concept, domain)
         
-        if domain in ["general", "general_tech", ""]:
+        cache_namespace = f"insights:{domain}:{requested_level(user_query or concept)}"
+        cached = semantic_cache.lookup(cache_namespace, user_query or concept)
+        if cached is not None:
+            return cached
+        
+        enrich = degradation_controller.enabled("metta_enrichment")
+        if domain in ["general", "general_tech", ""] and not enrich:
+            domain = extract_domain(user_query)
+        elif domain in ["general", "general_tech", ""]:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    domain = await metta.detect_domain_from_query(user_query)
+                domain = await priority_scheduler.run(BULK, _run_metta, _detect_domain, user_query)
             except Exception as e:
                 print(f"Dynamic domain detection error: {e}")
         
         metta_insights = ""
-        if METTA_AVAILABLE:
+        check_budget("metta enrichment")
+        if METTA_AVAILABLE and enrich:
             try:
-                from .metta_integration import DynamicMeTTaKnowledgeGraph
-                async with DynamicMeTTaKnowledgeGraph() as metta:
-                    if metta.use_real_metta:
-                        metta_data = await metta.query_learning_concepts(domain, concept)
-                        if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
-                            metta_insights += f"\n**Dynamic MeTTa Knowledge Graph Analysis for {concept.replace('_', ' ').title()}:**\n"
-                            if metta_data.get("prerequisites"):
-                                metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
-                            if metta_data.get("related_concepts"):
-                                metta_insights += f"- **Related Concepts**: {', '.join(metta_data['related_concepts'])}\n"
-                            if metta_data.get("learning_path"):
-                                metta_insights += f"- **Learning Sequence**: {' → '.join(metta_data['learning_path'])}\n"
-                            if metta_data.get("difficulty_level"):
-                                metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
-                            if metta_data.get("estimated_time"):
-                                metta_insights += f"- **Estimated Learning Time**: {metta_data['estimated_time']}\n"
-                            if metta_data.get("definition"):
-                                metta_insights += f"- **Definition**: {metta_data['definition']}\n"
-                            metta_insights += "\n"
+                for _, metta_data in await priority_scheduler.run(BULK, _run_metta, _concept_data, domain, [concept]):
+                    if metta_data and "Dynamic MeTTa Knowledge Graph" in metta_data.get("source", ""):
+                        metta_insights += f"\n**Dynamic MeTTa Knowledge Graph Analysis for {concept.replace('_', ' ').title()}:**\n"
+                        if metta_data.get("prerequisites"):
+                            metta_insights += f"- **Prerequisites**: {', '.join(metta_data['prerequisites'])}\n"
+                        if metta_data.get("related_concepts"):
+                            metta_insights += f"- **Related Concepts**: {', '.join(metta_data['related_concepts'])}\n"
+                        if metta_data.get("learning_path"):
+                            metta_insights += f"- **Learning Sequence**: {' → '.join(metta_data['learning_path'])}\n"
+                        if metta_data.get("difficulty_level"):
+                            metta_insights += f"- **Difficulty Level**: {metta_data['difficulty_level']}\n"
+                        if metta_data.get("estimated_time"):
+                            metta_insights += f"- **Estimated Learning Time**: {metta_data['estimated_time']}\n"
+                        if metta_data.get("definition"):
+                            metta_insights += f"- **Definition**: {metta_data['definition']}\n"
+                        metta_insights += "\n"
             except Exception as e:
                 print(f"Dynamic MeTTa integration error in deep insights generation: {e}")
                 pass
@@ -415,11 +470,11 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
             Make it directly relevant to their specific question and learning goals.
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt
-            )
-            return response.text
+            response_text = await self._generate(prompt, BULK)
+            semantic_cache.store(cache_namespace, user_query or concept, response_text)
+            return response_text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Gemini insights generation failed: {e}")
             return self._get_fallback_insights(concept, domain)
@@ -432,10 +487,17 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
             print("[YOUTUBE API] Not available - returning empty list")
             return []
         
+        if not degradation_controller.enabled("video_search"):
+            print("[YOUTUBE API] Skipped under load")
+            return []
+        check_budget("video search")
+        
         try:
-            youtube = build('youtube', 'v3', developerKey=current_key)
+            budget = remaining_budget()
+            http = httplib2.Http(timeout=max(budget, 1)) if budget is not None else None
+            youtube = build('youtube', 'v3', developerKey=current_key, http=http)
             
-            search_response = youtube.search().list(
+            search_response = await priority_scheduler.run(BULK, youtube.search().list(
                 q=query,
                 part='id,snippet',
                 maxResults=limit,
@@ -443,7 +505,7 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
                 order='relevance',
                 videoDuration='medium',
                 videoDefinition='high'
-            ).execute()
+            ).execute)
             
             video_list = []
             video_ids = []
@@ -452,10 +514,11 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
                 video_ids.append(search_result['id']['videoId'])
             
             if video_ids:
-                video_response = youtube.videos().list(
+                check_budget("video details")
+                video_response = await priority_scheduler.run(BULK, youtube.videos().list(
                     part='snippet,statistics,contentDetails',
                     id=','.join(video_ids)
-                ).execute()
+                ).execute)
                 
                 for video in video_response.get('items', []):
                     snippet = video['snippet']
@@ -477,6 +540,8 @@ Respond as an insights specialist. Be enthusiastic about providing deep understa
             print(f"[YOUTUBE API] Found {len(video_list)} videos for query: {query}")
             return video_list
             
+        except DeadlineExceeded:
+            raise
         except HttpError as e:
             print(f"[YOUTUBE API] HTTP Error: {e}")
             if e.resp.status == 403:
@@ -625,6 +690,8 @@ I can help you find YouTube videos and additional resources!
 I can help you dive deeper into specific aspects!
         """
 
+gemini_service = GeminiLearningService()
+
 if __name__ == "__main__":
     async def test_gemini_service():
         print("Testing Gemini Learning Service")
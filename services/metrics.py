@@ -0,0 +1,28 @@
+import threading
+from typing import Callable, Dict
+
+class Metrics:
+    """Process-wide counters plus gauges that are read when a snapshot is taken"""
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        self._gauges[name] = read
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            values = dict(self._counters)
+        for name, read in self._gauges.items():
+            try:
+                values[name] = float(read())
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+        return dict(sorted(values.items()))
+
+metrics = Metrics()
@@ -4,6 +4,7 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 from config import METTA_ENDPOINT, METTA_SPACE, METTA_USE_MOCK
+from services.query_classifier import extract_domain
 
 try:
     from hyperon import MeTTa, E, S, V, ValueAtom, GroundedAtom, OperationAtom, ExpressionAtom
@@ -67,24 +68,7 @@ class DynamicMeTTaKnowledgeGraph:
             self.metta.register_atom("analyze-concept", analyze_op)
             
             def detect_domain(query):
-                query_lower = query.lower()
-                domains = {
-                    "programming": ["code", "program", "software", "development", "coding"],
-                    "data_science": ["data", "analysis", "statistics", "machine learning", "ai"],
-                    "web_development": ["web", "frontend", "backend", "html", "css", "javascript"],
-                    "mobile_development": ["mobile", "app", "ios", "android", "react native"],
-                    "devops": ["devops", "deployment", "docker", "kubernetes", "aws"],
-                    "cybersecurity": ["security", "hacking", "penetration", "cyber"],
-                    "design": ["design", "ui", "ux", "figma", "adobe"],
-                    "business": ["business", "marketing", "finance", "management"],
-                    "science": ["science", "physics", "chemistry", "biology", "math"],
-                    "language": ["language", "english", "spanish", "french", "learning"]
-                }
-                
-                for domain, keywords in domains.items():
-                    if any(keyword in query_lower for keyword in keywords):
-                        return domain
-                return "general"
+                return extract_domain(query)
             
             domain_op = OperationAtom("detect-domain", detect_domain)
             self.metta.register_atom("detect-domain", domain_op)
@@ -262,25 +246,7 @@ class DynamicMeTTaKnowledgeGraph:
             except Exception as e:
                 print(f"MeTTa domain detection error: {e}")
         
-        query_lower = query.lower()
-        domain_keywords = {
-            "programming": ["code", "program", "software", "development", "coding", "python", "javascript", "java"],
-            "data_science": ["data", "analysis", "statistics", "machine learning", "ai", "pandas", "numpy"],
-            "web_development": ["web", "frontend", "backend", "html", "css", "react", "vue", "angular"],
-            "mobile_development": ["mobile", "app", "ios", "android", "react native", "flutter"],
-            "devops": ["devops", "deployment", "docker", "kubernetes", "aws", "azure", "ci/cd"],
-            "cybersecurity": ["security", "hacking", "penetration", "cyber", "ethical hacking"],
-            "design": ["design", "ui", "ux", "figma", "adobe", "user interface", "user experience"],
-            "business": ["business", "marketing", "finance", "management", "entrepreneurship"],
-            "science": ["science", "physics", "chemistry", "biology", "math", "mathematics"],
-            "language": ["language", "english", "spanish", "french", "learning", "grammar"]
-        }
-        
-        for domain, keywords in domain_keywords.items():
-            if any(keyword in query_lower for keyword in keywords):
-                return domain
-        
-        return "general"
+        return extract_domain(query)
     
     async def suggest_learning_order(self, domain: str, concepts: List[str]) -> List[str]:
         """Dynamic learning order suggestion for any concepts"""
@@ -0,0 +1,108 @@
+import base64
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+from config import PAYLOAD_COMPRESSION, PAYLOAD_COMPRESSION_MIN_BYTES, USER_MESSAGE_MAX_CHARS
+from services.metrics import metrics
+
+# The value of a response model's ``encoding`` field when its text fields are compressed.
+ZLIB_BASE64 = "zlib+base64"
+
+# Room left in each chunk for the "(part i/n)" marker.
+PART_MARKER_RESERVE = 32
+
+def _pack(text: str) -> str:
+    return base64.b64encode(zlib.compress(text.encode("utf-8"))).decode("ascii")
+
+def _unpack(text: str) -> str:
+    return zlib.decompress(base64.b64decode(text)).decode("utf-8")
+
+def encode_fields(fields: Dict[str, str], min_bytes: int = PAYLOAD_COMPRESSION_MIN_BYTES,
+                  enabled: bool = PAYLOAD_COMPRESSION) -> Tuple[Dict[str, str], str]:
+    """Compress a response's text fields together when they are large enough to gain from it.
+
+    Returns the fields to put on the model and the ``encoding`` to send with them;
+    the encoding is empty when the fields go out as they are.
+    """
+    raw_bytes = sum(len(value.encode("utf-8")) for value in fields.values())
+    metrics.incr("payload.raw_bytes", raw_bytes)
+    if enabled and raw_bytes >= min_bytes:
+        packed = {name: _pack(value) if value else "" for name, value in fields.items()}
+        packed_bytes = sum(len(value) for value in packed.values())
+        if packed_bytes < raw_bytes:
+            metrics.incr("payload.compressed")
+            metrics.incr("payload.sent_bytes", packed_bytes)
+            return packed, ZLIB_BASE64
+    metrics.incr("payload.sent_bytes", raw_bytes)
+    return dict(fields), ""
+
+def decode_text(text: str, encoding: str) -> str:
+    if not encoding or not text:
+        return text
+    if encoding == ZLIB_BASE64:
+        return _unpack(text)
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+def _lines(text: str, limit: int) -> List[str]:
+    """Lines with their newlines kept; a line longer than ``limit`` is cut into pieces"""
+    pieces = []
+    for line in re.split(r"(?<=\n)", text):
+        while len(line) > limit:
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if line:
+            pieces.append(line)
+    return pieces
+
+def split_message(text: str, max_chars: int = USER_MESSAGE_MAX_CHARS) -> List[str]:
+    """Ordered chunks of at most ``max_chars``, split at line boundaries and numbered "(part i/n)"
+    so a client that receives them out of order can still tell the sequence"""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    limit = max(max_chars - PART_MARKER_RESERVE, 1)
+    chunks: List[str] = []
+    current = ""
+    for line in _lines(text, limit):
+        if current and len(current) + len(line) > limit:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        chunks.append(current)
+    metrics.incr("chat.split_messages")
+    metrics.incr("chat.parts_sent", len(chunks))
+    chunks = [chunk.strip("\n") for chunk in chunks]
+    return [f"*(part {index}/{len(chunks)})*\n\n{chunk}" for index, chunk in enumerate(chunks, 1)]
+
+if __name__ == "__main__":
+    import time
+
+    from models import MaterialsResponse
+
+    videos = "".join(
+        f"**{i}. Python tutorial part {i}**\n   📺 Channel: Example Channel\n   ⏱️ Duration: PT{i}M30S\n"
+        f"   🔗 Watch: https://www.youtube.com/watch?v=video{i:04d}\n   🖼️ Thumbnail: https://i.ytimg.com/vi/video{i:04d}/hqdefault.jpg\n\n"
+        for i in range(1, 6)
+    )
+    materials = "## Learning Materials\n\n" + "".join(f"### Step {i}\n• Read the official docs section {i}\n• Build a small project\n\n" for i in range(1, 30))
+    plain = MaterialsResponse(materials=materials, youtube_videos=videos, request_id="materials_example")
+    fields, encoding = encode_fields({"materials": materials, "youtube_videos": videos}, enabled=True)
+    packed = MaterialsResponse(**fields, encoding=encoding, request_id="materials_example")
+    print(f"MaterialsResponse JSON: {len(plain.model_dump_json())} bytes plain, {len(packed.model_dump_json())} bytes {encoding or 'plain'}")
+
+    iterations = 2000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        MaterialsResponse.model_validate_json(plain.model_dump_json())
+    plain_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(iterations):
+        received = MaterialsResponse.model_validate_json(packed.model_dump_json())
+        decode_text(received.materials, received.encoding)
+        decode_text(received.youtube_videos, received.encoding)
+    packed_seconds = time.perf_counter() - start
+    print(f"Serialize + parse: {plain_seconds / iterations * 1e6:.0f} us plain, {packed_seconds / iterations * 1e6:.0f} us compressed (incl. decompression)")
+
+    parts = split_message(materials + videos, 1000)
+    print(f"{len(materials + videos)} chars split into {len(parts)} parts of at most {max(len(part) for part in parts)} chars")
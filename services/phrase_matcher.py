@@ -0,0 +1,78 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Set, Tuple
+
+from services.domain_scorer import tokenize
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Render a character trie as a regex; the greedy optional tail prefers the longest phrase"""
+    alternatives = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ""
+    if "" in node:
+        return "(?:" + "|".join(alternatives) + ")?"
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+def _continues_word(phrase: str, end: int) -> bool:
+    """Whether a prefix ending at ``end`` stops in the middle of a word of ``phrase``"""
+    return end < len(phrase) and (phrase[end].isalnum() or phrase[end] == "_") and (phrase[end - 1].isalnum() or phrase[end - 1] == "_")
+
+class PhraseMatcher:
+    """Finds every phrase that occurs as a substring of a text in a single regex pass.
+
+    The phrases are compiled into one trie-shaped regex wrapped in a lookahead, so
+    each text position reports the longest phrase starting there. Phrases that are
+    prefixes of that match also occur at the same position and are added back, which
+    gives exactly the same answers as ``phrase in text`` for every phrase.
+
+    With ``whole_words`` a phrase only counts when it is not part of a longer word,
+    so "hi" is found in "hi there" but not in "machine". Callers that already have
+    the text's tokens can use ``find_tokens`` instead and skip the regex pass.
+    """
+    def __init__(self, phrases: Iterable[str], whole_words: bool = False):
+        self.phrases = frozenset(phrase for phrase in phrases if phrase)
+        self.whole_words = whole_words
+        trie: Dict[str, dict] = {}
+        for phrase in self.phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        body = _trie_pattern(trie)
+        if whole_words:
+            body = rf"(?<!\w){body}(?!\w)"
+        self._pattern = re.compile(f"(?=({body}))") if self.phrases else None
+        self._prefixes: Dict[str, FrozenSet[str]] = {
+            phrase: frozenset(
+                other for other in self.phrases
+                if phrase.startswith(other) and not (whole_words and _continues_word(phrase, len(other)))
+            )
+            for phrase in self.phrases
+        }
+        self._by_first_token: Dict[str, List[Tuple[List[str], str]]] = {}
+        for phrase in self.phrases:
+            words = tokenize(phrase)
+            if words:
+                self._by_first_token.setdefault(words[0], []).append((words, phrase))
+
+    def find_tokens(self, tokens: Sequence[str]) -> Set[str]:
+        """Phrases occurring as runs of whole tokens; the token-level form of ``whole_words``"""
+        found: Set[str] = set()
+        by_first_token = self._by_first_token
+        for i, token in enumerate(tokens):
+            candidates = by_first_token.get(token)
+            if candidates is None:
+                continue
+            for words, phrase in candidates:
+                if len(words) == 1 or tokens[i:i + len(words)] == words:
+                    found.add(phrase)
+        return found
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        for longest in set(self._pattern.findall(text)):
+            found |= self._prefixes[longest]
+        return found
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Tuple
+
+from config import LLM_CONCURRENCY, LLM_INTERACTIVE_RESERVED, LLM_BULK_MAX_WAIT_SECONDS
+from services.metrics import metrics
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITY_CLASSES = (INTERACTIVE, BULK)
+
+class PriorityScheduler:
+    """Slots for LLM and knowledge-graph work, handed out by priority class.
+
+    Interactive turns (greetings, help, conversational replies) are served before
+    bulk generation (curricula, materials, insights), and bulk work may never hold
+    more than ``slots - reserved_interactive`` slots, so a quick reply never waits
+    for a multi-second generation to finish. A bulk waiter older than
+    ``bulk_max_wait`` seconds jumps ahead of interactive ones, so a steady stream of
+    short turns cannot starve it.
+    """
+    def __init__(self, slots: int = LLM_CONCURRENCY, reserved_interactive: int = LLM_INTERACTIVE_RESERVED,
+                 bulk_max_wait: float = LLM_BULK_MAX_WAIT_SECONDS):
+        self.slots = max(slots, 1)
+        self.bulk_slots = max(self.slots - reserved_interactive, 1)
+        self.bulk_max_wait = bulk_max_wait
+        self.running: Dict[str, int] = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._queues: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {priority: deque() for priority in PRIORITY_CLASSES}
+        for priority in PRIORITY_CLASSES:
+            metrics.gauge(f"scheduler.{priority}.running", lambda priority=priority: self.running[priority])
+            metrics.gauge(f"scheduler.{priority}.queued", lambda priority=priority: len(self._queues[priority]))
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self.running.values()) >= self.slots:
+            return False
+        return priority == INTERACTIVE or self.running[BULK] < self.bulk_slots
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while True:
+            for queue in self._queues.values():
+                while queue and queue[0][1].done():
+                    queue.popleft()
+            bulk = self._queues[BULK]
+            aged = bool(bulk) and now - bulk[0][0] >= self.bulk_max_wait
+            for priority in ((BULK, INTERACTIVE) if aged else PRIORITY_CLASSES):
+                queue = self._queues[priority]
+                if queue and self._can_start(priority):
+                    enqueued_at, waiter = queue.popleft()
+                    self.running[priority] += 1
+                    waiter.set_result(None)
+                    metrics.incr(f"scheduler.{priority}.granted")
+                    metrics.incr(f"scheduler.{priority}.wait_seconds", now - enqueued_at)
+                    if aged and priority == BULK:
+                        metrics.incr("scheduler.bulk.aged_promotions")
+                    break
+            else:
+                return
+
+    @asynccontextmanager
+    async def slot(self, priority: str = INTERACTIVE):
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((time.monotonic(), waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self._finish(priority)
+            else:
+                waiter.cancel()
+            raise
+        try:
+            yield
+        finally:
+            self._finish(priority)
+
+    def _finish(self, priority: str):
+        self.running[priority] -= 1
+        self._dispatch()
+
+    async def run(self, priority: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call on a worker thread once a slot of this class is free"""
+        async with self.slot(priority):
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+priority_scheduler = PriorityScheduler()
@@ -0,0 +1,171 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from services.phrase_matcher import PhraseMatcher
+
+BEGINNER_INDICATORS = [
+    "beginner", "new to", "never learned", "don't know", "first time",
+    "starting", "basics", "fundamentals", "intro", "introduction",
+    "never done", "no experience", "complete beginner", "learning speed is not that good",
+    "slow learner", "struggle", "difficult", "hard for me", "not good at"
+]
+
+INTERMEDIATE_INDICATORS = [
+    "some experience", "basic knowledge", "familiar with", "know basics",
+    "intermediate", "somewhat", "a bit", "little bit", "some understanding",
+    "have done some", "know a little", "basic level"
+]
+
+ADVANCED_INDICATORS = [
+    "advanced", "expert", "proficient", "experienced", "deep knowledge",
+    "master", "professional", "expertise", "comprehensive", "thorough",
+    "very good at", "excellent", "advanced level", "senior level"
+]
+
+GOAL_INDICATORS = [
+    "want to learn", "goal is", "trying to", "hoping to", "planning to",
+    "need to", "should learn", "must learn", "aim to", "target"
+]
+
+DURATION_PATTERNS = {
+    "quick": ["quick", "fast", "rapid", "crash course", "intensive", "bootcamp"],
+    "short": ["short", "brief", "few weeks", "month", "couple of weeks", "2-4 weeks"],
+    "medium": ["few months", "3-6 months", "half year", "medium term"],
+    "long": ["long term", "year", "extensive", "comprehensive", "thorough", "deep dive"],
+    "flexible": ["flexible", "at my own pace", "whenever", "no rush", "take my time"]
+}
+
+PRACTICE_INDICATORS = [
+    "practice", "hands-on", "practical", "build", "create", "project",
+    "exercise", "coding", "doing", "making", "implementing"
+]
+
+THEORY_INDICATORS = [
+    "theory", "concepts", "understanding", "knowledge", "reading",
+    "studying", "learning about", "explaining"
+]
+
+TIME_PATTERNS = {
+    "30 minutes": ["30 min", "half hour", "30 minutes"],
+    "1 hour": ["1 hour", "one hour", "60 min", "hour a day"],
+    "2 hours": ["2 hours", "two hours", "couple hours"],
+    "3+ hours": ["3 hours", "several hours", "many hours", "long sessions"],
+    "flexible": ["flexible", "whenever", "spare time", "free time"]
+}
+
+@dataclass(slots=True)
+class ProfileSignals:
+    """Everything one message says about the learner; ``None`` means the message was silent on it"""
+    learning_level: str = "unknown"
+    learning_goals: List[str] = field(default_factory=list)
+    preferred_duration: Optional[str] = None
+    practice_focus: Optional[bool] = None
+    daily_time_commitment: Optional[str] = None
+
+    def has_updates(self) -> bool:
+        return (
+            self.learning_level != "unknown"
+            or bool(self.learning_goals)
+            or self.preferred_duration is not None
+            or self.practice_focus is not None
+            or self.daily_time_commitment is not None
+        )
+
+_matcher = PhraseMatcher(
+    BEGINNER_INDICATORS + INTERMEDIATE_INDICATORS + ADVANCED_INDICATORS + GOAL_INDICATORS
+    + PRACTICE_INDICATORS + THEORY_INDICATORS
+    + [pattern for patterns in DURATION_PATTERNS.values() for pattern in patterns]
+    + [pattern for patterns in TIME_PATTERNS.values() for pattern in patterns]
+)
+
+def _first_label(patterns_by_label: dict, found: set) -> Optional[str]:
+    for label, patterns in patterns_by_label.items():
+        if not found.isdisjoint(patterns):
+            return label
+    return None
+
+def extract_profile_signals(message: str) -> ProfileSignals:
+    """One matcher pass over the message, with the same precedence rules as the per-field extractors"""
+    found = _matcher.find(message.lower())
+    signals = ProfileSignals()
+    if not found:
+        return signals
+
+    if not found.isdisjoint(BEGINNER_INDICATORS):
+        signals.learning_level = "beginner"
+    elif not found.isdisjoint(ADVANCED_INDICATORS):
+        signals.learning_level = "advanced"
+    elif not found.isdisjoint(INTERMEDIATE_INDICATORS):
+        signals.learning_level = "intermediate"
+
+    for indicator in GOAL_INDICATORS:
+        if indicator in found:
+            parts = message.split(indicator)
+            if len(parts) > 1:
+                signals.learning_goals.append(parts[1].strip())
+
+    signals.preferred_duration = _first_label(DURATION_PATTERNS, found)
+
+    if not found.isdisjoint(PRACTICE_INDICATORS):
+        signals.practice_focus = True
+    elif not found.isdisjoint(THEORY_INDICATORS):
+        signals.practice_focus = False
+
+    signals.daily_time_commitment = _first_label(TIME_PATTERNS, found)
+    return signals
+
+if __name__ == "__main__":
+    import time
+
+    from services.user_context import UserContextManager
+
+    sample_messages = [
+        "Hi, I'm a complete beginner and I want to learn Python for data analysis",
+        "I have some experience with React but need to get better at testing, maybe 1 hour a day",
+        "Teach me machine learning theory, I'm a slow learner so take my time",
+        "Create a crash course on Docker with hands-on projects",
+        "I'm an experienced backend developer planning to learn Rust over a few months",
+        "What is the difference between TCP and UDP?",
+        "Find me guitar tutorials, I can practice in my spare time",
+        "Explain quantum computing concepts like I know a little physics",
+    ]
+    iterations = 2000
+
+    manager = UserContextManager(storage_path=":memory:", legacy_json_path="", flush_interval=3600)
+
+    def legacy(message: str):
+        return (
+            manager.assess_learning_level("bench", message),
+            manager.extract_learning_goals("bench", message),
+            manager.extract_learning_duration("bench", message),
+            manager.extract_practice_preferences("bench", message),
+            manager.extract_time_commitment("bench", message),
+        )
+
+    for message in sample_messages:
+        signals = extract_profile_signals(message)
+        level, goals, duration, practice, time_commitment = legacy(message)
+        assert signals.learning_level == level, message
+        assert signals.learning_goals == goals, message
+        assert signals.preferred_duration in (None, duration), message
+        assert signals.practice_focus in (None, practice), message
+        assert signals.daily_time_commitment in (None, time_commitment), message
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in sample_messages:
+            legacy(message)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in sample_messages:
+            extract_profile_signals(message)
+    single_pass_seconds = time.perf_counter() - start
+
+    total = iterations * len(sample_messages)
+    print(f"Profile signal extraction over {total} messages")
+    print(f"  five extract_* calls: {legacy_seconds / total * 1e6:.1f} us/message")
+    print(f"  single pass:          {single_pass_seconds / total * 1e6:.1f} us/message")
+    print(f"  speedup:              {legacy_seconds / single_pass_seconds:.1f}x")
+    manager.close()
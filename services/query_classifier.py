@@ -0,0 +1,201 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from services.domain_scorer import DomainScorer, tokenize
+from services.phrase_matcher import PhraseMatcher
+
+# Checked in this order; the first intent with a matching phrase routes the message.
+# Phrases match whole words only, so "hi" never fires inside "machine" or "everything";
+# inflected words are reduced to these forms first, so "learning" and "explaining" still count.
+INTENT_PHRASES = {
+    "greeting": ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "how are you", "how are you doing"],
+    "gratitude": ["thank you", "thanks", "appreciate", "grateful"],
+    "learning_pace": ["learning speed", "slow learner", "not good", "struggle", "difficult", "hard for me"],
+    "full_plan": ["full plan", "full learning plan", "complete plan", "complete learning plan", "everything i need"],
+    "learning_request": ["teach me", "learn", "educational plan", "learning plan", "study plan", "curriculum", "learning path", "create a", "help me learn"],
+    "resources": ["resources", "find", "get me", "show me", "videos", "courses", "books", "tutorials", "materials"],
+    "explain": ["explain", "how does", "what is", "concept", "concepts", "relationship", "prerequisite", "prerequisites", "deep insights"],
+    "help": ["help", "what can you do"],
+}
+
+# Scored by DomainScorer; on equal scores the domain listed first wins.
+DOMAIN_KEYWORDS = {
+    "programming": ["code", "program", "software", "development", "coding", "python", "javascript", "java", "c++", "c#", "go", "rust"],
+    "data_science": ["data", "analysis", "statistics", "machine learning", "ai", "pandas", "numpy", "analytics", "big data"],
+    "web_development": ["web", "frontend", "backend", "full stack", "react", "vue", "angular", "nodejs", "javascript", "html", "css"],
+    "mobile_development": ["mobile", "app", "ios", "android", "swift", "kotlin", "react native", "flutter"],
+    "devops": ["devops", "docker", "kubernetes", "aws", "azure", "gcp", "ci/cd", "infrastructure", "deployment"],
+    "cybersecurity": ["cybersecurity", "security", "hacking", "penetration", "cyber", "ethical hacking", "network security"],
+    "design": ["design", "ui", "ux", "figma", "adobe", "user interface", "user experience", "visual design"],
+    "business": ["business", "marketing", "finance", "management", "entrepreneurship", "strategy"],
+    "science": ["science", "physics", "chemistry", "biology", "math", "mathematics", "research"],
+    "language": ["language", "english", "spanish", "french", "grammar", "linguistics"],
+    "music": ["music", "guitar", "piano", "singing", "composition", "audio", "sound"],
+    "art": ["art", "drawing", "painting", "sculpture", "digital art", "photography"],
+    "cooking": ["cooking", "baking", "culinary", "recipe", "chef", "food"],
+    "fitness": ["fitness", "exercise", "workout", "gym", "yoga", "running", "training"],
+    "psychology": ["psychology", "mental health", "therapy", "counseling", "behavior"],
+    "philosophy": ["philosophy", "ethics", "logic", "metaphysics", "thinking"],
+    "history": ["history", "historical", "ancient", "medieval", "modern", "world history"],
+    "literature": ["literature", "writing", "poetry", "novel", "creative writing", "reading"]
+}
+
+# Whole words, so a set lookup per token already beats putting them in the substring matcher.
+STOPWORDS = frozenset(["the", "and", "for", "with", "from", "that", "this", "will", "learn", "teach", "help", "want", "need"])
+
+INTENT_ORDER = {intent: rank for rank, intent in enumerate(INTENT_PHRASES)}
+
+# phrase -> every intent it counts towards
+_phrase_intents: Dict[str, List[str]] = defaultdict(list)
+for _intent, _phrases in INTENT_PHRASES.items():
+    for _phrase in _phrases:
+        _phrase_intents[_phrase].append(_intent)
+
+_matcher = PhraseMatcher(_phrase_intents, whole_words=True)
+
+_intent_words = frozenset(word for phrase in _phrase_intents for word in tokenize(phrase))
+
+def _inflections(word: str) -> List[str]:
+    if word.endswith("e"):
+        return [word + "s", word + "d", word[:-1] + "ing"]
+    return [word + "s", word + "es", word + "ed", word + "ing"]
+
+# Inflected form -> the intent word it reduces to ("learning" -> "learn", "struggling" -> "struggle").
+# Tokens are matched both as written and stemmed, so phrases such as "learning plan" still count.
+_intent_stems: Dict[str, str] = {form: word for word in sorted(_intent_words) for form in _inflections(word)}
+
+# Multi-word topics keep their words as written, so "machine learning" names a subject
+# rather than asking to learn something.
+_topic_phrases: Dict[str, List[List[str]]] = {}
+for _keywords in DOMAIN_KEYWORDS.values():
+    for _keyword in _keywords:
+        _words = tokenize(_keyword)
+        if len(_words) > 1 and _words not in _topic_phrases.get(_words[0], []):
+            _topic_phrases.setdefault(_words[0], []).append(_words)
+
+def _stemmed_tokens(tokens: List[str]) -> List[str]:
+    """Tokens reduced to intent words, except inside multi-word topics"""
+    stemmed: List[str] = []
+    in_topic = 0
+    for i, token in enumerate(tokens):
+        if not in_topic:
+            for words in _topic_phrases.get(token, ()):
+                if tokens[i:i + len(words)] == words:
+                    in_topic = len(words)
+                    break
+        if in_topic:
+            in_topic -= 1
+            stemmed.append(token)
+        else:
+            stemmed.append(_intent_stems.get(token, token))
+    return stemmed
+
+domain_scorer = DomainScorer(DOMAIN_KEYWORDS, INTENT_PHRASES)
+
+@dataclass(slots=True)
+class QueryClassification:
+    """Matched phrase counts per intent for one query. Ranked domain confidences are scored
+    on first use, since greetings, thanks and help replies never look at the domain."""
+    tokens: List[str] = field(default_factory=list, repr=False)
+    top_k: int = 3
+    intents: Dict[str, int] = field(default_factory=dict)
+    _domains: Optional[Dict[str, float]] = field(default=None, repr=False)
+
+    @property
+    def domains(self) -> Dict[str, float]:
+        if self._domains is None:
+            self._domains = dict(domain_scorer.score_tokens(self.tokens, self.top_k))
+        return self._domains
+
+    @property
+    def intent(self) -> str:
+        return min(self.intents, key=INTENT_ORDER.__getitem__) if self.intents else "general"
+
+    @property
+    def domain(self) -> str:
+        return next(iter(self.domains), "general")
+
+def classify_query(query: str, top_k: int = 3) -> QueryClassification:
+    """Tokenize once: intents come from whole-token phrase runs over the tokens as written and
+    as stemmed, and the domain scorer ranks domains from the same tokens when the domain is first read"""
+    tokens = tokenize(query)
+    phrases = _matcher.find_tokens(tokens)
+    if not _intent_stems.keys().isdisjoint(tokens):
+        phrases |= _matcher.find_tokens(_stemmed_tokens(tokens))
+    intents: Dict[str, int] = {}
+    for phrase in phrases:
+        for intent in _phrase_intents[phrase]:
+            intents[intent] = intents.get(intent, 0) + 1
+    return QueryClassification(tokens, top_k, intents)
+
+def extract_domain(query: str) -> str:
+    return domain_scorer.best_domain(query)
+
+if __name__ == "__main__":
+    import time
+
+    sample_queries = [
+        "Hi there! Teach me Python for data analysis",
+        "Find me React tutorials and books",
+        "Explain how Kubernetes deployment works",
+        "Thanks, that was really helpful",
+        "I'm a slow learner, this is hard for me",
+        "Create a learning plan for guitar and music theory",
+        "What is the relationship between ethics and logic?",
+        "Show me courses on ethical hacking and network security",
+        "What can you do?",
+        "Good morning, I want to get better at baking bread",
+    ]
+    iterations = 5000
+
+    def legacy_classify(query: str) -> Tuple[str, str]:
+        query_lower = query.lower()
+        intent = next(
+            (intent for intent, phrases in INTENT_PHRASES.items() if any(phrase in query_lower for phrase in phrases)),
+            "general"
+        )
+        domain = next(
+            (domain for domain, keywords in DOMAIN_KEYWORDS.items() if any(keyword in query_lower for keyword in keywords)),
+            "general"
+        )
+        return intent, domain
+
+    for query in sample_queries:
+        legacy_intent, intent = legacy_classify(query)[0], classify_query(query).intent
+        if intent != legacy_intent:
+            print(f"Routing fix: {query!r} {legacy_intent} -> {intent}")
+
+    def legacy_intent(query: str) -> str:
+        query_lower = query.lower()
+        return next(
+            (intent for intent, phrases in INTENT_PHRASES.items() if any(phrase in query_lower for phrase in phrases)),
+            "general"
+        )
+
+    def timed(classify, runs: int = 3) -> float:
+        """Best of ``runs`` passes, so a noisy neighbour does not decide the comparison"""
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                for query in sample_queries:
+                    classify(query)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def intent_and_domain(query: str):
+        classification = classify_query(query)
+        return classification.intent, classification.domain
+
+    total = iterations * len(sample_queries)
+    print(f"Query classification over {total} queries, best of 3")
+    for label, legacy, current in [
+        ("intent only (greetings, thanks, help)", legacy_intent, lambda query: classify_query(query).intent),
+        ("intent + domain (learning requests)", legacy_classify, intent_and_domain),
+    ]:
+        legacy_seconds, current_seconds = timed(legacy), timed(current)
+        print(f"  {label}")
+        print(f"    per-list substring scans: {legacy_seconds / total * 1e6:.1f} us/query ({total / legacy_seconds:,.0f} queries/s)")
+        print(f"    matcher + domain scorer:  {current_seconds / total * 1e6:.1f} us/query ({total / current_seconds:,.0f} queries/s)")
+        print(f"    speedup:                  {legacy_seconds / current_seconds:.1f}x")
@@ -0,0 +1,152 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from config import REQUEST_TIMEOUT_SECONDS, REQUEST_MAX_PENDING
+
+@dataclass(slots=True)
+class PendingRequest:
+    request_id: str
+    sender: str
+    kind: str
+    label: str = ""
+    created_at: float = field(default_factory=time.monotonic)
+    deadline: float = 0.0
+    group_id: str = ""
+    group_size: int = 1
+    worker: str = ""
+    cache_key: str = ""
+
+    def wall_deadline(self) -> float:
+        """The deadline as epoch seconds, for other processes whose monotonic clock differs"""
+        return time.time() + (self.deadline - time.monotonic())
+
+class RequestTracker:
+    """Sub-agent requests awaiting a reply, keyed by collision-free IDs.
+
+    Deadlines sit in a min-heap. Answered requests are removed from the table at
+    once and their heap entries are skipped when they surface, with a rebuild
+    whenever stale entries outnumber live ones, so memory tracks what is in flight.
+    """
+    def __init__(self, timeout: float = REQUEST_TIMEOUT_SECONDS, max_pending: int = REQUEST_MAX_PENDING):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._pending: Dict[str, PendingRequest] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+        self._by_kind: Dict[str, int] = {}
+        self._by_worker: Dict[str, int] = {}
+        self._group_remaining: Dict[str, int] = {}
+        self.stats = {"tracked": 0, "completed": 0, "timed_out": 0, "rejected": 0, "cancelled": 0}
+
+    def _add(self, request: PendingRequest, timeout: Optional[float]):
+        request.deadline = request.created_at + (self.timeout if timeout is None else timeout)
+        self._pending[request.request_id] = request
+        self._by_kind[request.kind] = self._by_kind.get(request.kind, 0) + 1
+        if request.worker:
+            self._by_worker[request.worker] = self._by_worker.get(request.worker, 0) + 1
+        heapq.heappush(self._deadlines, (request.deadline, request.request_id))
+        self.stats["tracked"] += 1
+
+    def track(self, sender: str, kind: str, label: str = "", timeout: Optional[float] = None,
+              worker: str = "", cache_key: str = "") -> Optional[PendingRequest]:
+        """Register a request; returns None when the table is full so the caller can shed it"""
+        if len(self._pending) >= self.max_pending:
+            self.stats["rejected"] += 1
+            return None
+        request = PendingRequest(request_id=f"{kind}_{uuid4().hex}", sender=sender, kind=kind, label=label, worker=worker,
+                                 cache_key=cache_key)
+        self._add(request, timeout)
+        return request
+
+    def track_group(self, sender: str, kinds: List[str], label: str = "", timeout: Optional[float] = None,
+                    workers: Optional[Dict[str, str]] = None, cache_keys: Optional[Dict[str, str]] = None,
+                    group_size: Optional[int] = None) -> Optional[List[PendingRequest]]:
+        """Register one request per kind under a shared group ID and deadline; all or nothing.
+
+        ``group_size`` counts parts answered without a request (from cache) so delivery numbering still adds up.
+        """
+        if len(self._pending) + len(kinds) > self.max_pending:
+            self.stats["rejected"] += len(kinds)
+            return None
+        workers = workers or {}
+        cache_keys = cache_keys or {}
+        group_size = len(kinds) if group_size is None else group_size
+        group_id = f"group_{uuid4().hex}"
+        created_at = time.monotonic()
+        requests = [
+            PendingRequest(request_id=f"{kind}_{uuid4().hex}", sender=sender, kind=kind, label=label,
+                           created_at=created_at, group_id=group_id, group_size=group_size, worker=workers.get(kind, ""),
+                           cache_key=cache_keys.get(kind, ""))
+            for kind in kinds
+        ]
+        for request in requests:
+            self._add(request, timeout)
+        self._group_remaining[group_id] = len(requests)
+        return requests
+
+    def _remove(self, request_id: str) -> Optional[PendingRequest]:
+        request = self._pending.pop(request_id, None)
+        if request is not None:
+            self._by_kind[request.kind] -= 1
+            if request.worker:
+                remaining = self._by_worker[request.worker] - 1
+                if remaining:
+                    self._by_worker[request.worker] = remaining
+                else:
+                    del self._by_worker[request.worker]
+            if request.group_id:
+                remaining = self._group_remaining[request.group_id] - 1
+                if remaining:
+                    self._group_remaining[request.group_id] = remaining
+                else:
+                    del self._group_remaining[request.group_id]
+            if len(self._deadlines) > 2 * len(self._pending) + 64:
+                self._deadlines = [(live.deadline, live.request_id) for live in self._pending.values()]
+                heapq.heapify(self._deadlines)
+        return request
+
+    def complete(self, request_id: str) -> Optional[PendingRequest]:
+        """Claim a request for its reply; None if it is unknown, already answered or timed out"""
+        request = self._remove(request_id)
+        if request is not None:
+            self.stats["completed"] += 1
+        return request
+
+    def expire(self, now: Optional[float] = None) -> List[PendingRequest]:
+        """Remove and return every request whose deadline has passed"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, request_id = heapq.heappop(self._deadlines)
+            request = self._remove(request_id)
+            if request is not None:
+                expired.append(request)
+        self.stats["timed_out"] += len(expired)
+        return expired
+
+    def cancel_sender(self, sender: str) -> List[PendingRequest]:
+        """Remove and return everything still pending for a sender who has gone away"""
+        cancelled = [request for request in list(self._pending.values()) if request.sender == sender]
+        for request in cancelled:
+            self._remove(request.request_id)
+        self.stats["cancelled"] += len(cancelled)
+        return cancelled
+
+    def get(self, request_id: str) -> Optional[PendingRequest]:
+        return self._pending.get(request_id)
+
+    def group_remaining(self, group_id: str) -> int:
+        return self._group_remaining.get(group_id, 0)
+
+    def in_flight(self, kind: Optional[str] = None) -> int:
+        return len(self._pending) if kind is None else self._by_kind.get(kind, 0)
+
+    def in_flight_for_worker(self, worker: str) -> int:
+        return self._by_worker.get(worker, 0)
+
+    def in_flight_by_kind(self) -> Dict[str, int]:
+        return {kind: count for kind, count in self._by_kind.items() if count}
+
+request_tracker = RequestTracker()
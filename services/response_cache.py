@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_TTL, RESPONSE_CACHE_NEGATIVE_TTL, RESPONSE_CACHE_MAX_ENTRIES
+from services.metrics import metrics
+from services.topic_canonicalizer import canonicalize_topic
+
+def request_key(kind: str, query: str, *qualifiers: str) -> str:
+    """Canonical topic of the query, including any level it asks for, plus whatever else the answer
+    depends on; empty when there is no topic, since "find me tutorials" in one conversation is not
+    the same request as in another"""
+    topic = canonicalize_topic(query)
+    if not topic.terms:
+        return ""
+    return ":".join((kind, topic.key) + qualifiers)
+
+@dataclass(slots=True)
+class CachedResponse:
+    text: str
+    success: bool
+    expires_at: float
+
+class ResponseCache:
+    """Sub-agent answers kept in the main agent, keyed on the canonical request.
+
+    A hit is sent straight back to the user, so the request never crosses the
+    mailbox. Failures are kept too, but only for the short negative TTL, so a
+    struggling sub-agent is not asked the same thing again by every user at once
+    while a later retry still gets through. Least recently used entries go first.
+    """
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, negative_ttl: float = RESPONSE_CACHE_NEGATIVE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        metrics.gauge("response_cache.entries", lambda: len(self._entries))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled or not key:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            metrics.incr("response_cache.misses")
+            return None
+        self._entries.move_to_end(key)
+        metrics.incr("response_cache.hits" if entry.success else "response_cache.negative_hits")
+        return entry
+
+    def put(self, key: str, text: str, success: bool = True):
+        if not self.enabled or not key or not text:
+            return
+        ttl = self.ttl if success else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = CachedResponse(text, success, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        metrics.incr("response_cache.stores" if success else "response_cache.negative_stores")
+
+response_cache = ResponseCache()
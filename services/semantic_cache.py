@@ -0,0 +1,217 @@
+import json
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_NAMESPACES,
+    SEMANTIC_CACHE_DIMENSIONS,
+    SEMANTIC_CACHE_AUDIT_LOG,
+)
+from services.topic_canonicalizer import canonicalize_topic
+
+TERM_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.35
+
+def _bucket(feature: str, dimensions: int) -> Tuple[int, float]:
+    """Stable across processes, unlike hash(); the sign bit keeps collisions from only adding up"""
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dimensions, (1.0 if digest & 0x80000000 else -1.0)
+
+def hashed_features(text: str, dimensions: int = SEMANTIC_CACHE_DIMENSIONS) -> Dict[int, float]:
+    """Sparse unit vector of the canonical topic terms plus their character trigrams.
+
+    Terms come from the topic canonicalizer, so aliases, plurals and request phrasing
+    ("beginner ML roadmap" vs "help me learn machine learning") collapse first; the
+    trigrams keep near-miss spellings close. A requested level is not a term, so
+    callers keep levels apart by putting it in the namespace.
+    """
+    vector: Dict[int, float] = {}
+    for term in canonicalize_topic(text).terms:
+        index, sign = _bucket(f"t:{term}", dimensions)
+        vector[index] = vector.get(index, 0.0) + sign * TERM_WEIGHT
+        padded = f" {term} "
+        for i in range(len(padded) - 2):
+            index, sign = _bucket(f"c:{padded[i:i + 3]}", dimensions)
+            vector[index] = vector.get(index, 0.0) + sign * TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if norm == 0:
+        return {}
+    return {index: value / norm for index, value in vector.items() if value}
+
+class _Namespace:
+    """Ring buffer of cached answers for one kind of request, with their vectors stacked for a single product"""
+    def __init__(self, capacity: int, dimensions: int):
+        self.capacity = capacity
+        self.dimensions = dimensions
+        self.entries: List[dict] = []
+        self.vectors = np.zeros((min(capacity, 16), dimensions), dtype=np.float32) if NUMPY_AVAILABLE else None
+        self.sparse: List[Dict[int, float]] = []
+        self.next_slot = 0
+        self.last_stored = 0.0
+
+    def add(self, entry: dict, vector: Dict[int, float]):
+        self.last_stored = entry["created_at"]
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.capacity
+        if slot == len(self.entries):
+            self.entries.append(entry)
+        else:
+            self.entries[slot] = entry
+        if self.vectors is None:
+            if slot == len(self.sparse):
+                self.sparse.append(vector)
+            else:
+                self.sparse[slot] = vector
+            return
+        if slot >= len(self.vectors):
+            grown = np.zeros((min(self.capacity, len(self.vectors) * 2), self.dimensions), dtype=np.float32)
+            grown[:len(self.vectors)] = self.vectors
+            self.vectors = grown
+        row = self.vectors[slot]
+        row[:] = 0.0
+        for index, value in vector.items():
+            row[index] = value
+
+    def top_k(self, vector: Dict[int, float], k: int) -> List[Tuple[int, float]]:
+        if self.vectors is not None:
+            indices = np.fromiter(vector.keys(), dtype=np.int64, count=len(vector))
+            values = np.fromiter(vector.values(), dtype=np.float32, count=len(vector))
+            similarities = self.vectors[:len(self.entries), indices] @ values
+            best = np.argsort(-similarities, kind="stable")[:k]
+            return [(int(slot), float(similarities[slot])) for slot in best]
+        scored = [
+            (slot, sum(value * stored.get(index, 0.0) for index, value in vector.items()))
+            for slot, stored in enumerate(self.sparse)
+        ]
+        scored.sort(key=lambda item: -item[1])
+        return scored[:k]
+
+class SemanticCache:
+    """Reuses a generated answer when a new request is close enough to one already answered.
+
+    Requests are compared within a namespace (the kind of answer plus whatever
+    the prompt was personalized on), by cosine similarity of hashed feature vectors.
+    Everything is local and in memory; reuses are appended to an audit log. At most
+    ``max_namespaces`` namespaces are kept: the least recently used one goes first,
+    and one whose newest answer has expired is dropped when next seen.
+    """
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, dimensions: int = SEMANTIC_CACHE_DIMENSIONS,
+                 audit_log_path: Optional[str] = SEMANTIC_CACHE_AUDIT_LOG, enabled: bool = SEMANTIC_CACHE_ENABLED,
+                 max_namespaces: int = SEMANTIC_CACHE_MAX_NAMESPACES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_namespaces = max_namespaces
+        self.dimensions = dimensions
+        self.audit_log_path = audit_log_path
+        self.enabled = enabled
+        self.namespaces: "OrderedDict[str, _Namespace]" = OrderedDict()
+        self.recent_reuses: Deque[dict] = deque(maxlen=100)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "namespace_evictions": 0}
+        self._lock = threading.Lock()
+
+    def lookup(self, namespace: str, query: str, k: int = 3) -> Optional[str]:
+        if not self.enabled:
+            return None
+        vector = hashed_features(query, self.dimensions)
+        with self._lock:
+            now = time.time()
+            space = self.namespaces.get(namespace)
+            if space is not None and now - space.last_stored > self.ttl:
+                del self.namespaces[namespace]
+                self.stats["namespace_evictions"] += 1
+                space = None
+            if not vector or space is None:
+                self.stats["misses"] += 1
+                return None
+            self.namespaces.move_to_end(namespace)
+            for slot, similarity in space.top_k(vector, k):
+                if similarity < self.threshold:
+                    break
+                entry = space.entries[slot]
+                if now - entry["created_at"] > self.ttl:
+                    continue
+                entry["hits"] += 1
+                self.stats["hits"] += 1
+                self._audit(namespace, query, entry, similarity)
+                return entry["response"]
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, namespace: str, query: str, response: str):
+        if not self.enabled or not response:
+            return
+        vector = hashed_features(query, self.dimensions)
+        if not vector:
+            return
+        with self._lock:
+            space = self.namespaces.get(namespace)
+            if space is None:
+                space = self.namespaces[namespace] = _Namespace(self.max_entries, self.dimensions)
+                self._evict_namespaces()
+            self.namespaces.move_to_end(namespace)
+            space.add({"query": query, "response": response, "created_at": time.time(), "hits": 0}, vector)
+            self.stats["stores"] += 1
+
+    def _evict_namespaces(self):
+        """Drop fully expired namespaces, then least recently used ones beyond ``max_namespaces``"""
+        now = time.time()
+        expired = [name for name, space in self.namespaces.items() if space.entries and now - space.last_stored > self.ttl]
+        for name in expired:
+            del self.namespaces[name]
+        evicted = len(expired)
+        while len(self.namespaces) > self.max_namespaces:
+            self.namespaces.popitem(last=False)
+            evicted += 1
+        self.stats["namespace_evictions"] += evicted
+
+    def _audit(self, namespace: str, query: str, entry: dict, similarity: float):
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "namespace": namespace,
+            "query": query,
+            "matched_query": entry["query"],
+            "similarity": round(similarity, 4),
+            "reuse_count": entry["hits"],
+        }
+        self.recent_reuses.append(record)
+        print(f"[SEMANTIC CACHE] Reused answer for '{query[:50]}' (matched '{entry['query'][:50]}', similarity {similarity:.2f})")
+        if not self.audit_log_path:
+            return
+        try:
+            with open(self.audit_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            print(f"Error writing semantic cache audit log: {e}")
+
+semantic_cache = SemanticCache()
+
+if __name__ == "__main__":
+    pairs = [
+        ("help me learn machine learning from scratch", "beginner ML roadmap"),
+        ("teach me python for data analysis", "data analysis in Python please"),
+        ("Find me JS tutorials", "show me javascript videos"),
+        ("explain kubernetes deployments", "how does k8s deployment work"),
+        ("teach me guitar", "teach me piano"),
+        ("learn rust", "learn react"),
+    ]
+    for first, second in pairs:
+        a, b = hashed_features(first), hashed_features(second)
+        similarity = sum(value * b.get(index, 0.0) for index, value in a.items())
+        print(f"{similarity:5.2f}  {first!r} ~ {second!r}")
@@ -0,0 +1,60 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from uagents.crypto import Identity
+
+from config import SHARD_VIRTUAL_NODES
+
+def _position(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+def shard_seed(base_seed: str, index: int) -> str:
+    return f"{base_seed}_shard_{index}"
+
+def shard_addresses(base_seed: str, shard_count: int) -> List[str]:
+    return [Identity.from_seed(shard_seed(base_seed, index), 0).address for index in range(shard_count)]
+
+class ConsistentHashRing:
+    """Maps sender addresses to shards so adding a shard only moves about 1/N of the users.
+
+    Each shard is placed at ``vnodes`` points on a 64-bit ring and a sender belongs
+    to the first point clockwise from its own hash. Positions depend only on the
+    shard and sender strings, so every process builds the same ring.
+    """
+    def __init__(self, nodes: Iterable[str], vnodes: int = SHARD_VIRTUAL_NODES):
+        self.nodes = list(dict.fromkeys(nodes))
+        if not self.nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.vnodes = vnodes
+        points = sorted((_position(f"{node}#{replica}"), node) for node in self.nodes for replica in range(vnodes))
+        self._positions = [position for position, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect(self._positions, _position(key))
+        return self._owners[index % len(self._owners)]
+
+    def moved(self, keys: Iterable[str], previous: Optional["ConsistentHashRing"]) -> Dict[str, str]:
+        """Keys whose owner differs from ``previous``, mapped to their new owner"""
+        if previous is None:
+            return {}
+        moves = {}
+        for key in keys:
+            owner = self.owner(key)
+            if owner != previous.owner(key):
+                moves[key] = owner
+        return moves
+
+if __name__ == "__main__":
+    from collections import Counter
+    from uuid import uuid4
+
+    senders = [f"agent1q{uuid4().hex}" for _ in range(20000)]
+    before = ConsistentHashRing([f"shard-{index}" for index in range(4)])
+    after = ConsistentHashRing([f"shard-{index}" for index in range(5)])
+    load = Counter(before.owner(sender) for sender in senders)
+    print(f"4 shards, {len(senders)} senders: {dict(sorted(load.items()))}")
+    moved = after.moved(senders, before)
+    print(f"Adding a 5th shard moves {len(moved) / len(senders):.1%} of senders (ideal {1 / 5:.1%}), "
+          f"all to the new shard: {set(moved.values()) == {'shard-4'}}")
@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from services.domain_scorer import tokenize
+from services.query_classifier import DOMAIN_KEYWORDS, STOPWORDS
+
+# Shorthand users type -> the name the rest of the system uses.
+TOPIC_ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "golang": "go",
+    "node": "nodejs",
+    "node.js": "nodejs",
+    "react.js": "react",
+    "reactjs": "react",
+    "vue.js": "vue",
+    "vuejs": "vue",
+    "k8s": "kubernetes",
+    "postgres": "postgresql",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "nlp": "natural language processing",
+    "cv": "computer vision",
+    "dsa": "data structures",
+    "webdev": "web development",
+    "infosec": "cybersecurity",
+    "maths": "mathematics",
+}
+
+# Multi-word topics kept as one unit so "learning" in "machine learning" is not stripped.
+TOPIC_PHRASES = frozenset(
+    [keyword for keywords in DOMAIN_KEYWORDS.values() for keyword in keywords if " " in keyword]
+    + [alias for alias in TOPIC_ALIASES.values() if " " in alias]
+    + ["web development", "mobile development", "data science", "computer science", "deep learning",
+       "data structures", "music theory", "quantum physics", "quantum computing", "neural networks"]
+)
+
+# Request phrasing rather than subject matter.
+FILLER_WORDS = STOPWORDS | frozenset([
+    "a", "an", "i", "me", "my", "you", "your", "we", "our", "it", "its", "to", "of", "in", "on", "at", "by",
+    "about", "into", "how", "what", "why", "when", "which", "is", "are", "do", "does", "can", "could",
+    "would", "should", "please", "some", "more", "all", "any", "so", "just", "really", "also", "i'm", "im",
+    "teach", "learn", "learning", "study", "studying", "know", "understand", "master", "start", "begin",
+    "improve", "get", "got", "better", "give", "show", "find", "explain", "create", "make", "build",
+    "work", "works", "like", "good", "best", "new", "between", "relationship", "difference", "vs", "versus",
+    "or", "there", "hi", "hello", "hey", "thanks", "me", "us", "them", "up",
+    "crash", "quick", "hands", "practical", "practice", "project", "projects", "step", "steps", "scratch", "zero",
+    "full", "complete", "everything", "need",
+    "plan", "path", "roadmap", "curriculum", "course", "courses", "tutorial", "tutorials", "resources",
+    "materials", "videos", "video", "books", "book", "guide",
+    "concept", "concepts", "educational", "lesson",
+])
+
+# Level and depth words are not filler: "beginner python" and "advanced python" need different answers.
+LEVEL_WORDS = {
+    "beginner": "beginner", "beginners": "beginner", "basic": "beginner", "basics": "beginner",
+    "fundamental": "beginner", "fundamentals": "beginner", "intro": "beginner", "introduction": "beginner",
+    "introductory": "beginner", "intermediate": "intermediate", "advanced": "advanced", "expert": "advanced",
+}
+
+# Words whose trailing "s" is not a plural.
+LEMMA_EXCEPTIONS = frozenset(
+    [keyword for keywords in DOMAIN_KEYWORDS.values() for keyword in keywords if " " not in keyword]
+    + list(TOPIC_ALIASES.values())
+    + ["kubernetes", "pandas", "rails", "news", "series", "species", "chess", "redis", "jenkins", "graphics"]
+)
+
+MAX_TOPIC_WORDS = 4
+
+def lemmatize(word: str) -> str:
+    """Fold regular plurals; anything irregular or technical is listed in LEMMA_EXCEPTIONS"""
+    if word in LEMMA_EXCEPTIONS or len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is", "ics", "os")):
+        return word[:-1]
+    return word
+
+def _join_phrases(tokens: List[str]) -> List[str]:
+    joined = []
+    i = 0
+    while i < len(tokens):
+        for size in (3, 2):
+            phrase = " ".join(tokens[i:i + size])
+            if i + size <= len(tokens) and phrase in TOPIC_PHRASES:
+                joined.append(phrase)
+                i += size
+                break
+        else:
+            joined.append(tokens[i])
+            i += 1
+    return joined
+
+@dataclass(frozen=True, slots=True)
+class CanonicalTopic:
+    terms: Tuple[str, ...]
+    level: str = ""
+
+    @property
+    def label(self) -> str:
+        """Terms in the order the user wrote them, in the underscore form agents already display"""
+        return "_".join(term.replace(" ", "_") for term in self.terms) or "general"
+
+    @property
+    def key(self) -> str:
+        """Order-independent, so "python for data analysis" and "data analysis in python" share a key;
+        a requested level is part of it"""
+        key = "_".join(sorted(term.replace(" ", "_") for term in self.terms)) or "general"
+        return f"{key}@{self.level}" if self.level else key
+
+@lru_cache(maxsize=4096)
+def canonicalize_topic(query: str) -> CanonicalTopic:
+    words: List[str] = []
+    for token in tokenize(query):
+        words.extend(TOPIC_ALIASES.get(token, token).split())
+    terms: List[str] = []
+    level = ""
+    for term in _join_phrases([word if word in FILLER_WORDS or word in LEVEL_WORDS else lemmatize(word) for word in words]):
+        if term in LEVEL_WORDS:
+            level = level or LEVEL_WORDS[term]
+        elif term not in FILLER_WORDS and term not in terms:
+            terms.append(term)
+    return CanonicalTopic(tuple(terms[:MAX_TOPIC_WORDS]), level)
+
+def extract_topic(query: str) -> str:
+    return canonicalize_topic(query).label
+
+def topic_key(query: str) -> str:
+    return canonicalize_topic(query).key
+
+def requested_level(query: str) -> str:
+    return canonicalize_topic(query).level or "any"
+
+if __name__ == "__main__":
+    paraphrases: Dict[str, List[str]] = {
+        "python": ["Teach me Python", "I want to learn python", "Help me learn py", "Create a Python learning plan"],
+        "javascript": ["Find me JS tutorials", "Show me javascript videos", "teach me JavaScript"],
+        "machine learning": ["Explain machine learning concepts", "I need an ML roadmap", "teach me machine learning"],
+        "data analysis with python": ["Teach me python for data analysis", "data analysis in Python please"],
+        "kubernetes": ["How does k8s work?", "Find Kubernetes courses"],
+    }
+    for expected, queries in paraphrases.items():
+        keys = {topic_key(query) for query in queries}
+        labels = ", ".join(extract_topic(query) for query in queries)
+        print(f"{expected:<28} keys={sorted(keys)} labels=[{labels}]")
+    for query in ["Find me beginner Python courses", "Find me advanced Python courses", "Python basics please"]:
+        print(f"{query:<36} key={topic_key(query)}")
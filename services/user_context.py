@@ -1,34 +1,154 @@
+import atexit
+import gzip
+import hashlib
 import json
 import os
-from typing import Dict, Any, Optional, List
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from itertools import count, islice
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, FrozenSet, Iterable, Optional, List, Set
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
+from enum import IntFlag, StrEnum
 import asyncio
 
-@dataclass
+from services.profile_signals import (
+    ProfileSignals,
+    BEGINNER_INDICATORS,
+    INTERMEDIATE_INDICATORS,
+    ADVANCED_INDICATORS,
+    GOAL_INDICATORS,
+    DURATION_PATTERNS,
+    PRACTICE_INDICATORS,
+    THEORY_INDICATORS,
+    TIME_PATTERNS,
+)
+from config import (
+    USER_CONTEXT_DB_PATH,
+    USER_CONTEXT_WRITE_MODE,
+    USER_CONTEXT_FLUSH_INTERVAL,
+    USER_CONTEXT_MAX_DIRTY,
+    USER_CONTEXT_READ_TTL,
+    USER_CONTEXT_BUSY_TIMEOUT_MS,
+    USER_CONTEXT_CACHE_SIZE,
+    USER_HISTORY_WINDOW,
+    USER_HISTORY_COMPACT_BATCH,
+    USER_HISTORY_SUMMARY_MAX_CHARS,
+    USER_HISTORY_ARCHIVE_DIR,
+    USER_HISTORY_ARCHIVE_SHARDS,
+    USER_CONTEXT_IDLE_SECONDS,
+    USER_CONTEXT_RETENTION_DAYS,
+    USER_CONTEXT_MAINTENANCE_SLICE,
+)
+
+class Level(IntFlag):
+    BEGINNER = 1
+    INTERMEDIATE = 2
+    ADVANCED = 4
+    EXPERT = 8
+
 class LearningLevel:
-    beginner: bool = False
-    intermediate: bool = False
-    advanced: bool = False
-    expert: bool = False
+    """The four level booleans packed into one small int"""
+    __slots__ = ("flags",)
+    
+    def __init__(self, beginner: bool = False, intermediate: bool = False, advanced: bool = False, expert: bool = False, flags: int = 0):
+        self.flags = int(
+            flags
+            | (Level.BEGINNER if beginner else 0)
+            | (Level.INTERMEDIATE if intermediate else 0)
+            | (Level.ADVANCED if advanced else 0)
+            | (Level.EXPERT if expert else 0)
+        )
+    
+    def _get(self, level: Level) -> bool:
+        return bool(self.flags & level)
+    
+    def _set(self, level: Level, value: bool):
+        self.flags = int(self.flags | level if value else self.flags & ~level)
+    
+    beginner = property(lambda self: self._get(Level.BEGINNER), lambda self, value: self._set(Level.BEGINNER, value))
+    intermediate = property(lambda self: self._get(Level.INTERMEDIATE), lambda self, value: self._set(Level.INTERMEDIATE, value))
+    advanced = property(lambda self: self._get(Level.ADVANCED), lambda self, value: self._set(Level.ADVANCED, value))
+    expert = property(lambda self: self._get(Level.EXPERT), lambda self, value: self._set(Level.EXPERT, value))
+    
+    def __eq__(self, other):
+        return isinstance(other, LearningLevel) and self.flags == other.flags
+    
+    def __repr__(self):
+        return (f"LearningLevel(beginner={self.beginner}, intermediate={self.intermediate}, "
+                f"advanced={self.advanced}, expert={self.expert})")
+
+class LearningStyle(StrEnum):
+    VISUAL = "visual"
+    AUDITORY = "auditory"
+    READING = "reading"
+    KINESTHETIC = "kinesthetic"
+
+class Pace(StrEnum):
+    SLOW = "slow"
+    MODERATE = "moderate"
+    FAST = "fast"
+
+class Duration(StrEnum):
+    QUICK = "quick"
+    SHORT = "short"
+    MEDIUM = "medium"
+    LONG = "long"
+    FLEXIBLE = "flexible"
+
+class TimeCommitment(StrEnum):
+    THIRTY_MINUTES = "30 minutes"
+    ONE_HOUR = "1 hour"
+    TWO_HOURS = "2 hours"
+    THREE_PLUS_HOURS = "3+ hours"
+    FLEXIBLE = "flexible"
+    NOT_SPECIFIED = "not specified"
+
+def _categorical(enum_type, value):
+    """Share one object per categorical value: the enum member, or an interned string for unknown values"""
+    if value is None or isinstance(value, enum_type):
+        return value
+    try:
+        return enum_type(value)
+    except ValueError:
+        return sys.intern(str(value))
+
+CATEGORICAL_PREFERENCES = {
+    "learning_style": LearningStyle,
+    "pace": Pace,
+    "preferred_duration": Duration,
+    "daily_time_commitment": TimeCommitment,
+}
 
-@dataclass
+@dataclass(slots=True)
 class LearningPreferences:
-    learning_style: str = "visual"
-    pace: str = "moderate"
-    focus_areas: List[str] = None
-    avoid_topics: List[str] = None
-    preferred_duration: str = "flexible"
+    learning_style: str = LearningStyle.VISUAL
+    pace: str = Pace.MODERATE
+    focus_areas: List[str] = field(default_factory=list)
+    avoid_topics: List[str] = field(default_factory=list)
+    preferred_duration: str = Duration.FLEXIBLE
     practice_focus: bool = True
-    daily_time_commitment: str = "not specified"
+    daily_time_commitment: str = TimeCommitment.NOT_SPECIFIED
     
     def __post_init__(self):
+        self.learning_style = _categorical(LearningStyle, self.learning_style)
+        self.pace = _categorical(Pace, self.pace)
+        self.preferred_duration = _categorical(Duration, self.preferred_duration)
+        self.daily_time_commitment = _categorical(TimeCommitment, self.daily_time_commitment)
         if self.focus_areas is None:
             self.focus_areas = []
         if self.avoid_topics is None:
             self.avoid_topics = []
 
-@dataclass
+# Process-wide so a context reloaded after eviction never reuses a version handed out earlier.
+_profile_versions = count(1)
+
+@dataclass(slots=True)
 class UserContext:
     user_id: str
     name: Optional[str] = None
@@ -37,11 +157,14 @@ class UserContext:
     conversation_history: List[Dict[str, Any]] = None
     current_topic: Optional[str] = None
     current_domain: Optional[str] = None
-    learning_goals: List[str] = None
-    strengths: List[str] = None
-    weaknesses: List[str] = None
+    learning_goals: List[str] = field(default_factory=list)
+    strengths: List[str] = field(default_factory=list)
+    weaknesses: List[str] = field(default_factory=list)
     last_interaction: Optional[datetime] = None
     session_count: int = 0
+    history_summary: str = ""
+    version: int = field(default_factory=lambda: next(_profile_versions))
+    profile_snapshot: Optional[tuple] = field(default=None, repr=False, compare=False)
     
     def __post_init__(self):
         if self.learning_level is None:
@@ -57,97 +180,736 @@ class UserContext:
         if self.weaknesses is None:
             self.weaknesses = []
 
+PROFILE_COLUMNS = (
+    "user_id", "name",
+    "beginner", "intermediate", "advanced", "expert",
+    "learning_style", "pace", "focus_areas", "avoid_topics",
+    "preferred_duration", "practice_focus", "daily_time_commitment",
+    "current_topic", "current_domain",
+    "learning_goals", "strengths", "weaknesses",
+    "last_interaction", "session_count", "history_summary"
+)
+
+LEVEL_COLUMNS = ("beginner", "intermediate", "advanced", "expert")
+PREFERENCE_COLUMNS = (
+    "learning_style", "pace", "focus_areas", "avoid_topics",
+    "preferred_duration", "practice_focus", "daily_time_commitment"
+)
+
+# Maps a UserContext attribute (or a LearningPreferences attribute) to the
+# profile columns it is stored in, so only the touched columns get written.
+FIELD_COLUMNS = {column: (column,) for column in PROFILE_COLUMNS[1:]}
+FIELD_COLUMNS["learning_level"] = LEVEL_COLUMNS
+FIELD_COLUMNS["preferences"] = PREFERENCE_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_profiles (
+    user_id TEXT PRIMARY KEY,
+    name TEXT,
+    beginner INTEGER NOT NULL DEFAULT 0,
+    intermediate INTEGER NOT NULL DEFAULT 0,
+    advanced INTEGER NOT NULL DEFAULT 0,
+    expert INTEGER NOT NULL DEFAULT 0,
+    learning_style TEXT,
+    pace TEXT,
+    focus_areas TEXT,
+    avoid_topics TEXT,
+    preferred_duration TEXT,
+    practice_focus INTEGER NOT NULL DEFAULT 1,
+    daily_time_commitment TEXT,
+    current_topic TEXT,
+    current_domain TEXT,
+    learning_goals TEXT,
+    strengths TEXT,
+    weaknesses TEXT,
+    last_interaction TEXT,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    history_summary TEXT,
+    row_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS conversation_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    message TEXT,
+    response TEXT,
+    agent_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_history_user ON conversation_history (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_user_profiles_last_interaction ON user_profiles (last_interaction);
+"""
+
+# Columns added after the first SQLite release; existing databases get them via ALTER TABLE.
+ADDED_PROFILE_COLUMNS = {
+    "row_version": "INTEGER NOT NULL DEFAULT 0",
+    "history_summary": "TEXT",
+}
+
+ProfileListener = Callable[[str, int, FrozenSet[str]], None]
+
+INSERT_HISTORY_SQL = "INSERT INTO conversation_history (user_id, timestamp, message, response, agent_type) VALUES (?, ?, ?, ?, ?)"
+
+_upsert_sql_cache: Dict[frozenset, str] = {}
+
+def _upsert_sql(columns: frozenset) -> str:
+    """Insert the full row for new users, but only overwrite the given columns for existing ones"""
+    sql = _upsert_sql_cache.get(columns)
+    if sql is None:
+        updates = ", ".join(f"{column} = excluded.{column}" for column in PROFILE_COLUMNS[1:] if column in columns)
+        sql = (
+            f"INSERT INTO user_profiles ({', '.join(PROFILE_COLUMNS)}, row_version) "
+            f"VALUES ({', '.join('?' for _ in PROFILE_COLUMNS)}, 1) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {updates}{', ' if updates else ''}row_version = row_version + 1 "
+            f"RETURNING row_version"
+        )
+        _upsert_sql_cache[columns] = sql
+    return sql
+
+ALL_COLUMNS = frozenset(PROFILE_COLUMNS[1:])
+
+def _dump_list(values) -> Optional[str]:
+    return json.dumps(values) if values else None
+
+def _load_list(text: Optional[str]) -> List[str]:
+    return json.loads(text) if text else []
+
+def _profile_row(context: UserContext) -> tuple:
+    flags = context.learning_level.flags
+    prefs = context.preferences
+    return (
+        context.user_id, context.name,
+        flags & 1, (flags >> 1) & 1, (flags >> 2) & 1, (flags >> 3) & 1,
+        str(prefs.learning_style), str(prefs.pace), _dump_list(prefs.focus_areas), _dump_list(prefs.avoid_topics),
+        str(prefs.preferred_duration), int(prefs.practice_focus), str(prefs.daily_time_commitment),
+        context.current_topic, context.current_domain,
+        _dump_list(context.learning_goals), _dump_list(context.strengths), _dump_list(context.weaknesses),
+        context.last_interaction.isoformat() if context.last_interaction else None,
+        context.session_count, context.history_summary
+    )
+
+# Profile row positions compared to decide whether a save changed anything; last_interaction is left out.
+SNAPSHOT_FIELDS = tuple(
+    (index, "learning_level" if column in LEVEL_COLUMNS else column)
+    for index, column in enumerate(PROFILE_COLUMNS)
+    if column not in ("user_id", "last_interaction")
+)
+
+def _changed_fields(before: Optional[tuple], after: tuple) -> FrozenSet[str]:
+    if before is None:
+        return frozenset()
+    return frozenset(name for index, name in SNAPSHOT_FIELDS if before[index] != after[index])
+
+def _context_from_row(row: sqlite3.Row, history: List[Dict[str, Any]], history_window: int = USER_HISTORY_WINDOW) -> UserContext:
+    return UserContext(
+        user_id=row["user_id"],
+        name=row["name"],
+        learning_level=LearningLevel(flags=(
+            (row["beginner"] and Level.BEGINNER)
+            | (row["intermediate"] and Level.INTERMEDIATE)
+            | (row["advanced"] and Level.ADVANCED)
+            | (row["expert"] and Level.EXPERT)
+        )),
+        preferences=LearningPreferences(
+            learning_style=row["learning_style"] or LearningStyle.VISUAL,
+            pace=row["pace"] or Pace.MODERATE,
+            focus_areas=_load_list(row["focus_areas"]),
+            avoid_topics=_load_list(row["avoid_topics"]),
+            preferred_duration=row["preferred_duration"] or Duration.FLEXIBLE,
+            practice_focus=bool(row["practice_focus"]),
+            daily_time_commitment=row["daily_time_commitment"] or TimeCommitment.NOT_SPECIFIED
+        ),
+        conversation_history=deque(history, maxlen=history_window),
+        current_topic=row["current_topic"],
+        current_domain=row["current_domain"],
+        learning_goals=_load_list(row["learning_goals"]),
+        strengths=_load_list(row["strengths"]),
+        weaknesses=_load_list(row["weaknesses"]),
+        last_interaction=datetime.fromisoformat(row["last_interaction"]) if row["last_interaction"] else None,
+        session_count=row["session_count"],
+        history_summary=row["history_summary"] or ""
+    )
+
+def _summarize_turns(summary: str, turns: List[sqlite3.Row], max_chars: int = USER_HISTORY_SUMMARY_MAX_CHARS) -> str:
+    """Extractive rolling summary: one line per compacted user turn, oldest lines dropped first"""
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        snippet = " ".join((turn["message"] or "").split())[:120]
+        if snippet:
+            lines.append(f"- {turn['timestamp'][:10]} ({turn['agent_type']}): {snippet}")
+    while lines and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+def _archive_path(archive_dir: str, user_id: str) -> str:
+    shard = zlib.crc32(user_id.encode()) % USER_HISTORY_ARCHIVE_SHARDS
+    return os.path.join(archive_dir, f"history_{shard:03d}.jsonl.gz")
+
+def _append_to_archive(archive_dir: str, user_id: str, turns: List[sqlite3.Row]):
+    """Append turns to the user's shard; each call adds one gzip member, which gzip readers concatenate"""
+    os.makedirs(archive_dir, exist_ok=True)
+    with gzip.open(_archive_path(archive_dir, user_id), "at", encoding="utf-8") as f:
+        for turn in turns:
+            f.write(json.dumps({
+                'user_id': user_id,
+                'timestamp': turn["timestamp"],
+                'message': turn["message"],
+                'response': turn["response"],
+                'agent_type': turn["agent_type"]
+            }) + "\n")
+
+def read_archived_history(user_id: str, archive_dir: str = USER_HISTORY_ARCHIVE_DIR) -> List[Dict[str, Any]]:
+    path = _archive_path(archive_dir, user_id)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [entry for entry in map(json.loads, f) if entry['user_id'] == user_id]
+
+def _merge_context(target: UserContext, fresh: UserContext, skip_columns: Set[str]):
+    """Copy stored values onto a cached context, keeping columns with unflushed local changes"""
+    for column in LEVEL_COLUMNS:
+        if column not in skip_columns:
+            setattr(target.learning_level, column, getattr(fresh.learning_level, column))
+    for column in PREFERENCE_COLUMNS:
+        if column not in skip_columns:
+            setattr(target.preferences, column, getattr(fresh.preferences, column))
+    for column in PROFILE_COLUMNS[1:]:
+        if column not in LEVEL_COLUMNS and column not in PREFERENCE_COLUMNS and column not in skip_columns:
+            setattr(target, column, getattr(fresh, column))
+
 class UserContextManager:
-    def __init__(self, storage_path: str = "user_contexts.json"):
+    """Per-process cache over the SQLite store shared by all agent processes.
+
+    Writes only touch the columns a mutation changed and bump ``row_version``;
+    reads re-check that version and reload rows another process has changed.
+    Contexts are loaded on first access and kept in a bounded LRU working set.
+    Every change to a stored profile value (last_interaction aside) bumps
+    ``UserContext.version`` and notifies subscribers, so caches can key on ``(user_id, version)``.
+    """
+    def __init__(self, storage_path: str = USER_CONTEXT_DB_PATH, legacy_json_path: str = "user_contexts.json",
+                 write_mode: str = USER_CONTEXT_WRITE_MODE, flush_interval: float = USER_CONTEXT_FLUSH_INTERVAL,
+                 max_dirty: int = USER_CONTEXT_MAX_DIRTY, read_ttl: float = USER_CONTEXT_READ_TTL,
+                 cache_size: int = USER_CONTEXT_CACHE_SIZE, history_window: int = USER_HISTORY_WINDOW,
+                 compact_batch: int = USER_HISTORY_COMPACT_BATCH, archive_dir: str = USER_HISTORY_ARCHIVE_DIR):
         self.storage_path = storage_path
-        self.contexts: Dict[str, UserContext] = {}
-        self.load_contexts()
+        self.legacy_json_path = legacy_json_path
+        self.write_behind = write_mode == "write_behind"
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.read_ttl = read_ttl
+        self.cache_size = cache_size
+        self.history_window = history_window
+        self.compact_batch = compact_batch
+        self.archive_dir = archive_dir
+        self.contexts: "OrderedDict[str, UserContext]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._accessed_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._dirty: Dict[str, Set[str]] = {}
+        self._pending_history: List[tuple] = []
+        self._pending_archive: List[tuple] = []
+        self._listeners: List[ProfileListener] = []
+        # Dirty contexts evicted before their flush; the next flush writes them, and
+        # get_context takes one back if its user returns first.
+        self._evicted: Dict[str, UserContext] = {}
+        self._stop_event = threading.Event()
+        self._flush_requested = threading.Event()
+        self._flush_thread = None
+        self.conn = self._connect()
+        self._migrate_legacy_json()
+        if self.write_behind:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="user-context-flush", daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.close)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.storage_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={USER_CONTEXT_BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(user_profiles)")}
+        for column, definition in ADDED_PROFILE_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE user_profiles ADD COLUMN {column} {definition}")
+        return conn
     
-    def load_contexts(self):
-        if os.path.exists(self.storage_path):
+    @contextmanager
+    def _transaction(self):
+        """Serialize writers across processes; BEGIN IMMEDIATE takes the write lock up front"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
             try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
-                    for user_id, context_data in data.items():
-                        context_data['learning_level'] = LearningLevel(**context_data.get('learning_level', {}))
-                        context_data['preferences'] = LearningPreferences(**context_data.get('preferences', {}))
-                        if context_data.get('last_interaction'):
-                            context_data['last_interaction'] = datetime.fromisoformat(context_data['last_interaction'])
-                        self.contexts[user_id] = UserContext(**context_data)
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+    
+    def _migrate_legacy_json(self):
+        """One-time import of the old whole-file JSON store into SQLite"""
+        if not os.path.exists(self.legacy_json_path):
+            return
+        if self.conn.execute("SELECT 1 FROM user_profiles LIMIT 1").fetchone():
+            return
+        try:
+            with open(self.legacy_json_path, 'r') as f:
+                data = json.load(f)
+            contexts = []
+            history_rows = []
+            for user_id, context_data in data.items():
+                context_data['learning_level'] = LearningLevel(**context_data.get('learning_level', {}))
+                context_data['preferences'] = LearningPreferences(**context_data.get('preferences', {}))
+                if context_data.get('last_interaction'):
+                    context_data['last_interaction'] = datetime.fromisoformat(context_data['last_interaction'])
+                context = UserContext(**context_data)
+                contexts.append((context, ALL_COLUMNS))
+                history_rows.extend(
+                    (user_id, entry.get('timestamp', ''), entry.get('message'), entry.get('response'), entry.get('agent_type'))
+                    for entry in context.conversation_history
+                )
+            self._write_batch(contexts, history_rows)
+            print(f"Migrated {len(data)} user contexts from {self.legacy_json_path}")
+        except Exception as e:
+            print(f"Error migrating legacy user contexts: {e}")
+    
+    def _load_history(self, user_id: str) -> List[Dict[str, Any]]:
+        """Recent window only; older turns live in the summary and the archive"""
+        return [
+            {
+                'timestamp': row["timestamp"],
+                'message': row["message"],
+                'response': row["response"],
+                'agent_type': row["agent_type"]
+            }
+            for row in self.conn.execute(
+                "SELECT timestamp, message, response, agent_type FROM ("
+                "SELECT id, timestamp, message, response, agent_type FROM conversation_history "
+                "WHERE user_id = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (user_id, self.history_window)
+            )
+        ]
+    
+    def load_contexts(self, limit: Optional[int] = None):
+        """Warm the working set with the most recently active users"""
+        limit = self.cache_size if limit is None else min(limit, self.cache_size)
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT * FROM user_profiles ORDER BY last_interaction DESC LIMIT ?", (limit,)
+                ).fetchall()
+                now = time.monotonic()
+                for row in reversed(rows):
+                    if row["user_id"] in self.contexts:
+                        continue
+                    self.contexts[row["user_id"]] = _context_from_row(row, self._load_history(row["user_id"]), self.history_window)
+                    self._versions[row["user_id"]] = row["row_version"]
+                    self._checked_at[row["user_id"]] = now
+                self._evict_if_needed()
+        except Exception as e:
+            print(f"Error loading user contexts: {e}")
+    
+    def _evict_if_needed(self):
+        """Drop least recently used contexts beyond ``cache_size``; dirty ones wait for the flusher"""
+        with self._lock:
+            for user_id in list(islice(self.contexts, max(len(self.contexts) - self.cache_size, 0))):
+                self._forget(user_id)
+    
+    def _forget(self, user_id: str):
+        """Drop a cached context; one with unflushed changes is handed to the flusher instead of lost"""
+        context = self.contexts.pop(user_id, None)
+        self._checked_at.pop(user_id, None)
+        self._accessed_at.pop(user_id, None)
+        if context is not None and user_id in self._dirty:
+            self._evicted[user_id] = context
+            self._request_flush()
+        else:
+            self._versions.pop(user_id, None)
+    
+    def evict_idle_contexts(self, idle_seconds: float = USER_CONTEXT_IDLE_SECONDS, max_evictions: int = USER_CONTEXT_MAINTENANCE_SLICE) -> int:
+        """Drop contexts not accessed for ``idle_seconds``, at most ``max_evictions`` per call.
+
+        ``self.contexts`` is kept in access order, so idle users sit at the front and
+        each call only looks at the expired prefix instead of scanning every context.
+        """
+        cutoff = time.monotonic() - idle_seconds
+        evicted = 0
+        with self._lock:
+            for user_id in list(islice(self.contexts, max_evictions)):
+                if self._accessed_at.get(user_id, 0.0) > cutoff:
+                    break
+                self._forget(user_id)
+                evicted += 1
+        return evicted
+    
+    def expire_inactive_users(self, days: int = USER_CONTEXT_RETENTION_DAYS, max_users: int = USER_CONTEXT_MAINTENANCE_SLICE,
+                              owns: Optional[Callable[[str], bool]] = None) -> int:
+        """Archive and delete up to ``max_users`` users whose last interaction is older than ``days``.
+
+        Uses the last_interaction index, oldest first, so each slice is a short transaction.
+        Users held in memory are skipped: their stored last_interaction may predate
+        activity the write-behind flusher has not written yet. Processes sharing the store
+        pass ``owns`` so each one only expires its own users, whose unflushed activity it can see.
+        """
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        try:
+            with self._transaction() as conn:
+                in_memory = set(self.contexts) | set(self._dirty) | {history_row[0] for history_row in self._pending_history}
+                candidates = conn.execute(
+                    "SELECT user_id FROM user_profiles WHERE last_interaction < ? ORDER BY last_interaction", (cutoff,)
+                )
+                expired = list(islice(
+                    (row["user_id"] for row in candidates
+                     if row["user_id"] not in in_memory and (owns is None or owns(row["user_id"]))),
+                    max_users
+                ))
+                candidates.close()
+                archived = []
+                for user_id in expired:
+                    turns = conn.execute(
+                        "SELECT timestamp, message, response, agent_type FROM conversation_history WHERE user_id = ? ORDER BY id",
+                        (user_id,)
+                    ).fetchall()
+                    if turns:
+                        archived.append((user_id, turns))
+                conn.executemany("DELETE FROM conversation_history WHERE user_id = ?", [(user_id,) for user_id in expired])
+                conn.executemany("DELETE FROM user_profiles WHERE user_id = ?", [(user_id,) for user_id in expired])
+        except Exception as e:
+            print(f"Error expiring inactive user contexts: {e}")
+            return 0
+        
+        self._archive_turns(archived)
+        return len(expired)
+    
+    def release_users(self, user_ids: Iterable[str]) -> int:
+        """Flush and drop users another process now owns, so its next read comes from the store"""
+        released = 0
+        with self._lock:
+            self.flush()
+            for user_id in user_ids:
+                if user_id in self.contexts and user_id not in self._dirty:
+                    self._forget(user_id)
+                    released += 1
+        return released
+    
+    def run_maintenance(self, purge_store: bool = False, owns: Optional[Callable[[str], bool]] = None):
+        """One small slice of background upkeep; agents call this from an interval handler"""
+        evicted = self.evict_idle_contexts()
+        expired = self.expire_inactive_users(owns=owns) if purge_store else 0
+        if evicted or expired:
+            print(f"User context maintenance: evicted {evicted} idle, expired {expired} inactive")
+    
+    def _write_batch(self, contexts: List[tuple], history_rows: List[tuple]):
+        """Upsert ``(context, columns)`` pairs and append history rows in one transaction"""
+        compacted = []
+        with self._transaction() as conn:
+            for context, columns in contexts:
+                row = conn.execute(_upsert_sql(frozenset(columns)), _profile_row(context)).fetchone()
+                known_version = self._versions.get(context.user_id, 0)
+                if row["row_version"] == known_version + 1:
+                    self._versions[context.user_id] = row["row_version"]
+                else:
+                    # Another process wrote in between; force the next read to merge its columns.
+                    self._checked_at[context.user_id] = 0.0
+            if history_rows:
+                conn.executemany(INSERT_HISTORY_SQL, history_rows)
+                compacted = self._compact_history(conn, {history_row[0] for history_row in history_rows})
+        for user_id, _, summary in compacted:
+            if user_id in self.contexts:
+                self.contexts[user_id].history_summary = summary
+        self._archive_turns([(user_id, overflow) for user_id, overflow, _ in compacted])
+    
+    def _compact_history(self, conn: sqlite3.Connection, user_ids: Set[str]) -> List[tuple]:
+        """Fold turns beyond the recent window into the rolling summary once ``compact_batch`` of them
+        have piled up, so each archive append carries a batch rather than a single turn.
+
+        Returns ``(user_id, overflow, summary)`` for the caller to archive after the commit.
+        """
+        compacted = []
+        for user_id in user_ids:
+            stored = conn.execute("SELECT COUNT(*) FROM conversation_history WHERE user_id = ?", (user_id,)).fetchone()[0]
+            if stored <= self.history_window + self.compact_batch:
+                continue
+            overflow = conn.execute(
+                "SELECT id, user_id, timestamp, message, response, agent_type FROM conversation_history "
+                "WHERE user_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+                (user_id, self.history_window)
+            ).fetchall()
+            overflow.reverse()
+            summary_row = conn.execute("SELECT history_summary FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+            summary = _summarize_turns(summary_row["history_summary"] if summary_row else "", overflow)
+            conn.execute("UPDATE user_profiles SET history_summary = ? WHERE user_id = ?", (summary, user_id))
+            conn.execute("DELETE FROM conversation_history WHERE user_id = ? AND id <= ?", (user_id, overflow[-1]["id"]))
+            compacted.append((user_id, overflow, summary))
+        return compacted
+    
+    def _archive_turns(self, batches: List[tuple]):
+        """Append committed ``(user_id, turns)`` batches to the cold archive. Runs after COMMIT, so a
+        rolled-back or retried transaction never archives twice; a failed write is retried next flush."""
+        with self._lock:
+            batches, self._pending_archive = self._pending_archive + batches, []
+            for user_id, turns in batches:
+                try:
+                    _append_to_archive(self.archive_dir, user_id, turns)
+                except OSError as e:
+                    print(f"Error archiving history for {user_id}: {e}")
+                    self._pending_archive.append((user_id, turns))
+    
+    def _columns_for(self, fields) -> Set[str]:
+        if not fields:
+            return set(ALL_COLUMNS)
+        columns = set()
+        for name in fields:
+            columns.update(FIELD_COLUMNS.get(name, ()))
+        return columns
+    
+    def mark_dirty(self, user_id: str, *fields: str):
+        with self._lock:
+            self._dirty.setdefault(user_id, set()).update(self._columns_for(fields))
+            over_limit = len(self._dirty) >= self.max_dirty
+        if over_limit:
+            self._request_flush()
+    
+    def _request_flush(self):
+        """Wake the flusher thread rather than writing on the caller's (event loop) thread"""
+        if self._flush_thread is not None and not self._stop_event.is_set():
+            self._flush_requested.set()
+        else:
+            self.flush()
+    
+    def flush(self):
+        """Write every dirty profile and queued history row in one transaction"""
+        with self._lock:
+            if not self._dirty and not self._pending_history and not self._pending_archive:
+                return
+            dirty, self._dirty = self._dirty, {}
+            history_rows, self._pending_history = self._pending_history, []
+            contexts = []
+            for user_id, columns in dirty.items():
+                context = self.contexts.get(user_id) or self._evicted.get(user_id)
+                if context is not None:
+                    contexts.append((context, columns))
+            try:
+                self._write_batch(contexts, history_rows)
             except Exception as e:
-                print(f"Error loading user contexts: {e}")
-                self.contexts = {}
+                print(f"Error flushing user contexts: {e}")
+                for user_id, columns in dirty.items():
+                    self._dirty.setdefault(user_id, set()).update(columns)
+                self._pending_history = history_rows + self._pending_history
+                return
+            for user_id in dirty:
+                if self._evicted.pop(user_id, None) is not None:
+                    self._versions.pop(user_id, None)
+                    self._checked_at.pop(user_id, None)
+    
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self.flush()
+    
+    def close(self):
+        self._stop_event.set()
+        self._flush_requested.set()
+        self.flush()
+    
+    def subscribe(self, listener: ProfileListener) -> Callable[[], None]:
+        """Call ``listener(user_id, version, fields)`` after every profile change; returns an unsubscribe function.
+
+        ``fields`` names the attributes whose values changed (``learning_level`` for any level flag).
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener) if listener in self._listeners else None
+    
+    def profile_version(self, user_id: str) -> int:
+        return self.get_context(user_id).version
+    
+    def profile_signature(self, user_id: Optional[str]) -> str:
+        """The profile fields a curriculum prompt is personalized on; learners who share them can share a plan.
+
+        The free-text current topic and learning goals go in as a hash, so a plan written around
+        one learner's goals is only reused for learners with exactly the same goals.
+        """
+        if not user_id:
+            return "anonymous"
+        user_context = self.get_context(user_id)
+        level = user_context.learning_level
+        learning_level = "beginner" if level.beginner else "intermediate" if level.intermediate else "advanced" if level.advanced else "beginner"
+        preferences = user_context.preferences
+        goals = "\n".join([user_context.current_topic or "", *user_context.learning_goals])
+        goals_hash = hashlib.blake2b(goals.encode("utf-8"), digest_size=8).hexdigest() if goals.strip() else "none"
+        return f"{learning_level}/{preferences.pace}/{preferences.preferred_duration}/{preferences.daily_time_commitment}/{int(preferences.practice_focus)}/{goals_hash}"
+    
+    def _bump_version(self, context: UserContext) -> int:
+        """Bump the version and notify listeners if a profile value changed since the last bump"""
+        snapshot = _profile_row(context)
+        changed = _changed_fields(context.profile_snapshot, snapshot)
+        context.profile_snapshot = snapshot
+        if not changed:
+            return context.version
+        context.version = next(_profile_versions)
+        for listener in list(self._listeners):
+            try:
+                listener(context.user_id, context.version, changed)
+            except Exception as e:
+                print(f"Error notifying profile listener for {context.user_id}: {e}")
+        return context.version
+    
+    def save_context(self, user_id: str, *fields: str):
+        """Persist a user's profile; ``fields`` narrows the write to the attributes that changed"""
+        context = self.contexts.get(user_id)
+        if context is not None:
+            self._bump_version(context)
+        if self.write_behind:
+            self.mark_dirty(user_id, *fields)
+            return
+        if context is None:
+            return
+        try:
+            self._write_batch([(context, self._columns_for(fields))], [])
+        except Exception as e:
+            print(f"Error saving user context {user_id}: {e}")
     
     def save_contexts(self):
+        if self.write_behind:
+            with self._lock:
+                for user_id in self.contexts:
+                    self._dirty.setdefault(user_id, set()).update(ALL_COLUMNS)
+            self.flush()
+            return
         try:
-            data = {}
-            for user_id, context in self.contexts.items():
-                context_dict = asdict(context)
-                if context.last_interaction:
-                    context_dict['last_interaction'] = context.last_interaction.isoformat()
-                data[user_id] = context_dict
-            
-            with open(self.storage_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            self._write_batch([(context, ALL_COLUMNS) for context in self.contexts.values()], [])
         except Exception as e:
             print(f"Error saving user contexts: {e}")
     
+    def _refresh(self, user_id: str):
+        """Reload a cached context if another process has written a newer row version"""
+        now = time.monotonic()
+        if now - self._checked_at.get(user_id, 0.0) < self.read_ttl:
+            return
+        with self._lock:
+            self._checked_at[user_id] = now
+            version_row = self.conn.execute("SELECT row_version FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+            if version_row is None or version_row["row_version"] <= self._versions.get(user_id, 0):
+                return
+            row = self.conn.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+            has_pending_history = any(history_row[0] == user_id for history_row in self._pending_history)
+            fresh = _context_from_row(row, [] if has_pending_history else self._load_history(user_id), self.history_window)
+            context = self.contexts[user_id]
+            _merge_context(context, fresh, self._dirty.get(user_id, set()))
+            if not has_pending_history:
+                context.conversation_history = fresh.conversation_history
+            self._versions[user_id] = row["row_version"]
+            self._bump_version(context)
+    
     def get_context(self, user_id: str) -> UserContext:
-        if user_id not in self.contexts:
-            self.contexts[user_id] = UserContext(user_id=user_id)
-        return self.contexts[user_id]
+        with self._lock:
+            context = self.contexts.get(user_id)
+            self._accessed_at[user_id] = time.monotonic()
+            if context is None and user_id in self._evicted:
+                context = self.contexts[user_id] = self._evicted.pop(user_id)
+                self._checked_at[user_id] = time.monotonic()
+                self._evict_if_needed()
+            if context is not None:
+                self.contexts.move_to_end(user_id)
+                try:
+                    self._refresh(user_id)
+                except Exception as e:
+                    print(f"Error refreshing user context {user_id}: {e}")
+                return context
+            row = self.conn.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                context = _context_from_row(row, self._load_history(user_id), self.history_window)
+                self._versions[user_id] = row["row_version"]
+            else:
+                context = UserContext(user_id=user_id, conversation_history=deque(maxlen=self.history_window))
+            context.profile_snapshot = _profile_row(context)
+            self.contexts[user_id] = context
+            self._checked_at[user_id] = time.monotonic()
+            self._evict_if_needed()
+            return context
     
     def update_context(self, user_id: str, **kwargs):
         context = self.get_context(user_id)
+        fields = ["last_interaction"]
         for key, value in kwargs.items():
-            if hasattr(context, key):
+            if key == "learning_level" and isinstance(value, str):
+                if value.upper() in Level.__members__:
+                    setattr(context.learning_level, value.lower(), True)
+                    fields.append(key)
+            elif hasattr(context, key):
                 setattr(context, key, value)
+                fields.append(key)
+            elif hasattr(context.preferences, key):
+                if key in CATEGORICAL_PREFERENCES:
+                    value = _categorical(CATEGORICAL_PREFERENCES[key], value)
+                setattr(context.preferences, key, value)
+                fields.append(key)
         context.last_interaction = datetime.now()
-        self.save_contexts()
+        self.save_context(user_id, *fields)
     
     def add_conversation_entry(self, user_id: str, message: str, response: str, agent_type: str):
         context = self.get_context(user_id)
-        context.conversation_history.append({
+        entry = {
             'timestamp': datetime.now().isoformat(),
             'message': message,
             'response': response,
             'agent_type': agent_type
-        })
+        }
+        context.conversation_history.append(entry)
+        context.last_interaction = datetime.now()
+        history_row = (user_id, entry['timestamp'], message, response, agent_type)
+        if self.write_behind:
+            with self._lock:
+                self._pending_history.append(history_row)
+            self.mark_dirty(user_id, "last_interaction")
+            return
+        try:
+            self._write_batch([(context, self._columns_for(["last_interaction"]))], [history_row])
+        except Exception as e:
+            print(f"Error saving conversation entry for {user_id}: {e}")
+    
+    def apply_profile_signals(self, user_id: str, signals: ProfileSignals):
+        """Apply everything extracted from one message as a single context update"""
+        if not signals.has_updates():
+            return
+        context = self.get_context(user_id)
+        fields = ["last_interaction"]
+        if signals.learning_level != "unknown":
+            setattr(context.learning_level, signals.learning_level, True)
+            fields.append("learning_level")
+        if signals.learning_goals:
+            context.learning_goals.extend(signals.learning_goals)
+            fields.append("learning_goals")
+        if signals.preferred_duration is not None:
+            context.preferences.preferred_duration = _categorical(Duration, signals.preferred_duration)
+            fields.append("preferred_duration")
+        if signals.practice_focus is not None:
+            context.preferences.practice_focus = signals.practice_focus
+            fields.append("practice_focus")
+        if signals.daily_time_commitment is not None:
+            context.preferences.daily_time_commitment = _categorical(TimeCommitment, signals.daily_time_commitment)
+            fields.append("daily_time_commitment")
         context.last_interaction = datetime.now()
-        self.save_contexts()
+        self.save_context(user_id, *fields)
     
     def assess_learning_level(self, user_id: str, message: str) -> str:
         context = self.get_context(user_id)
         
-        beginner_indicators = [
-            "beginner", "new to", "never learned", "don't know", "first time",
-            "starting", "basics", "fundamentals", "intro", "introduction",
-            "never done", "no experience", "complete beginner", "learning speed is not that good",
-            "slow learner", "struggle", "difficult", "hard for me", "not good at"
-        ]
-        
-        intermediate_indicators = [
-            "some experience", "basic knowledge", "familiar with", "know basics",
-            "intermediate", "somewhat", "a bit", "little bit", "some understanding",
-            "have done some", "know a little", "basic level"
-        ]
-        
-        advanced_indicators = [
-            "advanced", "expert", "proficient", "experienced", "deep knowledge",
-            "master", "professional", "expertise", "comprehensive", "thorough",
-            "very good at", "excellent", "advanced level", "senior level"
-        ]
-        
         message_lower = message.lower()
         
-        if any(indicator in message_lower for indicator in beginner_indicators):
+        if any(indicator in message_lower for indicator in BEGINNER_INDICATORS):
             context.learning_level.beginner = True
+            self.save_context(user_id, "learning_level")
             return "beginner"
-        elif any(indicator in message_lower for indicator in advanced_indicators):
+        elif any(indicator in message_lower for indicator in ADVANCED_INDICATORS):
             context.learning_level.advanced = True
+            self.save_context(user_id, "learning_level")
             return "advanced"
-        elif any(indicator in message_lower for indicator in intermediate_indicators):
+        elif any(indicator in message_lower for indicator in INTERMEDIATE_INDICATORS):
             context.learning_level.intermediate = True
+            self.save_context(user_id, "learning_level")
             return "intermediate"
         
         return "unknown"
@@ -155,15 +917,10 @@ class UserContextManager:
     def extract_learning_goals(self, user_id: str, message: str) -> List[str]:
         context = self.get_context(user_id)
         
-        goal_indicators = [
-            "want to learn", "goal is", "trying to", "hoping to", "planning to",
-            "need to", "should learn", "must learn", "aim to", "target"
-        ]
-        
         goals = []
         message_lower = message.lower()
         
-        for indicator in goal_indicators:
+        for indicator in GOAL_INDICATORS:
             if indicator in message_lower:
                 parts = message.split(indicator)
                 if len(parts) > 1:
@@ -172,27 +929,19 @@ class UserContextManager:
         
         if goals:
             context.learning_goals.extend(goals)
-            self.save_contexts()
+            self.save_context(user_id, "learning_goals")
         
         return goals
     
     def extract_learning_duration(self, user_id: str, message: str) -> str:
         context = self.get_context(user_id)
         
-        duration_patterns = {
-            "quick": ["quick", "fast", "rapid", "crash course", "intensive", "bootcamp"],
-            "short": ["short", "brief", "few weeks", "month", "couple of weeks", "2-4 weeks"],
-            "medium": ["few months", "3-6 months", "half year", "medium term"],
-            "long": ["long term", "year", "extensive", "comprehensive", "thorough", "deep dive"],
-            "flexible": ["flexible", "at my own pace", "whenever", "no rush", "take my time"]
-        }
-        
         message_lower = message.lower()
         
-        for duration, patterns in duration_patterns.items():
+        for duration, patterns in DURATION_PATTERNS.items():
             if any(pattern in message_lower for pattern in patterns):
                 context.preferences.preferred_duration = duration
-                self.save_contexts()
+                self.save_context(user_id, "preferred_duration")
                 return duration
         
         return context.preferences.preferred_duration
@@ -200,25 +949,15 @@ class UserContextManager:
     def extract_practice_preferences(self, user_id: str, message: str) -> bool:
         context = self.get_context(user_id)
         
-        practice_indicators = [
-            "practice", "hands-on", "practical", "build", "create", "project",
-            "exercise", "coding", "doing", "making", "implementing"
-        ]
-        
-        theory_indicators = [
-            "theory", "concepts", "understanding", "knowledge", "reading",
-            "studying", "learning about", "explaining"
-        ]
-        
         message_lower = message.lower()
         
-        if any(indicator in message_lower for indicator in practice_indicators):
+        if any(indicator in message_lower for indicator in PRACTICE_INDICATORS):
             context.preferences.practice_focus = True
-            self.save_contexts()
+            self.save_context(user_id, "practice_focus")
             return True
-        elif any(indicator in message_lower for indicator in theory_indicators):
+        elif any(indicator in message_lower for indicator in THEORY_INDICATORS):
             context.preferences.practice_focus = False
-            self.save_contexts()
+            self.save_context(user_id, "practice_focus")
             return False
         
         return context.preferences.practice_focus
@@ -226,20 +965,12 @@ class UserContextManager:
     def extract_time_commitment(self, user_id: str, message: str) -> str:
         context = self.get_context(user_id)
         
-        time_patterns = {
-            "30 minutes": ["30 min", "half hour", "30 minutes"],
-            "1 hour": ["1 hour", "one hour", "60 min", "hour a day"],
-            "2 hours": ["2 hours", "two hours", "couple hours"],
-            "3+ hours": ["3 hours", "several hours", "many hours", "long sessions"],
-            "flexible": ["flexible", "whenever", "spare time", "free time"]
-        }
-        
         message_lower = message.lower()
         
-        for time_commitment, patterns in time_patterns.items():
+        for time_commitment, patterns in TIME_PATTERNS.items():
             if any(pattern in message_lower for pattern in patterns):
                 context.preferences.daily_time_commitment = time_commitment
-                self.save_contexts()
+                self.save_context(user_id, "daily_time_commitment")
                 return time_commitment
         
         return context.preferences.daily_time_commitment
@@ -278,19 +1009,15 @@ class UserContextManager:
         else:
             return f"Wonderful! I'll create a comprehensive learning experience for {topic} that adapts to your level. "
     
-    def cleanup_old_contexts(self, days: int = 30):
-        cutoff_date = datetime.now() - timedelta(days=days)
-        to_remove = []
-        
-        for user_id, context in self.contexts.items():
-            if context.last_interaction and context.last_interaction < cutoff_date:
-                to_remove.append(user_id)
-        
-        for user_id in to_remove:
-            del self.contexts[user_id]
-        
-        if to_remove:
-            self.save_contexts()
-            print(f"Cleaned up {len(to_remove)} old user contexts")
+    def cleanup_old_contexts(self, days: int = USER_CONTEXT_RETENTION_DAYS):
+        removed = 0
+        while True:
+            expired = self.expire_inactive_users(days)
+            removed += expired
+            if expired < USER_CONTEXT_MAINTENANCE_SLICE:
+                break
+        
+        if removed:
+            print(f"Cleaned up {removed} old user contexts")
 
 user_context_manager = UserContextManager()
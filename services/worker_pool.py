@@ -0,0 +1,69 @@
+import random
+from typing import List, Optional
+
+from uagents.crypto import Identity
+
+from config import WORKER_SELECTION, REPLICA_PORT_STRIDE
+from services.request_tracker import RequestTracker, request_tracker
+
+def replica_seed(base_seed: Optional[str], index: int) -> Optional[str]:
+    """Replica 0 keeps the base seed, so a single-replica deployment keeps its address"""
+    if base_seed is None or index == 0:
+        return base_seed
+    return f"{base_seed}_replica_{index}"
+
+def replica_port(base_port: int, index: int) -> int:
+    return base_port + index * REPLICA_PORT_STRIDE
+
+def replica_addresses(base_seed: str, replicas: int) -> List[str]:
+    return [Identity.from_seed(replica_seed(base_seed, index), 0).address for index in range(max(replicas, 1))]
+
+class WorkerPool:
+    """Interchangeable sub-agents for one kind of request.
+
+    ``least_outstanding`` sends to the worker with the fewest requests in flight,
+    rotating the starting point so ties spread evenly; ``power_of_two`` compares two
+    random workers, which stays balanced without scanning a large pool. Both read
+    the request tracker, so a worker that stops answering stops attracting work
+    until its requests time out.
+    """
+    def __init__(self, kind: str, addresses: List[str], strategy: str = WORKER_SELECTION,
+                 tracker: RequestTracker = request_tracker):
+        if not addresses:
+            raise ValueError(f"Worker pool '{kind}' needs at least one address")
+        self.kind = kind
+        self.addresses = list(addresses)
+        self.strategy = strategy
+        self.tracker = tracker
+        self._next = 0
+
+    def pick(self) -> str:
+        addresses = self.addresses
+        if len(addresses) == 1:
+            return addresses[0]
+        load = self.tracker.in_flight_for_worker
+        if self.strategy == "power_of_two":
+            first, second = random.sample(addresses, 2)
+            return first if load(first) <= load(second) else second
+        start = self._next
+        self._next = (start + 1) % len(addresses)
+        return min((addresses[(start + offset) % len(addresses)] for offset in range(len(addresses))), key=load)
+
+    def load(self) -> dict:
+        return {address: self.tracker.in_flight_for_worker(address) for address in self.addresses}
+
+def build_worker_pool(kind: str, base_seed: Optional[str], replicas: int, explicit_addresses: str,
+                      fallback_address: str) -> WorkerPool:
+    """Explicit addresses win; otherwise derive one address per replica from the base seed.
+
+    Without a seed the sub-agent's address cannot be derived, so the pool falls back
+    to the single published address.
+    """
+    addresses = [address.strip() for address in explicit_addresses.split(",") if address.strip()]
+    if not addresses and base_seed:
+        addresses = replica_addresses(base_seed, replicas)
+    if not addresses:
+        if replicas > 1:
+            print(f"[WORKER POOL] No seed configured for {kind} workers; ignoring {replicas} replicas")
+        addresses = [fallback_address]
+    return WorkerPool(kind, addresses)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Module-level singletons read these at import time; keep them out of the working tree.
+_scratch = tempfile.mkdtemp(prefix="edufinder_tests_")
+os.environ.setdefault("USER_CONTEXT_DB_PATH", os.path.join(_scratch, "user_contexts.db"))
+os.environ.setdefault("USER_HISTORY_ARCHIVE_DIR", os.path.join(_scratch, "history_archive"))
+os.environ.setdefault("SEMANTIC_CACHE_AUDIT_LOG", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
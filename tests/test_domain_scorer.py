@@ -0,0 +1,30 @@
+import pytest
+
+from services.query_classifier import domain_scorer
+
+QUERIES = [
+    "Learning guitar as a beginner",
+    "Create a learning plan for React Native apps",
+    "Teach me machine learning with pandas",
+    "Explain ci/cd with Docker and Kubernetes",
+    "Teach me C++ and C#",
+    "hello there",
+    "",
+    "multi\nline guitar\nmachine learning",
+]
+
+def test_intent_words_do_not_pull_in_the_language_domain():
+    assert domain_scorer.best_domain("Learning guitar as a beginner") == "music"
+    assert [domain for domain, _ in domain_scorer.score("Create a learning plan for React Native apps")] == ["mobile_development"]
+
+def test_two_word_keywords_consume_both_tokens():
+    assert domain_scorer.score("Teach me machine learning") == [("data_science", 1.0)]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4096])
+def test_score_batch_matches_single_scores(chunk_size):
+    batch = domain_scorer.score_batch(QUERIES, chunk_size=chunk_size)
+    for ranked, query in zip(batch, QUERIES):
+        expected = domain_scorer.score(query)
+        assert [domain for domain, _ in ranked] == [domain for domain, _ in expected]
+        assert [confidence for _, confidence in ranked] == pytest.approx([confidence for _, confidence in expected])
+    assert len(batch) == len(QUERIES)
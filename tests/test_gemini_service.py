@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+from services.gemini_service import _concept_data, _detect_domain, _run_metta
+from services.priority_scheduler import BULK, priority_scheduler
+
+def _run(coroutine):
+    """Run on a private loop; asyncio.run would leave the main thread without one for later imports"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def test_metta_work_runs_off_the_event_loop_thread():
+    async def main():
+        threads = []
+        async def work(metta, value):
+            threads.append(threading.get_ident())
+            return value
+        result = await priority_scheduler.run(BULK, _run_metta, work, 7)
+        return threading.get_ident(), threads, result
+
+    loop_thread, threads, result = _run(main())
+    assert result == 7
+    assert threads and threads[0] != loop_thread
+
+def test_mock_metta_falls_back_to_the_domain_scorer():
+    async def main():
+        domain = await priority_scheduler.run(BULK, _run_metta, _detect_domain, "teach me guitar")
+        concepts = await priority_scheduler.run(BULK, _run_metta, _concept_data, "music", ["guitar"])
+        return domain, concepts
+
+    domain, concepts = _run(main())
+    assert domain == "music"
+    assert concepts == [] or concepts[0][0] == "guitar"
@@ -0,0 +1,28 @@
+from services.domain_scorer import tokenize
+from services.phrase_matcher import PhraseMatcher
+
+PHRASES = ["hi", "history", "learn", "learning plan", "full plan", "everything i need", "how are you"]
+TEXTS = [
+    "create a full plan for machine learning",
+    "everything i need for history",
+    "hi there, learn it",
+    "a learning plan for this",
+    "how are you doing",
+]
+
+def test_substring_mode_matches_in_operator():
+    matcher = PhraseMatcher(PHRASES)
+    for text in TEXTS:
+        assert matcher.find(text) == {phrase for phrase in PHRASES if phrase in text}
+
+def test_whole_word_mode_ignores_phrases_inside_words():
+    matcher = PhraseMatcher(PHRASES, whole_words=True)
+    assert matcher.find("create a full plan for machine learning") == {"full plan"}
+    assert matcher.find("everything i need for history") == {"everything i need", "history"}
+    assert matcher.find("hi there, learn it") == {"hi", "learn"}
+    assert matcher.find("a learning plan for this") == {"learning plan"}
+
+def test_find_tokens_matches_whole_word_mode():
+    matcher = PhraseMatcher(PHRASES, whole_words=True)
+    for text in TEXTS:
+        assert matcher.find_tokens(tokenize(text)) == matcher.find(text)
@@ -0,0 +1,54 @@
+import pytest
+
+from services.query_classifier import classify_query
+
+@pytest.mark.parametrize("query, intent", [
+    ("Give me everything i need to learn python", "full_plan"),
+    ("Create a full plan for machine learning", "full_plan"),
+    ("Teach me machine learning", "learning_request"),
+    ("Find me React tutorials and books", "resources"),
+    ("Explain machine learning concepts", "explain"),
+    ("What is the relationship between ethics and logic?", "explain"),
+    ("I'm a slow learner, this is hard for me", "learning_pace"),
+    ("Thanks, that was really helpful", "gratitude"),
+    ("Hi there! Teach me Python", "greeting"),
+    ("hey", "greeting"),
+    ("What can you do?", "help"),
+    ("I'm learning Python and need a roadmap", "learning_request"),
+    ("I would like to start learning rust", "learning_request"),
+    ("Learning guitar as a beginner", "learning_request"),
+    ("I learned some SQL, what next?", "learning_request"),
+    ("Explaining recursion please", "explain"),
+    ("I keep struggling with calculus", "learning_pace"),
+])
+def test_intent_routing(query, intent):
+    assert classify_query(query).intent == intent
+
+@pytest.mark.parametrize("query", [
+    "Create a full plan for machine learning",
+    "everything i need for history",
+    "Show me courses on ethical hacking",
+    "this is the thing",
+])
+def test_greeting_words_inside_other_words_do_not_count(query):
+    assert "greeting" not in classify_query(query).intents
+
+@pytest.mark.parametrize("query", [
+    "Machine learning interview questions",
+    "Explain machine learning concepts",
+    "Show me courses on machine learning",
+])
+def test_topic_phrases_are_not_learning_requests(query):
+    assert "learning_request" not in classify_query(query).intents
+
+def test_domain_ranking():
+    assert classify_query("Teach me machine learning with pandas").domain == "data_science"
+    assert classify_query("Tell me something").domain == "general"
+
+def test_domains_are_scored_on_first_read():
+    classification = classify_query("hey")
+    assert classification._domains is None
+    assert classification.intent == "greeting"
+    assert classification._domains is None
+    assert classification.domain == "general"
+    assert classify_query("Hi, teach me machine learning").domains == classify_query("teach me machine learning").domains
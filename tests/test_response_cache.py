@@ -0,0 +1,50 @@
+import pytest
+
+from services.response_cache import ResponseCache, request_key
+
+def test_request_key_separates_levels():
+    beginner = request_key("materials", "find me beginner python courses", "programming", "youtube")
+    advanced = request_key("materials", "find me advanced python courses", "programming", "youtube")
+    assert beginner != advanced
+    assert request_key("materials", "python courses for beginners", "programming", "youtube") == beginner
+
+def test_request_key_is_empty_without_a_topic():
+    assert request_key("materials", "find me tutorials", "general") == ""
+
+def test_negative_entries_expire_on_their_own_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.response_cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=3600, negative_ttl=30, max_entries=10, enabled=True)
+    cache.put("ok", "answer")
+    cache.put("failed", "Sorry", success=False)
+
+    now[0] += 31
+    assert cache.get("failed") is None
+    assert cache.get("ok").text == "answer"
+
+def test_least_recently_used_entry_is_dropped():
+    cache = ResponseCache(ttl=3600, negative_ttl=30, max_entries=2, enabled=True)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a").text == "1"
+
+def test_main_agent_keys_materials_and_insights_by_level():
+    agent = pytest.importorskip("agent")
+    for kind in ("materials", "insights"):
+        beginner = agent._cache_key(kind, "user1", "find me beginner python courses", "programming")
+        advanced = agent._cache_key(kind, "user2", "find me advanced python courses", "programming")
+        assert beginner and advanced and beginner != advanced
+
+def test_main_agent_keys_curricula_on_the_learners_goals():
+    agent = pytest.importorskip("agent")
+    manager = agent.user_context_manager
+    manager.update_context("goals_a", learning_goals=["pass the AWS exam"])
+    manager.update_context("goals_b", learning_goals=["build a startup backend"])
+    manager.update_context("goals_c", learning_goals=["pass the AWS exam"])
+
+    key_a = agent._cache_key("curriculum", "goals_a", "teach me cloud computing", "devops")
+    assert key_a != agent._cache_key("curriculum", "goals_b", "teach me cloud computing", "devops")
+    assert key_a == agent._cache_key("curriculum", "goals_c", "teach me cloud computing", "devops")
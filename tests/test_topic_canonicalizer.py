@@ -0,0 +1,61 @@
+import pytest
+
+from services.semantic_cache import SemanticCache
+from services.topic_canonicalizer import canonicalize_topic, extract_topic, requested_level, topic_key
+
+@pytest.mark.parametrize("first, second", [
+    ("Teach me Python", "Help me learn py"),
+    ("Find me JS tutorials", "Show me javascript videos"),
+    ("Teach me python for data analysis", "data analysis in Python please"),
+    ("How does k8s work?", "Find Kubernetes courses"),
+])
+def test_paraphrases_share_a_key(first, second):
+    assert topic_key(first) == topic_key(second)
+
+@pytest.mark.parametrize("first, second", [
+    ("find me beginner python courses", "find me advanced python courses"),
+    ("python basics", "intermediate python"),
+    ("teach me python", "teach me advanced python"),
+])
+def test_levels_get_different_keys(first, second):
+    assert topic_key(first) != topic_key(second)
+
+def test_level_is_kept_out_of_the_topic_label():
+    topic = canonicalize_topic("Find me beginner Python courses")
+    assert topic.terms == ("python",)
+    assert topic.level == "beginner"
+    assert extract_topic("Python fundamentals") == "python"
+    assert requested_level("Python fundamentals") == "beginner"
+    assert requested_level("Python") == "any"
+
+def test_semantic_cache_keeps_levels_apart_by_namespace():
+    cache = SemanticCache(audit_log_path=None, enabled=True)
+    beginner, advanced = "find me beginner python courses", "find me advanced python courses"
+    cache.store(f"materials:programming:{requested_level(beginner)}", beginner, "beginner answer")
+
+    assert cache.lookup(f"materials:programming:{requested_level(advanced)}", advanced) is None
+    assert cache.lookup(f"materials:programming:{requested_level(beginner)}", "beginner python courses please") == "beginner answer"
+
+def test_semantic_cache_drops_least_recently_used_namespace():
+    cache = SemanticCache(audit_log_path=None, enabled=True, max_namespaces=2)
+    cache.store("materials:programming:beginner", "python courses", "a")
+    cache.store("materials:programming:advanced", "python courses", "b")
+    assert cache.lookup("materials:programming:beginner", "python courses") == "a"
+    cache.store("materials:math:beginner", "algebra courses", "c")
+
+    assert list(cache.namespaces) == ["materials:programming:beginner", "materials:math:beginner"]
+    assert cache.stats["namespace_evictions"] == 1
+
+def test_semantic_cache_drops_expired_namespaces(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.semantic_cache.time.time", lambda: now[0])
+    cache = SemanticCache(audit_log_path=None, enabled=True, ttl=60)
+    cache.store("materials:programming:beginner", "python courses", "a")
+    cache.store("materials:math:beginner", "algebra courses", "b")
+
+    now[0] += 61
+    cache.store("materials:art:beginner", "drawing courses", "c")
+    assert list(cache.namespaces) == ["materials:art:beginner"]
+    now[0] += 61
+    assert cache.lookup("materials:art:beginner", "drawing courses") is None
+    assert not cache.namespaces
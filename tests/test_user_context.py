@@ -0,0 +1,302 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.user_context import UserContextManager, _append_to_archive, read_archived_history
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = UserContextManager(
+        storage_path=str(tmp_path / "contexts.db"),
+        legacy_json_path=str(tmp_path / "missing.json"),
+        write_mode="write_behind",
+        flush_interval=3600,
+        archive_dir=str(tmp_path / "archive"),
+    )
+    yield manager
+    manager.close()
+
+def test_write_behind_holds_changes_until_flush(manager):
+    manager.update_context("u1", pace="slow")
+    manager.add_conversation_entry("u1", "hello", "hi", "main")
+    assert _stored(manager, "u1") is None
+
+    manager.flush()
+    assert _stored(manager, "u1")["pace"] == "slow"
+    assert manager.conn.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0] == 1
+
+def test_write_behind_coalesces_updates_into_one_batch(manager, monkeypatch):
+    batches = []
+    write_batch = manager._write_batch
+    def record_batch(contexts, history_rows):
+        batches.append((len(contexts), len(history_rows)))
+        write_batch(contexts, history_rows)
+    monkeypatch.setattr(manager, "_write_batch", record_batch)
+
+    for user_id in ("u1", "u2"):
+        manager.update_context(user_id, pace="fast")
+        manager.update_context(user_id, current_topic="python")
+        manager.add_conversation_entry(user_id, "go", "ok", "main")
+    manager.flush()
+
+    assert batches == [(2, 2)]
+    assert _stored(manager, "u2")["current_topic"] == "python"
+
+def test_failed_flush_requeues_without_duplicating_history(manager, monkeypatch):
+    write_batch = manager._write_batch
+    def failing_batch(contexts, history_rows):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(manager, "_write_batch", failing_batch)
+    manager.add_conversation_entry("u1", "hello", "hi", "main")
+    manager.flush()
+    assert "u1" in manager._dirty
+
+    monkeypatch.setattr(manager, "_write_batch", write_batch)
+    manager.flush()
+    manager.flush()
+    assert manager._dirty == {}
+    assert manager.conn.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0] == 1
+
+def _stored(manager, user_id):
+    return manager.conn.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+
+def _make_stale(manager, user_id, days=60):
+    manager.add_conversation_entry(user_id, "teach me python", "sure", "main")
+    manager.get_context(user_id).last_interaction = datetime.now() - timedelta(days=days)
+    manager.save_context(user_id, "last_interaction")
+    manager.flush()
+    manager._forget(user_id)
+
+def test_expire_archives_and_deletes_inactive_users(manager):
+    _make_stale(manager, "gone")
+
+    assert manager.expire_inactive_users(days=30) == 1
+    assert _stored(manager, "gone") is None
+    assert [entry["message"] for entry in read_archived_history("gone", manager.archive_dir)] == ["teach me python"]
+
+def test_expire_keeps_returning_user_with_unflushed_activity(manager):
+    _make_stale(manager, "returning")
+    manager.add_conversation_entry("returning", "I'm back", "welcome back", "main")
+
+    assert manager.expire_inactive_users(days=30) == 0
+    manager.flush()
+    row = _stored(manager, "returning")
+    assert row is not None
+    assert datetime.fromisoformat(row["last_interaction"]) > datetime.now() - timedelta(days=1)
+    messages = [r["message"] for r in manager.conn.execute("SELECT message FROM conversation_history WHERE user_id = ?", ("returning",))]
+    assert messages == ["teach me python", "I'm back"]
+
+def test_expire_skips_cached_users_without_stalling_the_slice(manager):
+    _make_stale(manager, "cached", days=90)
+    _make_stale(manager, "evicted", days=60)
+    manager.get_context("cached")
+
+    assert manager.expire_inactive_users(days=30, max_users=1) == 1
+    assert _stored(manager, "cached") is not None
+    assert _stored(manager, "evicted") is None
+
+def _history_manager(tmp_path, **kwargs):
+    return UserContextManager(
+        storage_path=str(tmp_path / "history.db"),
+        legacy_json_path=str(tmp_path / "missing.json"),
+        write_mode="write_behind",
+        flush_interval=3600,
+        history_window=3,
+        compact_batch=2,
+        archive_dir=str(tmp_path / "archive"),
+        **kwargs
+    )
+
+def _stored_messages(manager, user_id):
+    return [r["message"] for r in manager.conn.execute("SELECT message FROM conversation_history WHERE user_id = ? ORDER BY id", (user_id,))]
+
+def test_history_is_compacted_in_batches_after_commit(tmp_path, monkeypatch):
+    manager = _history_manager(tmp_path)
+    appends = []
+    def record_append(archive_dir, user_id, turns):
+        assert not manager.conn.in_transaction
+        appends.append([turn["message"] for turn in turns])
+    monkeypatch.setattr("services.user_context._append_to_archive", record_append)
+
+    for turn in range(5):
+        manager.add_conversation_entry("u1", f"m{turn}", "r", "main")
+        manager.flush()
+    assert appends == []
+    assert len(_stored_messages(manager, "u1")) == 5
+
+    manager.add_conversation_entry("u1", "m5", "r", "main")
+    manager.flush()
+    assert appends == [["m0", "m1", "m2"]]
+    assert _stored_messages(manager, "u1") == ["m3", "m4", "m5"]
+    assert "m2" in manager.get_context("u1").history_summary
+    manager.close()
+
+def test_failed_archive_write_is_retried_not_duplicated(tmp_path, monkeypatch):
+    manager = _history_manager(tmp_path)
+    failures = iter([OSError("disk full")])
+    real_append = _append_to_archive
+    def flaky_append(archive_dir, user_id, turns):
+        failure = next(failures, None)
+        if failure:
+            raise failure
+        real_append(archive_dir, user_id, turns)
+    monkeypatch.setattr("services.user_context._append_to_archive", flaky_append)
+
+    for turn in range(6):
+        manager.add_conversation_entry("u1", f"m{turn}", "r", "main")
+    manager.flush()
+    assert read_archived_history("u1", manager.archive_dir) == []
+    assert _stored_messages(manager, "u1") == ["m3", "m4", "m5"]
+
+    manager.flush()
+    manager.flush()
+    assert [entry["message"] for entry in read_archived_history("u1", manager.archive_dir)] == ["m0", "m1", "m2"]
+    manager.close()
+
+def test_list_fields_are_independent_lists(manager):
+    first, second = manager.get_context("first"), manager.get_context("second")
+    first.learning_goals.append("python")
+    first.preferences.focus_areas.append("projects")
+
+    assert second.learning_goals == [] and second.preferences.focus_areas == []
+    manager.save_context("first")
+    manager.flush()
+    manager._forget("first")
+    reloaded = manager.get_context("first")
+    assert reloaded.learning_goals == ["python"]
+    reloaded.strengths.append("math")
+
+def test_profile_signature_separates_learners_with_different_goals(manager):
+    for user_id in ("a", "b", "c"):
+        manager.update_context(user_id, pace="slow")
+    manager.update_context("a", learning_goals=["pass the AWS exam"], current_topic="cloud")
+    manager.update_context("b", learning_goals=["build a startup backend"], current_topic="cloud")
+    manager.update_context("c", learning_goals=["pass the AWS exam"], current_topic="cloud")
+
+    assert manager.profile_signature("a") != manager.profile_signature("b")
+    assert manager.profile_signature("a") == manager.profile_signature("c")
+    assert "pass the AWS exam" not in manager.profile_signature("a")
+
+def test_expire_only_touches_users_the_caller_owns(manager, tmp_path):
+    other_shard = UserContextManager(
+        storage_path=manager.storage_path,
+        legacy_json_path=str(tmp_path / "missing.json"),
+        write_mode="write_behind",
+        flush_interval=3600,
+        archive_dir=manager.archive_dir,
+    )
+    _make_stale(manager, "mine")
+    _make_stale(other_shard, "theirs")
+    other_shard.add_conversation_entry("theirs", "I'm back", "welcome back", "main")
+
+    assert manager.expire_inactive_users(days=30, owns=lambda user_id: user_id == "mine") == 1
+    other_shard.flush()
+    assert _stored(manager, "mine") is None
+    assert _stored(manager, "theirs") is not None
+    messages = [r["message"] for r in manager.conn.execute("SELECT message FROM conversation_history WHERE user_id = ?", ("theirs",))]
+    assert messages == ["teach me python", "I'm back"]
+    other_shard.close()
+
+@pytest.mark.parametrize("level", ["advanced", "Advanced", "ADVANCED"])
+def test_update_context_accepts_level_names_in_any_case(manager, level):
+    manager.update_context("u1", learning_level=level)
+    manager.flush()
+    assert manager.get_context("u1").learning_level.advanced
+    assert _stored(manager, "u1")["advanced"] == 1
+
+def _record_flushes(manager, monkeypatch):
+    """Replace flush with a recorder of the calling thread's name; the event is set on each call"""
+    threads, flushed = [], threading.Event()
+    def flush():
+        threads.append(threading.current_thread().name)
+        flushed.set()
+    monkeypatch.setattr(manager, "flush", flush)
+    return threads, flushed
+
+def test_eviction_hands_dirty_contexts_to_the_flusher(manager, monkeypatch):
+    threads, flushed = _record_flushes(manager, monkeypatch)
+    manager.cache_size = 1
+    manager.update_context("u1", pace="slow")
+    manager.get_context("u2")
+
+    assert "u1" not in manager.contexts and "u1" in manager._evicted
+    assert flushed.wait(5)
+    assert threads == ["user-context-flush"]
+
+def test_evicted_user_keeps_unflushed_changes(manager, monkeypatch):
+    manager.cache_size = 1
+    monkeypatch.setattr(manager._flush_requested, "set", lambda: None)
+    manager.update_context("u1", pace="slow")
+    manager.get_context("u2")
+    assert "u1" not in manager.contexts
+
+    manager.flush()
+    assert _stored(manager, "u1")["pace"] == "slow"
+    assert manager._evicted == {}
+    assert manager.get_context("u1").preferences.pace == "slow"
+
+def test_evicted_user_returning_before_flush_gets_their_context_back(manager, monkeypatch):
+    manager.cache_size = 1
+    monkeypatch.setattr(manager._flush_requested, "set", lambda: None)
+    manager.update_context("u1", pace="slow")
+    manager.get_context("u2")
+
+    assert manager.get_context("u1").preferences.pace == "slow"
+    manager.flush()
+    assert _stored(manager, "u1")["pace"] == "slow"
+
+def test_evict_idle_contexts_does_not_flush_inline(manager, monkeypatch):
+    manager.update_context("u1", pace="slow")
+    threads, flushed = _record_flushes(manager, monkeypatch)
+    assert manager.evict_idle_contexts(idle_seconds=0) == 1
+    assert flushed.wait(5)
+    assert threads == ["user-context-flush"]
+
+def test_max_dirty_wakes_the_flusher_instead_of_writing_inline(manager, monkeypatch):
+    threads, flushed = _record_flushes(manager, monkeypatch)
+    manager.max_dirty = 2
+    manager.update_context("u1", pace="slow")
+    assert threads == []
+    manager.update_context("u2", pace="slow")
+    assert flushed.wait(5)
+    assert threads == ["user-context-flush"]
+
+def test_version_bumps_only_when_a_profile_value_changes(manager):
+    before = manager.profile_version("u1")
+    manager.update_context("u1", pace="slow")
+    after = manager.profile_version("u1")
+    assert after > before
+
+    manager.update_context("u1", pace="slow")
+    manager.add_conversation_entry("u1", "hello", "hi", "main")
+    manager.get_context("u1").last_interaction = datetime.now()
+    manager.save_context("u1", "last_interaction")
+    assert manager.profile_version("u1") == after
+
+def test_subscribers_get_changed_fields_until_unsubscribed(manager):
+    changes = []
+    unsubscribe = manager.subscribe(lambda user_id, version, fields: changes.append((user_id, version, fields)))
+    manager.update_context("u1", pace="slow", current_topic="python")
+    manager.update_context("u1", pace="slow", learning_level="advanced")
+    manager.update_context("u1", pace="slow")
+    assert [(user_id, fields) for user_id, _, fields in changes] == [
+        ("u1", {"pace", "current_topic"}),
+        ("u1", {"learning_level"}),
+    ]
+    assert changes[-1][1] == manager.profile_version("u1")
+
+    unsubscribe()
+    unsubscribe()
+    manager.update_context("u1", pace="fast")
+    assert len(changes) == 2
+
+def test_failing_subscriber_does_not_block_others(manager):
+    seen = []
+    def broken(user_id, version, fields):
+        raise RuntimeError("boom")
+    manager.subscribe(broken)
+    manager.subscribe(lambda user_id, version, fields: seen.append(user_id))
+    manager.update_context("u1", pace="slow")
+    assert seen == ["u1"]